@@ -0,0 +1,199 @@
+# app/admission.py
+import asyncio
+import math
+import time
+import uuid
+from collections import Counter, deque
+
+# ==============================================================================
+# ADMISSION CONTROL
+# (Caps how many chat turns run at once, globally, per conversation thread and
+#  per client. Excess turns wait in a bounded FIFO queue with a deadline and
+#  are rejected with 429 + Retry-After once the queue is full or the deadline
+#  passes. With a shared lock store, a thread is also held across workers.)
+# ==============================================================================
+
+class AdmissionRejected(Exception):
+    """Raised when a turn cannot be admitted; carries a Retry-After hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lease:
+    """One admitted turn. release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", keys: tuple):
+        self._controller = controller
+        self._keys = keys
+        self._started = time.monotonic()
+        self._released = False
+        self.lock_owner: str | None = None  # Set while the thread is locked in the shared store
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self._keys, time.monotonic() - self._started)
+            if self.lock_owner is not None:
+                self._controller._unlock_thread(dict(self._keys)["thread"], self.lock_owner)
+
+
+class AdmissionController:
+    """
+    Async admission scheduler for one event loop.
+
+    A turn holds a slot in the global pool and one under each of its keys
+    ("thread", id) and ("client", id); a limit of 0 means unlimited. Waiters
+    are served in arrival order, skipping any whose own thread or client is
+    still at its cap, so one busy conversation does not block the others.
+
+    When several workers serve the same conversations, `thread_locks` (a
+    store from app.store) additionally gives an admitted turn an exclusive,
+    expiring lock on its thread, so two workers never run turns of one
+    thread at once. The wait for it counts against the same queue timeout.
+    """
+
+    def __init__(self,
+                 max_concurrent: int,
+                 max_per_thread: int,
+                 max_per_client: int,
+                 max_queue: int,
+                 queue_timeout: float,
+                 thread_locks=None,
+                 lock_ttl: float = 300.0,
+                 worker_id: str = ""):
+        self.thread_locks = thread_locks
+        self.lock_ttl = lock_ttl
+        self.worker_id = worker_id
+        self.max_concurrent = max_concurrent
+        self.limits = {"thread": max_per_thread, "client": max_per_client}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._per_key: Counter[tuple] = Counter()
+        self._waiters: deque[tuple[tuple, asyncio.Future]] = deque()
+        self._avg_hold = 1.0  # EWMA of seconds a turn holds its slot; drives Retry-After
+        self.counters = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "thread_lock_waits": 0,
+        }
+
+    def _fits(self, keys: tuple) -> bool:
+        if self.max_concurrent and self._active >= self.max_concurrent:
+            return False
+        return all(
+            not self.limits[key[0]] or self._per_key[key] < self.limits[key[0]]
+            for key in keys
+        )
+
+    def _take(self, keys: tuple) -> Lease:
+        self._active += 1
+        for key in keys:
+            self._per_key[key] += 1
+        self.counters["admitted"] += 1
+        return Lease(self, keys)
+
+    def _retry_after(self) -> int:
+        slots = self.max_concurrent or 1
+        return max(1, math.ceil(self._avg_hold * (len(self._waiters) + 1) / slots))
+
+    def _release(self, keys: tuple, held: float) -> None:
+        self._active -= 1
+        for key in keys:
+            self._per_key[key] -= 1
+            if not self._per_key[key]:
+                del self._per_key[key]
+        self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hands freed slots to the oldest waiters that fit."""
+        for entry in list(self._waiters):
+            waiter_keys, future = entry
+            if future.done():
+                self._waiters.remove(entry)
+            elif self._fits(waiter_keys):
+                self._waiters.remove(entry)
+                future.set_result(self._take(waiter_keys))
+
+    # --- cross-worker thread lock ---
+
+    async def _call(self, fn, *args):
+        if self.thread_locks.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _lock_thread(self, lease: Lease, thread_id: str, deadline: float) -> Lease:
+        owner = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+        delay = 0.01
+        try:
+            while not await self._call(self.thread_locks.try_lock, thread_id, owner, self.lock_ttl):
+                if delay == 0.01:
+                    self.counters["thread_lock_waits"] += 1
+                if time.monotonic() + delay > deadline:
+                    self.counters["rejected_timeout"] += 1
+                    raise AdmissionRejected("Timed out waiting for this conversation's previous turn.",
+                                            self._retry_after())
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.2)
+        except BaseException:
+            lease.release()
+            raise
+        lease.lock_owner = owner
+        return lease
+
+    def _unlock_thread(self, thread_id: str, owner: str) -> None:
+        if self.thread_locks.blocking:
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self.thread_locks.unlock, thread_id, owner)
+                return
+            except RuntimeError:
+                pass  # No running loop: unlock inline.
+        self.thread_locks.unlock(thread_id, owner)
+
+    # --- admission ---
+
+    async def acquire(self, thread_id: str, client_id: str) -> Lease:
+        """Admits a turn, waiting up to `queue_timeout` seconds for a slot (and the thread lock)."""
+        deadline = time.monotonic() + self.queue_timeout
+        lease = await self._acquire_slot(thread_id, client_id)
+        if self.thread_locks is None:
+            return lease
+        return await self._lock_thread(lease, thread_id, deadline)
+
+    async def _acquire_slot(self, thread_id: str, client_id: str) -> Lease:
+        keys = (("thread", thread_id), ("client", client_id))
+        # Jump the queue only when no earlier waiter could use the slot.
+        if self._fits(keys) and not any(self._fits(k) for k, _ in self._waiters):
+            return self._take(keys)
+        if len(self._waiters) >= self.max_queue:
+            self.counters["rejected_queue_full"] += 1
+            raise AdmissionRejected("Server is busy, too many queued requests.", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (keys, future)
+        self._waiters.append(entry)
+        self.counters["queued"] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            if future.done() and not future.cancelled():
+                future.result().release()  # Granted just as we gave up
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["rejected_timeout"] += 1
+            raise AdmissionRejected("Timed out waiting for a free slot.", self._retry_after()) from None
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "active": self._active,
+            "waiting": len(self._waiters),
+            "avg_hold_seconds": round(self._avg_hold, 3),
+        }
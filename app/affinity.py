@@ -0,0 +1,114 @@
+# app/affinity.py
+import hashlib
+import itertools
+import json
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from .config import settings
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# THREAD-AFFINITY ROUTER (optional)
+# (A small proxy in front of several app.api workers that sends every turn of
+#  a thread to the same worker. State is shared, so any worker can serve any
+#  thread; affinity only buys locality: warm in-memory cache tiers and
+#  uncontended thread locks. If that worker is unreachable, the next one in
+#  the thread's ranking takes over.)
+#
+#  AFFINITY_WORKERS='["http://127.0.0.1:8001","http://127.0.0.1:8002"]' \
+#      uvicorn app.affinity:app --port 8000
+# ==============================================================================
+
+THREADED_PATHS = {"/chat/stream", "/chat/invoke"}
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "upgrade", "te", "trailer", "host", "content-length"}
+
+
+def rank_workers(thread_id: str, workers: list[str]) -> list[str]:
+    """Rendezvous hashing: a stable order per thread; adding or removing a worker only moves its own threads."""
+    return sorted(workers, key=lambda w: hashlib.sha1(f"{w}|{thread_id}".encode()).digest(), reverse=True)
+
+
+def _thread_of(path: str, body: bytes) -> tuple[str | None, bytes]:
+    """thread_id of a chat request; new conversations get one here so they are routed like any other."""
+    if path not in THREADED_PATHS:
+        return None, body
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None, body
+    if not isinstance(payload, dict):
+        return None, body
+    if not payload.get("thread_id"):
+        payload["thread_id"] = str(uuid.uuid4())
+        body = json.dumps(payload).encode()
+    return str(payload["thread_id"]), body
+
+
+def create_app(workers: list[str]) -> FastAPI:
+    workers = [w.rstrip("/") for w in workers]
+    round_robin = itertools.cycle(range(len(workers) or 1))
+    stats: Counter[str] = Counter()
+    client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=2.0))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await client.aclose()
+
+    app = FastAPI(title="Thread-affinity router", lifespan=lifespan)
+
+    @app.get("/affinity/stats")
+    def affinity_stats():
+        """Requests forwarded per worker and failovers to a lower-ranked worker."""
+        return {"workers": workers, "routed": dict(stats)}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+    async def forward(path: str, http_request: Request):
+        if not workers:
+            return JSONResponse(status_code=503, content={"error": "AFFINITY_WORKERS is empty."})
+        body = await http_request.body()
+        thread_id, body = _thread_of("/" + path, body)
+        if thread_id is not None:
+            candidates = rank_workers(thread_id, workers)
+        else:
+            start = next(round_robin)
+            candidates = workers[start:] + workers[:start]
+
+        headers = {k: v for k, v in http_request.headers.items() if k.lower() not in HOP_BY_HOP}
+        # Keep per-client admission limits working behind the proxy.
+        headers.setdefault("x-client-id", http_request.client.host if http_request.client else "unknown")
+
+        for rank, worker in enumerate(candidates):
+            upstream_request = client.build_request(
+                http_request.method, f"{worker}/{path}", params=http_request.query_params,
+                headers=headers, content=body,
+            )
+            try:
+                upstream = await client.send(upstream_request, stream=True)
+            except httpx.TransportError as e:
+                logger.warning("Worker unreachable", extra={"event": "affinity.failover", "worker": worker,
+                                                             "error": str(e), "thread_id": thread_id})
+                stats["failovers"] += 1
+                continue
+            stats[worker] += 1
+            return StreamingResponse(
+                upstream.aiter_raw(),
+                status_code=upstream.status_code,
+                headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP},
+                background=BackgroundTask(upstream.aclose),
+            )
+        return JSONResponse(status_code=502, content={"error": "No worker reachable."})
+
+    return app
+
+
+app = create_app(settings.AFFINITY_WORKERS)
@@ -1,38 +1,123 @@
+import asyncio
 import uuid
-import json
 import os
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse, FileResponse
+import socket
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
-
-# Note: You must ensure 'graph' (workflow) is accessible for this to run.
-# Import the compiled graph
-try:
-    from .graph import workflow #use relative path
-except ImportError as e:
-    print(f"⚠️  graph.py not found (Error: {e}). Using mock workflow.")
-    
-    # --- FIX: Added the complete MockWorkflow fallback ---
-    class MockWorkflow:
-        async def astream(self, *args, **kwargs):
-            yield {"messages": [AIMessage(content="Mock response: Workflow not initialized.")]}
-        def invoke(self, *args, **kwargs):
-            return {"messages": [AIMessage(content="Mock response: Workflow not initialized.")]}
-    
-    workflow = MockWorkflow() # Assign the mock to the workflow variable
-    # ----------------------------------------------------
+from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+from . import startup
+from .admission import AdmissionController, AdmissionRejected, Lease
+from .config import settings
+from .deadline import DeadlineExceeded, deadline
+from .log import get_logger
+from .store import build_store
+from .sse import ClientDisconnected, encode, relay
+from .telemetry import Counter, Gauge, deadlines_exceeded, render_metrics, span, stream_disconnects
+
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Kicks off the startup phase (graph compile, Airtable client, outbox worker)
+    without blocking, so the server accepts connections right away; /ready
+    reports when it is done. Stops everything on shutdown.
+    """
+    startup.start()
+    yield
+    await startup.shutdown()
 
 
 # Initialize the FastAPI app
 app = FastAPI(
     title="LangGraph Customer Support Agent",
     description="A multi-agent customer support system using LangGraph and FastAPI.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 ) 
 
 
+# --- Worker identity (several may serve the same threads) ---
+WORKER_ID = settings.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+@app.middleware("http")
+async def worker_header(http_request: Request, call_next):
+    response = await call_next(http_request)
+    response.headers["X-Worker-Id"] = WORKER_ID
+    return response
+
+
+# --- Admission control ---
+# With a shared checkpointer other workers may serve the same thread, so the
+# per-thread limit is backed by a lock in that store.
+admission = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENT,
+    settings.ADMISSION_MAX_PER_THREAD,
+    settings.ADMISSION_MAX_PER_CLIENT,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    thread_locks=None if settings.CHECKPOINTER == "memory" else build_store(
+        settings.CHECKPOINTER, "thread_lock", settings, settings.CHECKPOINT_MAX_THREADS, None
+    ),
+    lock_ttl=settings.THREAD_LOCK_TTL_SECONDS,
+    worker_id=WORKER_ID,
+)
+
+Counter(
+    "agent_admission_events_total",
+    "/chat/* turns admitted, queued or rejected (queue full, timeout), and waits for another worker's thread lock.",
+    ("event",),
+    read=lambda: {(event,): count for event, count in admission.counters.items()},
+)
+Gauge("agent_admission_active_turns", "Turns holding an admission slot.", (),
+      read=lambda: {(): admission.stats()["active"]})
+Gauge("agent_admission_waiting_turns", "Turns queued for an admission slot.", (),
+      read=lambda: {(): admission.stats()["waiting"]})
+
+class LeasedStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that releases its admission lease however it ends:
+    also when the body never starts (client gone before the first send, or
+    an error while sending headers), where the body's own `finally` never runs.
+    """
+
+    def __init__(self, content, lease: Lease, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()  # The run unwinds before its thread is freed
+            finally:
+                self.lease.release()
+
+def client_id(http_request: Request) -> str:
+    """Identifies the caller for per-client limits."""
+    return http_request.headers.get("x-client-id") or (http_request.client.host if http_request.client else "unknown")
+
+async def get_workflow():
+    """The compiled workflow; 503 while startup is failing."""
+    try:
+        return await startup.get_workflow()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Service failed to start: {e}")
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(http_request: Request, exc: AdmissionRejected):
+    logger.warning("Request rejected", extra={"event": "admission.rejected", "reason": exc.reason})
+    return JSONResponse(
+        status_code=429,
+        content={"error": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # --- index.html ---
 # Get the absolute path to the directory containing this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -61,93 +146,308 @@ class ChatRequest(BaseModel):
     """Request model for the chat endpoint."""
     query: str
     thread_id: str | None = None
+    stream_tokens: bool = True # Emit `token` events while the supervisor writes its answer
+    stream_team_tokens: bool = False # Also emit `token` events from the team agents
+    deadline_seconds: float | None = Field(default=None, gt=0) # Overrides REQUEST_DEADLINE_SECONDS for this turn
+
+
+def deadline_seconds(request: ChatRequest) -> float | None:
+    """The turn's time budget: its own or the default, capped at REQUEST_DEADLINE_MAX_SECONDS (None = none)."""
+    seconds = request.deadline_seconds or settings.REQUEST_DEADLINE_SECONDS
+    ceiling = settings.REQUEST_DEADLINE_MAX_SECONDS
+    if ceiling:
+        seconds = min(seconds, ceiling) if seconds else ceiling
+    return seconds or None
+
+async def deadline_answer(workflow, config: dict, thread_id: str, seconds: float | None) -> str:
+    """Closes a turn cut off by its deadline and returns the partial answer it ends with."""
+    from .graph import aclose_turn  # Loaded by the startup phase, not at import
+    deadlines_exceeded.inc(1)
+    logger.warning("Deadline exceeded, turn cut off", extra={
+        "event": "request.deadline_exceeded", "thread_id": thread_id, "deadline_seconds": seconds,
+    })
+    return await aclose_turn(workflow, config)
+
+
+def message_events(message, thread_id: str) -> list[tuple[str, dict]]:
+    """Maps a new graph message to its (event, data) pairs."""
+    if isinstance(message, AIMessage):
+        if message.tool_calls:
+            # Supervisor is planning to call one or more teams
+            return [
+                ("supervisor_plan", {
+                    "thread_id": thread_id,
+                    "team": tool_call["name"],
+                    "query": tool_call["args"].get("query", "N/A"),
+                })
+                for tool_call in message.tool_calls
+            ]
+        # Supervisor has a final answer
+        return [("final_answer", {"thread_id": thread_id, "content": message.content})]
+
+    if isinstance(message, ToolMessage):
+        # A team has reported back to the supervisor
+        return [("team_report", {"thread_id": thread_id, "content": message.content})]
+
+    if isinstance(message, HumanMessage):
+        return [] # Skip the initial human message
+
+    return [("unknown_step", {"thread_id": thread_id, "content": str(message)})]
+
+def team_step_events(namespace: tuple[str, ...], message, thread_id: str) -> list[tuple[str, dict]]:
+    """Maps a message written inside a team sub-graph to `team_step` events."""
+    # Namespaces look like ("Orders:<task id>",): the team node that runs the sub-graph.
+    step = {"thread_id": thread_id, "team": namespace[0].split(":", 1)[0]}
+    if isinstance(message, AIMessage):
+        if message.tool_calls:
+            return [
+                ("team_step", {**step, "step": "tool_call", "tool": tool_call["name"], "args": tool_call["args"]})
+                for tool_call in message.tool_calls
+            ]
+        return [("team_step", {**step, "step": "reply", "content": message.content})]
+    if isinstance(message, ToolMessage):
+        return [("team_step", {**step, "step": "tool_result", "content": message.content})]
+    return []
+
+def reset_event(namespace: tuple[str, ...], chunk, thread_id: str) -> tuple[str, dict] | None:
+    """Maps a model fallback (app/tiering.py) to a `token_reset` event: the source's tokens so far are void."""
+    if not isinstance(chunk, dict) or chunk.get("type") != "token_reset":
+        return None
+    return ("token_reset", {
+        "thread_id": thread_id,
+        "source": namespace[0].split(":", 1)[0] if namespace else "supervisor",
+    })
+
+def token_event(chunk, metadata: dict, thread_id: str) -> tuple[str, dict] | None:
+    """Maps a streamed LLM chunk to a `token` event (None for non-text chunks)."""
+    if not isinstance(chunk, AIMessageChunk) or not isinstance(chunk.content, str) or not chunk.content:
+        return None
+    return ("token", {
+        "thread_id": thread_id,
+        "source": metadata.get("team", "supervisor"),
+        "content": chunk.content,
+    })
 
 # --- Asynchronous Streaming Endpoint ---
 @app.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     """
     Main chat endpoint.
-    Streams back a JSON object for each step of the graph.
+    Streams back a JSON object for each new message in the graph and,
+    when `stream_tokens` is set, each LLM token as it is generated.
     """
     thread_id = request.thread_id or str(uuid.uuid4())
     config = {"configurable": {"thread_id": thread_id}}
     
     # Initial input for the graph
     inputs = {"messages": [HumanMessage(content=request.query)]}
-    
+
+    # "updates" only carries each node's new messages (not full state snapshots);
+    # "messages" carries LLM tokens as they are produced, "custom" the resets
+    # sent when a model call is redone on the fallback model.
+    stream_mode = ["updates", "messages", "custom"] if request.stream_tokens else ["updates"]
+
+    budget = deadline_seconds(request)
+
+    async def graph_frames():
+        """Encodes the run's events; "updates" only hands over each step's new messages."""
+        with span("request", "chat_stream", thread_id=thread_id) as request_span, deadline(budget):
+            try:
+                # subgraphs=True tags every chunk with its namespace; () is the supervisor graph.
+                async for namespace, mode, chunk in workflow.astream(
+                    inputs, config=config, stream_mode=stream_mode, subgraphs=True
+                ):
+                    if mode in ("messages", "custom"):
+                        if namespace and not request.stream_team_tokens:
+                            continue
+                        if mode == "messages":
+                            event = token_event(*chunk, thread_id)
+                        else:
+                            event = reset_event(namespace, chunk, thread_id)
+                        if event:
+                            yield encode(*event)
+                        continue
+
+                    # Team sub-graph steps stream as they happen; the team_report follows.
+                    for update in chunk.values():
+                        for message in (update or {}).get("messages", []):
+                            if namespace:
+                                events = team_step_events(namespace, message, thread_id)
+                            else:
+                                events = message_events(message, thread_id)
+                            for event in events:
+                                yield encode(*event)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                request_span.fail(e)
+                error_data = {"error": str(e), "message": "An error occurred during agent execution."}
+                yield encode("error", error_data)
+
+    async def client_gone():
+        """Returns once the client has closed the connection (the request body is already read)."""
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+
     async def stream_generator():
-        """Pushes graph events to the client."""
-        print(f"\n🚀 Starting stream for thread: {thread_id}")
-        yield f"event: new_thread\ndata: {json.dumps({'thread_id': thread_id})}\n\n"
-        
-        # Use .astream() to stream back all intermediate steps
+        """
+        Pushes graph events to the client; the run is cancelled if the client
+        leaves or the deadline passes (then a partial answer closes the stream).
+        """
         try:
-            async for step in workflow.astream(inputs, config=config, stream_mode="values"):
-                last_message = step["messages"][-1]
-                event_data = {"thread_id": thread_id}
-                
-                if isinstance(last_message, AIMessage):
-                    if last_message.tool_calls:
-                        # Supervisor is planning to call a team
-                        event = "supervisor_plan"
-                        event_data["team"] = last_message.tool_calls[0]['name']
-                        event_data["query"] = last_message.tool_calls[0]['args'].get('query', 'N/A')
-                    else:
-                        # Supervisor has a final answer
-                        event = "final_answer"
-                        event_data["content"] = last_message.content
-                
-                elif isinstance(last_message, ToolMessage):
-                    # A team has reported back to the supervisor
-                    event = "team_report"
-                    event_data["content"] = last_message.content
-                    
-                else:
-                    # Filter out the initial human message from showing as "unknown"
-                    if not isinstance(last_message, HumanMessage):
-                        event = "unknown_step"
-                        event_data["content"] = str(last_message)
-                    else:
-                        continue # Skip the initial human message
-
-                # Send the event in Server-Sent-Event (SSE) format
-                yield f"event: {event}\ndata: {json.dumps(event_data)}\n\n"
-        except Exception as e:
-            error_data = {"error": str(e), "message": "An error occurred during agent execution."}
-            yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
-
-        print(f"\n🏁 Stream complete for thread: {thread_id}")
-
-    # Return the streaming response
-    return StreamingResponse(stream_generator(), media_type="text/event-stream")
+            logger.info("Starting stream", extra={"thread_id": thread_id})
+            yield encode("new_thread", {"thread_id": thread_id})
+            try:
+                async for frame in relay(
+                    graph_frames(), settings.SSE_HEARTBEAT_SECONDS, settings.SSE_MAX_BUFFERED_EVENTS,
+                    client_gone, timeout=budget,
+                ):
+                    yield frame
+            except (TimeoutError, DeadlineExceeded):
+                yield encode("deadline_exceeded", {"thread_id": thread_id, "deadline_seconds": budget})
+                answer = await deadline_answer(workflow, config, thread_id, budget)
+                yield encode("final_answer", {"thread_id": thread_id, "content": answer})
+            logger.info("Stream complete", extra={"thread_id": thread_id})
+        except (ClientDisconnected, asyncio.CancelledError) as e:
+            stream_disconnects.inc(1)
+            logger.info("Client disconnected, run cancelled", extra={"event": "stream.disconnected", "thread_id": thread_id})
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+    # Resolved and admitted before the response starts, so failures are real 503/429s.
+    workflow = await get_workflow()
+    lease = await admission.acquire(thread_id, client_id(http_request))
+    try:
+        return LeasedStreamingResponse(stream_generator(), lease, media_type="text/event-stream")
+    except BaseException:
+        lease.release()
+        raise
 
 # --- Simple (non-streaming) endpoint for quick tests ---
+async def run_invoke(request: ChatRequest, thread_id: str, client: str) -> dict:
+    """
+    Runs one turn to completion under an admission slot and returns the final
+    answer, or a partial one (`deadline_exceeded`) if the deadline passed first.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    inputs = {"messages": [HumanMessage(content=request.query)]}
+    budget = deadline_seconds(request)
+
+    logger.info("Invoking graph", extra={"thread_id": thread_id})
+
+    workflow = await get_workflow()
+    lease = await admission.acquire(thread_id, client)
+    try:
+        with span("request", "chat_invoke", thread_id=thread_id), deadline(budget):
+            # .ainvoke() runs the whole graph and returns only the final state
+            async with asyncio.timeout(budget):
+                final_state = await workflow.ainvoke(inputs, config=config)
+    except (TimeoutError, DeadlineExceeded):
+        answer = await deadline_answer(workflow, config, thread_id, budget)
+        return {"response": answer, "thread_id": thread_id, "deadline_exceeded": True}
+    finally:
+        lease.release()
+
+    logger.info("Invocation complete", extra={"thread_id": thread_id})
+    return {"response": final_state["messages"][-1].content, "thread_id": thread_id}
+
 @app.post("/chat/invoke")
-def chat_invoke(request: ChatRequest) -> dict:
+async def chat_invoke(request: ChatRequest, http_request: Request) -> dict:
     """
     Simpler endpoint that just runs the graph and returns the
     final response. Good for simple tests.
     """
     thread_id = request.thread_id or str(uuid.uuid4())
-    config = {"configurable": {"thread_id": thread_id}}
-    inputs = {"messages": [HumanMessage(content=request.query)]}
-    
-    print(f"\n🚀 Invoking graph for thread: {thread_id}")
-    
-    # .invoke() runs the whole graph and returns only the final state
-    final_state = workflow.invoke(inputs, config=config)
-    
-    final_answer = final_state["messages"][-1].content
-    print(f"\n🏁 Invocation complete for thread: {thread_id}")
-    
-    return {"response": final_answer, "thread_id": thread_id}
+    return await run_invoke(request, thread_id, client_id(http_request))
+
+# --- Batch endpoint (offline re-processing) ---
+class BatchRequest(BaseModel):
+    """Many independent turns submitted at once."""
+    requests: list[ChatRequest]
+    max_concurrency: int | None = None # Capped at BATCH_MAX_CONCURRENCY
+
+@app.post("/chat/batch")
+async def chat_batch(batch: BatchRequest, http_request: Request) -> dict:
+    """
+    Runs every request concurrently (bounded) and returns one result per
+    request, in request order. A failing item yields an `error` entry instead
+    of failing the whole batch.
+    """
+    if len(batch.requests) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} requests per batch.")
+
+    client = client_id(http_request)
+    limit = min(batch.max_concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_item(index: int, request: ChatRequest) -> dict:
+        thread_id = request.thread_id or str(uuid.uuid4())
+        async with semaphore:
+            try:
+                return {"index": index, **await run_invoke(request, thread_id, client)}
+            except AdmissionRejected as e:
+                return {"index": index, "thread_id": thread_id, "error": e.reason, "retry_after": e.retry_after}
+            except Exception as e:
+                logger.exception("Batch item failed", extra={"thread_id": thread_id})
+                return {"index": index, "thread_id": thread_id, "error": str(e)}
+
+    logger.info("Running batch", extra={"event": "batch.start", "items": len(batch.requests), "concurrency": limit})
+    results = await asyncio.gather(*(run_item(i, r) for i, r in enumerate(batch.requests)))
+    failed = sum(1 for r in results if "error" in r)
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
 
 # --- Health Check ---
 @app.get("/health")
 def health_check():
-    """Simple health check endpoint."""
+    """Liveness: the process is up and serving (startup may still be running)."""
     return {"status": "ok"}
 
+# --- Readiness Check ---
+@app.get("/ready")
+def ready_check():
+    """Readiness: 200 once the graphs are compiled and the workers started, else 503."""
+    status = startup.status()
+    return JSONResponse(status_code=200 if status["status"] == "ready" else 503, content=status)
+
+# --- Prometheus Metrics ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Every registered metric (latency histograms, token and component counters) in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# --- Debug Stats ---
+# /metrics is what to monitor and alert on. This is the same state as one JSON
+# document, plus the ratios and details that don't fit a metric, for a person
+# looking at one worker.
+@app.get("/debug/stats")
+def debug_stats():
+    """This worker's stats from every component, as JSON; the startup-phase ones once startup is ready."""
+    # No LLM or graph behind these two; cheap at any time.
+    from .router import router_stats
+    from .upstream import upstream_stats
+    stats = {
+        "worker": WORKER_ID,
+        "status": startup.status()["status"],
+        "admission": admission.stats(),
+        "router": router_stats.snapshot(),
+        "upstreams": upstream_stats(),
+    }
+    # The modules behind the rest are built by the startup phase; until it has
+    # finished they are left out rather than imported (and the LLM client
+    # built) on the request path.
+    if startup.is_ready():
+        from .llm import llm_cache
+        from .prompt_layout import prefix_stats
+        from .speculation import speculation_stats
+        from .tiering import model_stats
+        from .tools import get_ticket_outbox, tool_cache
+        stats["cache"] = {"tools": tool_cache.stats(), "llm": llm_cache.stats() if llm_cache else {"enabled": False}}
+        stats["speculation"] = speculation_stats.snapshot()
+        stats["models"] = model_stats.snapshot()
+        stats["prefixes"] = prefix_stats.snapshot()
+        stats["tickets"] = get_ticket_outbox().stats()
+    return stats
+
 # REMOVED the `if __name__ == "__main__":` block
 # to prevent import errors.
 # ALWAYS run locally from the root folder with:
@@ -0,0 +1,233 @@
+# app/cache.py
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+from langchain_core.tools import StructuredTool
+
+# ==============================================================================
+# READ-ONLY TOOL RESPONSE CACHE
+# (TTL + LRU, with single-flight coalescing of concurrent identical lookups.
+#  An optional shared store behind it lets workers reuse each other's results.)
+# ==============================================================================
+
+def cache_key(name: str, kwargs: dict) -> tuple:
+    return (name, json.dumps(kwargs, sort_keys=True, default=str))
+
+
+class _LeaderCancelled(Exception):
+    """Set on a single-flight future whose leader was cancelled: its followers retry."""
+
+
+class ToolCache:
+    """
+    Caches tool results keyed by (tool name, args).
+    Results carrying an "error" key are never stored, so a failed upstream
+    call is retried on the next lookup. With a `store`, a local miss checks
+    it before calling the tool, and fresh results are written through to it.
+    """
+
+    def __init__(self, max_entries: int, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._data: OrderedDict[tuple, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple, Future] = {}  # Shared by sync and async callers
+        self._waiters: dict[tuple, int] = defaultdict(int)  # Followers per in-flight key
+        self._counters: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "coalesced": 0, "store_hits": 0}
+        )
+
+    # --- storage (callers hold self._lock) ---
+
+    def _lookup(self, key: tuple) -> tuple[bool, Any]:
+        item = self._data.get(key)
+        if item is None:
+            return False, None
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _store(self, key: tuple, value: Any, ttl: float) -> None:
+        if isinstance(value, dict) and "error" in value:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    # --- shared tier (blocking I/O, called without self._lock) ---
+
+    def _shared_get(self, key: tuple) -> tuple[bool, Any, float]:
+        raw = self.store.get("\0".join(key))
+        if raw is None:
+            return False, None, 0.0
+        entry = json.loads(raw)
+        remaining = entry["expires_at"] - time.time()
+        if remaining <= 0:
+            return False, None, 0.0
+        return True, entry["value"], remaining
+
+    def _shared_set(self, key: tuple, value: Any, ttl: float) -> None:
+        if isinstance(value, dict) and "error" in value:
+            return
+        entry = {"value": value, "expires_at": time.time() + ttl}
+        self.store.set("\0".join(key), json.dumps(entry, default=str).encode())
+
+    def _compute(self, key: tuple, compute: Callable[[], Any], ttl: float) -> tuple[Any, float]:
+        """Shared tier first, then the tool. Returns (value, ttl left)."""
+        if self.store is not None:
+            found, value, remaining = self._shared_get(key)
+            if found:
+                with self._lock:
+                    self._counters[key[0]]["store_hits"] += 1
+                return value, remaining
+        value = compute()
+        if self.store is not None:
+            self._shared_set(key, value, ttl)
+        return value, ttl
+
+    async def _acompute(self, key: tuple, compute: Callable[[], Awaitable[Any]], ttl: float) -> tuple[Any, float]:
+        if self.store is None:
+            return await compute(), ttl
+        found, value, remaining = await asyncio.to_thread(self._shared_get, key)
+        if found:
+            with self._lock:
+                self._counters[key[0]]["store_hits"] += 1
+            return value, remaining
+        value = await compute()
+        await asyncio.to_thread(self._shared_set, key, value, ttl)
+        return value, ttl
+
+    # --- lookups ---
+    # Sync and async callers share one map of in-flight lookups, so each key
+    # is computed once whichever path asks first. The futures are
+    # concurrent.futures ones: async callers await them through wrap_future;
+    # sync callers block on them, so they must not run on an event loop thread.
+
+    def _follow(self, key: tuple) -> tuple[bool, Any, Future | None]:
+        """(found, value, future): a hit, else the in-flight future joined as a follower, or None to lead it."""
+        counters = self._counters[key[0]]
+        found, value = self._lookup(key)
+        if found:
+            counters["hits"] += 1
+            return True, value, None
+        future = self._inflight.get(key)
+        if future is None:
+            counters["misses"] += 1
+            future = self._inflight[key] = Future()
+            future.set_running_or_notify_cancel()  # Only the leader settles it; cancel() is a no-op
+            return False, None, None
+        counters["coalesced"] += 1
+        self._waiters[key] += 1
+        return False, None, future
+
+    def _unfollow(self, key: tuple) -> None:
+        with self._lock:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def _settle(self, key: tuple, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+            future = self._inflight.pop(key)
+        future.set_result(value)
+
+    def _abandon(self, key: tuple, error: BaseException) -> None:
+        with self._lock:
+            future = self._inflight.pop(key)
+        future.set_exception(error)
+
+    def has_waiters(self, key: tuple) -> bool:
+        """Whether other lookups are waiting on the in-flight lookup of `key`."""
+        with self._lock:
+            return key in self._waiters
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Any], ttl: float) -> Any:
+        while True:
+            with self._lock:
+                found, value, future = self._follow(key)
+            if found:
+                return value
+            if future is None:
+                break
+            try:
+                return future.result()
+            except _LeaderCancelled:
+                continue  # Look again: cached by now, or lead/follow the next lookup
+            finally:
+                self._unfollow(key)
+
+        try:
+            value, ttl = self._compute(key, compute, ttl)
+        except BaseException as e:
+            self._abandon(key, e)
+            raise
+        self._settle(key, value, ttl)
+        return value
+
+    async def aget_or_compute(self, key: tuple, compute: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        while True:
+            with self._lock:
+                found, value, future = self._follow(key)
+            if found:
+                return value
+            if future is None:
+                break
+            try:
+                # shield: a cancelled follower must not cancel the leader's lookup
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                continue
+            finally:
+                self._unfollow(key)
+
+        try:
+            value, ttl = await self._acompute(key, compute, ttl)
+        except asyncio.CancelledError:
+            # Only the leader was cancelled; its followers redo the lookup.
+            self._abandon(key, _LeaderCancelled())
+            raise
+        except BaseException as e:
+            self._abandon(key, e)
+            raise
+        self._settle(key, value, ttl)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Hit/miss/coalesced counters per tool."""
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._counters.items()}
+
+
+def cached_tool(cache: ToolCache, tool: StructuredTool, ttl: float) -> StructuredTool:
+    """Returns a copy of a read-only `tool` whose sync and async bodies go through `cache`."""
+    func, coroutine = tool.func, tool.coroutine
+
+    def cached_func(**kwargs):
+        return cache.get_or_compute(cache_key(tool.name, kwargs), lambda: func(**kwargs), ttl)
+
+    async def cached_coroutine(**kwargs):
+        if coroutine is None:
+            return await asyncio.to_thread(cached_func, **kwargs)
+        return await cache.aget_or_compute(cache_key(tool.name, kwargs), lambda: coroutine(**kwargs), ttl)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=cached_func,
+        coroutine=cached_coroutine,
+    )
@@ -0,0 +1,315 @@
+# app/checkpoint.py
+import asyncio
+from typing import Any, AsyncIterator, Iterator, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from .store import build_store
+
+# ==============================================================================
+# CHECKPOINTER
+# ==============================================================================
+
+class KVSaver(BaseCheckpointSaver[int]):
+    """
+    Checkpointer over a key-value store: per thread, a small index record,
+    plus one key per checkpoint and one per checkpoint's pending writes.
+
+    - Only the last `keep` checkpoints per namespace are retained.
+    - Team sub-graph namespaces are dropped once the supervisor has moved past
+      the step that created them.
+    - Idle-thread eviction is delegated to the store (TTL + LRU).
+    - A write only touches its own keys: put() stores the new checkpoint and
+      updates the index, put_writes() updates that checkpoint's writes. Both
+      read-modify-writes run under store.update(), so workers sharing the
+      store (and parallel team sub-graphs) never overwrite each other.
+
+    Checkpoints store full channel values, so dropping ancestors is safe for
+    graphs that don't use DeltaChannel (ours don't).
+    """
+
+    def __init__(self, store, *, keep: int = 5, serde=None):
+        super().__init__(serde=serde)
+        self.store = store
+        self.keep = max(1, keep)
+
+    # --- keys and (de)serialization ---
+    # index      thread_id                          {"seq": int, "ns": {checkpoint_ns: [entry, ...]}} (oldest first)
+    #            entry = {"id", "parent", "seq"}
+    # checkpoint thread_id \0 c \0 ns \0 checkpoint_id  {"checkpoint", "metadata"}
+    # writes     thread_id \0 w \0 ns \0 checkpoint_id  [[task_id, channel, value, write_idx, task_path], ...]
+
+    @staticmethod
+    def _key(kind: str, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return "\0".join((thread_id, kind, checkpoint_ns, checkpoint_id))
+
+    def _decode(self, raw: bytes | None, default: Any = None) -> Any:
+        if raw is None:
+            return default
+        type_, _, data = raw.partition(b"\0")
+        return self.serde.loads_typed((type_.decode(), data))
+
+    def _encode(self, value: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(value)
+        return type_.encode() + b"\0" + data
+
+    def _load(self, thread_id: str) -> dict:
+        return self._decode(self.store.get(thread_id), {"seq": 0, "ns": {}})
+
+    def _modify(self, key: str, change, default: Any) -> None:
+        """Applies change(value) atomically; change returns False to skip the write."""
+        def apply(raw: bytes | None) -> bytes | None:
+            value = self._decode(raw, default)
+            return None if change(value) is False else self._encode(value)
+        self.store.update(key, apply)
+
+    def _modify_index(self, thread_id: str, change) -> None:
+        """Applies change(index), which returns the entries it dropped; then deletes their keys."""
+        dropped: list[tuple[str, dict]] = []
+
+        def apply(index: dict) -> None:
+            dropped[:] = change(index)  # Reset on every attempt: RedisStore retries on conflict
+
+        self._modify(thread_id, apply, {"seq": 0, "ns": {}})
+        for checkpoint_ns, entry in dropped:
+            self.store.delete(self._key("c", thread_id, checkpoint_ns, entry["id"]))
+            self.store.delete(self._key("w", thread_id, checkpoint_ns, entry["id"]))
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, entry: dict) -> CheckpointTuple | None:
+        saved = self._decode(self.store.get(self._key("c", thread_id, checkpoint_ns, entry["id"])))
+        if saved is None:
+            return None  # Evicted by the store
+        writes = self._decode(self.store.get(self._key("w", thread_id, checkpoint_ns, entry["id"])), [])
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": entry["id"],
+            }},
+            checkpoint=self.serde.loads_typed(tuple(saved["checkpoint"])),
+            metadata=self.serde.loads_typed(tuple(saved["metadata"])),
+            parent_config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": entry["parent"],
+            }} if entry["parent"] else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(tuple(value)))
+                for task_id, channel, value, _, _ in writes
+            ],
+        )
+
+    # --- sync API ---
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entries = self._load(thread_id)["ns"].get(checkpoint_ns)
+        if not entries:
+            return None
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id is None:
+            return self._tuple(thread_id, checkpoint_ns, entries[-1])
+        for entry in entries:
+            if entry["id"] == checkpoint_id:
+                return self._tuple(thread_id, checkpoint_ns, entry)
+        return None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is None:
+            return  # Listing across all threads would need a full key scan.
+        thread_id = config["configurable"]["thread_id"]
+        wanted_ns = config["configurable"].get("checkpoint_ns")
+        checkpoint_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+        for checkpoint_ns, entries in self._load(thread_id)["ns"].items():
+            if wanted_ns is not None and checkpoint_ns != wanted_ns:
+                continue
+            for entry in reversed(entries):
+                if checkpoint_id and entry["id"] != checkpoint_id:
+                    continue
+                if before_id and entry["id"] >= before_id:
+                    continue
+                item = self._tuple(thread_id, checkpoint_ns, entry)
+                if item is None:
+                    continue
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        # Stored before the index points at it, so readers never see a dangling entry.
+        self.store.set(self._key("c", thread_id, checkpoint_ns, checkpoint["id"]), self._encode({
+            "checkpoint": list(self.serde.dumps_typed(checkpoint)),
+            "metadata": list(self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))),
+        }))
+        entry = {"id": checkpoint["id"], "parent": config["configurable"].get("checkpoint_id")}
+
+        def change(index: dict) -> list[tuple[str, dict]]:
+            index["seq"] += 1
+            namespaces = index["ns"]
+            dropped = []
+            if checkpoint_ns == "" and namespaces.get(""):
+                # Sub-graph namespaces older than the previous supervisor checkpoint
+                # belong to steps that already completed; nothing can resume them.
+                committed = namespaces[""][-1]["seq"]
+                for ns in [ns for ns in namespaces if ns and namespaces[ns][-1]["seq"] < committed]:
+                    dropped += [(ns, e) for e in namespaces.pop(ns)]
+            entries = namespaces.setdefault(checkpoint_ns, [])
+            entries.append({**entry, "seq": index["seq"]})
+            dropped += [(checkpoint_ns, e) for e in entries[:-self.keep]]
+            del entries[:-self.keep]
+            return dropped
+
+        self._modify_index(thread_id, change)
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        entries = self._load(thread_id)["ns"].get(checkpoint_ns, [])
+        if not any(entry["id"] == checkpoint_id for entry in entries):
+            return  # Checkpoint already pruned or evicted.
+        serialized = [
+            (WRITES_IDX_MAP.get(channel, idx), channel, list(self.serde.dumps_typed(value)))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+
+        def change(stored: list) -> None:
+            existing = {(w[0], w[3]) for w in stored}
+            for write_idx, channel, value in serialized:
+                if write_idx >= 0 and (task_id, write_idx) in existing:
+                    continue
+                stored[:] = [w for w in stored if (w[0], w[3]) != (task_id, write_idx)]
+                stored.append([task_id, channel, value, write_idx, task_path])
+
+        self._modify(self._key("w", thread_id, checkpoint_ns, checkpoint_id), change, [])
+
+    def delete_thread(self, thread_id: str) -> None:
+        for checkpoint_ns, entries in self._load(thread_id)["ns"].items():
+            for entry in entries:
+                self.store.delete(self._key("c", thread_id, checkpoint_ns, entry["id"]))
+                self.store.delete(self._key("w", thread_id, checkpoint_ns, entry["id"]))
+        self.store.delete(thread_id)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.delete_thread(thread_id)
+                continue
+            self._modify_index(thread_id, _keep_latest)
+
+    # --- async API ---
+    # Blocking stores (SQLite, Redis) run on a worker thread.
+
+    async def _run(self, fn, *args, **kwargs):
+        if self.store.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await self._run(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._run(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await self._run(self.prune, thread_ids, strategy=strategy)
+
+
+def _keep_latest(index: dict) -> list[tuple[str, dict]]:
+    dropped = []
+    for checkpoint_ns, entries in index["ns"].items():
+        dropped += [(checkpoint_ns, e) for e in entries[:-1]]
+        del entries[:-1]
+    return dropped
+
+
+def store_keys(max_threads: int, keep: int) -> int:
+    """
+    Store size for `max_threads` threads: an index per thread, and a
+    checkpoint and a writes key per retained checkpoint of the supervisor and
+    of up to three team namespaces.
+    """
+    return max_threads * (1 + 2 * keep * 4)
+
+
+def build_checkpointer(settings) -> BaseCheckpointSaver:
+    """Creates the checkpointer selected by `settings.CHECKPOINTER`."""
+    ttl = settings.CHECKPOINT_THREAD_TTL_SECONDS or None
+    keep = settings.CHECKPOINT_KEEP_PER_THREAD
+    max_keys = store_keys(settings.CHECKPOINT_MAX_THREADS, keep)
+    store = build_store(settings.CHECKPOINTER, "checkpoint", settings, max_keys, ttl)
+    return KVSaver(store, keep=keep)
@@ -0,0 +1,121 @@
+# app/compaction.py
+from dataclasses import dataclass
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# ==============================================================================
+# SUPERVISOR HISTORY COMPACTION
+# (Shrinks what is *sent* to the supervisor LLM; the checkpointed state keeps
+#  the full transcript.)
+# ==============================================================================
+
+SUMMARY_LINE_CHARS = 200 # Per-turn cap for the extractive summary
+SUMMARY_MAX_TURNS = 10 # Older dropped turns are left out of the summary entirely
+
+
+@dataclass
+class CompactionStats:
+    tokens_before: int
+    tokens_after: int
+    dropped_turns: int
+    truncated_reports: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def estimate_tokens(messages: list[BaseMessage]) -> int:
+    """Cheap token estimate (~4 chars/token) that needs no tokenizer."""
+    chars = 0
+    for message in messages:
+        chars += len(message.content) if isinstance(message.content, str) else len(str(message.content))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            chars += len(tool_call["name"]) + len(str(tool_call["args"]))
+    return chars // 4 + 4 * len(messages)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + f"... [truncated {len(text) - limit} chars]"
+
+
+def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Groups messages into turns, each starting at a HumanMessage."""
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _summarize(turns: list[list[BaseMessage]]) -> SystemMessage:
+    """Extractive recap of dropped turns: the question and the final answer of each."""
+    lines = []
+    for turn in turns[-SUMMARY_MAX_TURNS:]:
+        question = next((m.content for m in turn if isinstance(m, HumanMessage)), "")
+        answer = next(
+            (m.content for m in reversed(turn) if isinstance(m, AIMessage) and not m.tool_calls), ""
+        )
+        lines.append(
+            f"- User: {_truncate(str(question), SUMMARY_LINE_CHARS)}\n"
+            f"  Answer: {_truncate(str(answer), SUMMARY_LINE_CHARS)}"
+        )
+    return SystemMessage(content="Summary of the earlier conversation:\n" + "\n".join(lines))
+
+
+def compact_history(messages: list[BaseMessage],
+                    strategy: str,
+                    token_budget: int,
+                    tool_report_chars: int) -> tuple[list[BaseMessage], CompactionStats]:
+    """
+    Returns the messages to send to the supervisor plus what was saved.
+
+    - Team reports (ToolMessages) from earlier turns are truncated.
+    - "window": the oldest whole turns are dropped until the history fits
+      `token_budget`. Turns are never split, so every ToolMessage keeps the
+      AIMessage that requested it.
+    - "summary": like "window", but dropped turns are replaced by a short
+      extractive summary.
+    The current turn is always sent untouched.
+    """
+    if strategy not in ("none", "window", "summary"):
+        raise ValueError(f"Unknown compaction strategy '{strategy}' (expected none, window or summary).")
+    tokens_before = estimate_tokens(messages)
+    if strategy == "none" or not messages:
+        return messages, CompactionStats(tokens_before, tokens_before, 0, 0)
+
+    turns = _split_turns(messages)
+    *older, current = turns
+
+    truncated = 0
+    compacted_older = []
+    for turn in older:
+        compacted_turn = []
+        for message in turn:
+            if isinstance(message, ToolMessage) and len(str(message.content)) > tool_report_chars:
+                message = message.model_copy(
+                    update={"content": _truncate(str(message.content), tool_report_chars)}
+                )
+                truncated += 1
+            compacted_turn.append(message)
+        compacted_older.append(compacted_turn)
+
+    budget = token_budget - estimate_tokens(current)
+    kept: list[list[BaseMessage]] = []
+    for turn in reversed(compacted_older):
+        cost = estimate_tokens(turn)
+        if cost > budget:
+            break
+        kept.insert(0, turn)
+        budget -= cost
+
+    dropped = compacted_older[:len(compacted_older) - len(kept)]
+    result: list[BaseMessage] = []
+    if dropped and strategy == "summary":
+        result.append(_summarize(dropped))
+    for turn in kept:
+        result.extend(turn)
+    result.extend(current)
+
+    return result, CompactionStats(tokens_before, estimate_tokens(result), len(dropped), truncated)
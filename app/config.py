@@ -1,6 +1,8 @@
 # app/config.py
+from typing import Literal
 from pydantic import ConfigDict  
 from pydantic_settings import BaseSettings
+from .log import configure_logging, get_logger
 
 class Settings(BaseSettings):
     """Loads all environment variables"""
@@ -8,6 +10,139 @@ class Settings(BaseSettings):
     AIRTABLE_BASE_ID: str
     AIRTABLE_TOKEN: str
     SLACK_WEBHOOK_URL: str
+
+    # --- Upstream HTTP APIs (override to point at local stubs) ---
+    FAKESTORE_BASE_URL: str = "https://fakestoreapi.com"
+    DUMMYJSON_BASE_URL: str = "https://dummyjson.com"
+    UPSTREAM_TIMEOUT_SECONDS: float = 5
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE: int = 20
+    UPSTREAM_MAX_RETRIES: int = 2
+    UPSTREAM_BACKOFF_BASE_SECONDS: float = 0.1  # Full-jitter exponential backoff
+    UPSTREAM_BACKOFF_MAX_SECONDS: float = 1.0
+    UPSTREAM_BREAKER_FAILURES: int = 5  # Consecutive failures that open a breaker
+    UPSTREAM_BREAKER_RESET_SECONDS: float = 30  # Open breakers fail fast for this long
+
+    # --- Ticket outbox (Airtable + Slack delivery off the request path) ---
+    AIRTABLE_API_URL: str = "https://api.airtable.com/v0"
+    AIRTABLE_REFERENCE_FIELD: str = "TicketID"  # Airtable field that stores the ticket ID given to the customer (required)
+    OUTBOX_PATH: str = "outbox.sqlite"
+    OUTBOX_BATCH_SIZE: int = 10  # Airtable accepts up to 10 records per request
+    OUTBOX_MAX_ATTEMPTS: int = 8  # Then the ticket is dead-lettered
+    OUTBOX_RETRY_BASE_SECONDS: float = 2
+    OUTBOX_RETRY_MAX_SECONDS: float = 300
+    OUTBOX_POLL_SECONDS: float = 1
+
+    # --- Concurrency ---
+    # Team delegations / tool calls from a single LLM turn run concurrently.
+    MAX_PARALLEL_TOOL_CALLS: int = 4
+    TEAM_TIMEOUT_SECONDS: float = 120
+    TEAM_TIMEOUTS: dict[str, float] = {}  # Per-team override, e.g. {"orders_team_tool": 30}
+    TOOL_TIMEOUT_SECONDS: float = 30
+
+    # --- Request deadline (end-to-end budget of one /chat turn; 0 = none) ---
+    # Caps every wait inside the run: team and tool timeouts, LLM calls, upstream requests.
+    REQUEST_DEADLINE_SECONDS: float = 60
+    REQUEST_DEADLINE_MAX_SECONDS: float = 300  # Upper bound for ChatRequest.deadline_seconds
+
+    # --- Admission control for /chat/* (0 = unlimited) ---
+    ADMISSION_MAX_CONCURRENT: int = 32
+    ADMISSION_MAX_PER_THREAD: int = 1  # Turns of one conversation run one at a time
+    ADMISSION_MAX_PER_CLIENT: int = 8  # Client = X-Client-Id header, else the remote address
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10
+
+    # --- /chat/batch ---
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_MAX_CONCURRENCY: int = 8  # Keep <= ADMISSION_MAX_PER_CLIENT so items don't queue on their own cap
+
+    # --- /chat/stream (Server-Sent Events) ---
+    SSE_HEARTBEAT_SECONDS: float = 15  # Keep-alive comment after this much silence, so proxies keep the stream open (0 = off)
+    SSE_MAX_BUFFERED_EVENTS: int = 256  # Frames queued ahead of a slow client before the run waits for it
+
+    # --- Models per role ---
+    # route: the supervisor's first call on a new query (picks the teams)
+    # team: the team agents' tool calls and replies
+    # synthesis: the supervisor's answer from the team reports
+    LLM_MODEL: str = "openai/gpt-oss-120b"  # The large model; roles fall back to it on an invalid tool call
+    LLM_MAX_TOKENS: int = 2048
+    LLM_ROLE_MODELS: dict[str, str] = {  # Roles not listed use LLM_MODEL
+        "route": "openai/gpt-oss-20b",
+        "team": "openai/gpt-oss-20b",
+    }
+    LLM_ROLE_MAX_TOKENS: dict[str, int] = {"route": 512, "team": 1024}  # Includes reasoning tokens
+    LLM_FALLBACK_ENABLED: bool = True
+    LLM_PRICES: dict[str, list[float]] = {  # USD per million (input, output) tokens, for cost accounting
+        "openai/gpt-oss-120b": [0.09, 0.45],
+        "openai/gpt-oss-20b": [0.04, 0.16],
+    }
+
+    # --- Prompt layout (stable request prefixes, so provider-side prompt caching applies) ---
+    PROMPT_PREFIX_STATS_ENABLED: bool = True  # Measure prefix reuse per request (serializes each request once more)
+
+    # --- Outbound LLM rate limit, shared by the supervisor and all teams (0 = off) ---
+    LLM_REQUESTS_PER_SECOND: float = 10
+    LLM_BURST: int = 10
+
+    # --- LLM response cache (opt-in; only safe because temperature=0) ---
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: float = 3600
+    LLM_CACHE_PATH: str = "llm_cache.sqlite"  # "" keeps the cache in memory only; ignored when CACHE_BACKEND is shared
+
+    # --- Fast-path router (skips the supervisor LLM for obvious queries) ---
+    ROUTER_ENABLED: bool = True
+    ROUTER_MIN_CONFIDENCE: float = 0.9
+
+    # --- Speculative lookups (read-only team tools start while the supervisor LLM routes) ---
+    SPECULATION_ENABLED: bool = True  # Needs the tool cache: that is where the results are picked up
+    SPECULATION_MAX_LOOKUPS: int = 4  # Per turn
+
+    # --- Checkpointing (conversation state per thread_id) ---
+    CHECKPOINTER: str = "memory"  # memory | sqlite (single node) | redis (shared)
+    CHECKPOINT_SQLITE_PATH: str = "checkpoints.sqlite"  # Also holds shared caches and thread locks
+    CHECKPOINT_REDIS_URL: str = "redis://localhost:6379/0"  # Likewise
+    CHECKPOINT_MAX_THREADS: int = 10_000  # LRU bound on stored threads (sizes the store; see store_keys)
+    CHECKPOINT_THREAD_TTL_SECONDS: float = 24 * 3600  # Idle threads are evicted after this
+    CHECKPOINT_KEEP_PER_THREAD: int = 5  # Checkpoints retained per thread
+
+    # --- Multi-worker deployment (uvicorn --workers N, several dynos) ---
+    # Needs CHECKPOINTER=sqlite (one host) or redis (many hosts); turns of one
+    # thread are then serialized across workers by a lock in the same store.
+    CACHE_BACKEND: str = "memory"  # memory (per worker) | sqlite | redis: shared tier for the tool and LLM caches
+    THREAD_LOCK_TTL_SECONDS: float = 300  # A crashed worker's hold on a thread expires after this
+    WORKER_ID: str = ""  # Sent as X-Worker-Id; defaults to host:pid
+    AFFINITY_WORKERS: list[str] = []  # Worker base URLs behind the optional app.affinity:app router
+
+    # --- Supervisor history compaction (what is sent to the LLM each turn) ---
+    COMPACTION_STRATEGY: Literal["none", "window", "summary"] = "window"
+    COMPACTION_TOKEN_BUDGET: int = 4000  # Approximate token budget for the history
+    COMPACTION_TOOL_REPORT_CHARS: int = 500  # Team reports from earlier turns are cut to this
+
+    # --- Read-only tool cache ---
+    TOOL_CACHE_ENABLED: bool = True
+    TOOL_CACHE_MAX_ENTRIES: int = 2048
+    # Seconds per tool; tools not listed are never cached. Only lookups keyed by
+    # their arguments qualify: get_payment_details_tool answers for the current
+    # customer and is never cached (see SHARED_LOOKUP_TOOLS in app/tools.py).
+    TOOL_CACHE_TTLS: dict[str, float] = {
+        "get_order_status_tool": 60,
+        "get_refund_status_tool": 30,
+    }
+
+    # --- Tracing (spans always feed /metrics; export is optional) ---
+    TRACE_EXPORTER: str = "none"  # none | file | otlp
+    TRACE_FILE_PATH: str = "traces.jsonl"
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_SERVICE_NAME: str = "langgraph-multi-agent"
+
+    # --- Logging ---
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json | text
+    LOG_SAMPLE_RATES: dict[str, float] = {  # Fraction of conversations whose chatty events are logged
+        "team.step": 0.1,
+        "tool.call": 0.1,
+    }
     
     model_config = ConfigDict(
         env_file="app/.env",
@@ -17,4 +152,5 @@ class Settings(BaseSettings):
 # Create a single instance to import in other files
 settings = Settings()
 
-print("✅ Credentials loaded (Airtable, Slack, DeepInfra)")
\ No newline at end of file
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_SAMPLE_RATES)
+get_logger(__name__).debug("Credentials loaded (Airtable, Slack, DeepInfra)")
\ No newline at end of file
@@ -0,0 +1,78 @@
+# app/deadline.py
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# ==============================================================================
+# REQUEST DEADLINES
+# (One end-to-end time budget per turn, set by the API around the graph run.
+#  It travels in a context variable, so it reaches LangGraph's node tasks and
+#  threads and the nested team runs; every wait in the run is capped at what
+#  is left of it: team and tool timeouts, LLM calls, upstream HTTP requests.)
+# ==============================================================================
+
+class DeadlineExceeded(Exception):
+    """The turn ran out of its time budget."""
+
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    """Runs the block under a budget of `seconds` (None or 0 = none). A nested budget can only tighten it."""
+    expires = time.monotonic() + seconds if seconds else None
+    outer = _deadline.get()
+    if outer is not None and (expires is None or outer < expires):
+        expires = outer
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current budget; None when there is none."""
+    expires = _deadline.get()
+    return None if expires is None else max(0.0, expires - time.monotonic())
+
+
+def expired() -> bool:
+    return remaining() == 0.0
+
+
+def check(what: str) -> None:
+    """Raises DeadlineExceeded instead of starting `what` when the budget is spent."""
+    if expired():
+        raise DeadlineExceeded(f"deadline exceeded before {what}")
+
+
+def cap(timeout: float | None) -> float | None:
+    """`timeout` limited to the time left (either may be None = unbounded)."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+async def within(awaitable: Awaitable[T], what: str) -> T:
+    """Awaits `awaitable`, cancelling it with DeadlineExceeded when the budget runs out first."""
+    if expired():
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()  # Never started; avoids the "never awaited" warning
+        check(what)
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        async with asyncio.timeout(left):
+            return await awaitable
+    except TimeoutError:
+        if expired():
+            raise DeadlineExceeded(f"deadline exceeded during {what}") from None
+        raise
@@ -1,25 +1,38 @@
 # app/graph.py
 import json
+import uuid
 from typing import TypedDict, Annotated, Literal
 
 # --- Core LangChain/LangGraph ---
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableLambda
 from langchain_core.messages import (
     BaseMessage, HumanMessage, ToolMessage, AIMessage
 )
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Send
+from pydantic import BaseModel
 
 # --- Local Imports ---
-from .llm import llm
+from .config import settings
+from .checkpoint import build_checkpointer
+from .compaction import compact_history
+from .deadline import DeadlineExceeded, cap, check, within
+from .llm import llm, role_llms
+from .log import get_logger
+from .parallel import run_tool_calls, arun_tool_calls
+from .router import GREETING_REPLY, classify, router_stats
+from .speculation import speculate
+from .telemetry import span
+from .tiering import tiered_chain
 from .tools import (
     get_order_status_tool,
     get_refund_status_tool,
     get_payment_details_tool,
     create_support_ticket_tool
 )
+from .prompt_layout import build_layout
 from .prompts import (
     orders_app_prompt,
     refunds_payment_app_prompt,
@@ -27,45 +40,89 @@ from .prompts import (
     supervisor_prompt_ex
 )
 
+logger = get_logger(__name__)
+
 # ==============================================================================
 # STEP 1: CREATE SPECIALIST "TEAM" AGENTS
 # (This is your 'create_team_graph' factory)
 # ==============================================================================
 
+def _tool_message(tool_call: dict, tool_output) -> ToolMessage:
+    return ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call["id"])
+
+def _tool_error_message(tool_call: dict, e: Exception) -> ToolMessage:
+    return ToolMessage(content=f"Error: {e}", tool_call_id=tool_call["id"])
+
+def _tool_timeout(tool_call: dict) -> float:
+    return cap(settings.TOOL_TIMEOUT_SECONDS)
+
+def _record_tool_error(s, tool_output) -> None:
+    """Tools report failures as {"error": ...} rather than raising."""
+    if isinstance(tool_output, dict) and "error" in tool_output:
+        s.fail(tool_output["error"])
+
 def create_team_graph(system_prompt: str, 
-                      tools: list) -> StateGraph:
+                      tools: list,
+                      name: str = "team") -> StateGraph:
     
     class TeamState(TypedDict):
         messages: Annotated[list, add_messages]
         team_name: str
 
+    # Built once per graph: bind_tools serializes every tool schema, so doing
+    # it per step is pure overhead. The layout keeps the request prefix
+    # byte-stable (app/prompt_layout.py); runs on the "team" model (app/tiering.py).
+    layout = build_layout(name, system_prompt, tools)
+    agent_chain = tiered_chain("team", layout, role_llms["team"], llm)
+    tool_map = {tool.name: tool for tool in tools}
+
     def call_agent(state: TeamState):
-        print(f"\n    [Team: {state['team_name']}]: Agent thinking...")
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            MessagesPlaceholder(variable_name="messages"),
-        ])
-        agent_llm = llm.bind_tools(tools, tool_choice="auto")
-        chain = prompt | agent_llm
-        response = chain.invoke(state)
+        logger.info("Agent thinking", extra={"event": "team.step", "team": state["team_name"]})
+        check(f"{state['team_name']} LLM call")
+        with span("llm", state["team_name"]) as s:
+            response = agent_chain.invoke(state)
+            s.record_usage(response)
+        return {"messages": [response]}
+
+    async def acall_agent(state: TeamState):
+        logger.info("Agent thinking", extra={"event": "team.step", "team": state["team_name"]})
+        with span("llm", state["team_name"]) as s:
+            response = await within(agent_chain.ainvoke(state), f"{state['team_name']} LLM call")
+            s.record_usage(response)
         return {"messages": [response]}
 
     def call_tools(state: TeamState):
-        print(f"    [Team: {state['team_name']}]: Calling tools...")
+        logger.info("Calling tools", extra={"event": "team.step", "team": state["team_name"]})
         last_message = state["messages"][-1]
-        tool_map = {tool.name: tool for tool in tools}
-        tool_messages = []
-        for tool_call in last_message.tool_calls:
-            try:
-                tool_function = tool_map[tool_call["name"]]
-                tool_output = tool_function.invoke(tool_call["args"])
-                tool_messages.append(
-                    ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call["id"])
-                )
-            except Exception as e:
-                tool_messages.append(
-                    ToolMessage(content=f"Error: {e}", tool_call_id=tool_call["id"])
-                )
+
+        def run_one(tool_call: dict) -> ToolMessage:
+            tool_function = tool_map[tool_call["name"]]
+            with span("tool", tool_call["name"]) as s:
+                output = tool_function.invoke(tool_call["args"])
+                _record_tool_error(s, output)
+            return _tool_message(tool_call, output)
+
+        tool_messages = run_tool_calls(
+            last_message.tool_calls, run_one, _tool_error_message,
+            _tool_timeout, settings.MAX_PARALLEL_TOOL_CALLS
+        )
+        return {"messages": tool_messages}
+
+    async def acall_tools(state: TeamState):
+        logger.info("Calling tools", extra={"event": "team.step", "team": state["team_name"]})
+        last_message = state["messages"][-1]
+
+        async def arun_one(tool_call: dict) -> ToolMessage:
+            tool_function = tool_map[tool_call["name"]]
+            with span("tool", tool_call["name"]) as s:
+                output = await tool_function.ainvoke(tool_call["args"])
+                _record_tool_error(s, output)
+            return _tool_message(tool_call, output)
+
+        tool_messages = await arun_tool_calls(
+            last_message.tool_calls, arun_one, _tool_error_message,
+            _tool_timeout, settings.MAX_PARALLEL_TOOL_CALLS
+        )
         return {"messages": tool_messages}
 
     def should_continue(state: TeamState):
@@ -75,9 +132,11 @@ def create_team_graph(system_prompt: str,
         else:
             return END
 
+    # Each node carries a sync and an async body: .invoke() (run_test.py) uses the
+    # former, .ainvoke()/.astream() (the API) the latter.
     workflow = StateGraph(TeamState)
-    workflow.add_node("agent", call_agent)
-    workflow.add_node("tools", call_tools)
+    workflow.add_node("agent", RunnableLambda(call_agent, afunc=acall_agent))
+    workflow.add_node("tools", RunnableLambda(call_tools, afunc=acall_tools))
     workflow.set_entry_point("agent")
     workflow.add_conditional_edges("agent", should_continue, {"call_tools": "tools", END: END})
     workflow.add_edge("tools", "agent")
@@ -87,55 +146,130 @@ def create_team_graph(system_prompt: str,
 # --- Build and Compile the Teams ---
 orders_app = create_team_graph(
     orders_app_prompt,
-    [get_order_status_tool]
+    [get_order_status_tool],
+    "Orders",
 )
 
 refunds_payment_app = create_team_graph(
     refunds_payment_app_prompt,
-    [get_refund_status_tool, get_payment_details_tool]
+    [get_refund_status_tool, get_payment_details_tool],
+    "Refunds_Payment",
 )
 
 human_escalate_app = create_team_graph(
     human_escalate_app_prompt,
-    [create_support_ticket_tool]
+    [create_support_ticket_tool],
+    "Human_Escalation",
 )
 
-print("✅ Specialist Team graphs compiled.")
+logger.debug("Specialist Team graphs compiled.")
 
 # ==============================================================================
-# STEP 2: WRAP TEAMS IN @tool FOR THE SUPERVISOR
+# STEP 2: MOUNT TEAMS AS SUB-GRAPHS OF THE SUPERVISOR
+# (The supervisor LLM still delegates through tool calls, but the team tools
+#  are only schemas: every call is dispatched with Send to its team's node,
+#  which runs the compiled team graph as a sub-graph of the supervisor run.
+#  Team steps stream out under the team's namespace and are checkpointed, so
+#  a run resumed after a failure picks up inside the team.)
 # ==============================================================================
 
-@tool
-def orders_team_tool(query: str) -> str:
-    """Use this tool to delegate a task to the Order specialist team."""
-    print(f"  [Supervisor]: Delegating to Orders Team with query: '{query}'")
-    state = orders_app.invoke(
-        {"messages": [HumanMessage(content=query)], "team_name": "Orders"}
-    )
-    return state["messages"][-1].content
-
-@tool
-def refund_payment_team_tool(query: str) -> str:
-    """Use this tool to delegate a task to the Refund or Payment specialist team."""
-    print(f"  [Supervisor]: Delegating to Refunds_Payment Team with query: '{query}'")
-    state = refunds_payment_app.invoke(
-        {"messages": [HumanMessage(content=query)], "team_name": "Refunds_Payment"}
-    )
-    return state["messages"][-1].content
+class TeamQuery(BaseModel):
+    query: str
 
-@tool
-def human_escalation_team_tool(query: str) -> str:
+def create_team_tool(name: str, description: str) -> StructuredTool:
+    """Schema-only delegation tool; the call itself is executed by the team's node."""
+    return StructuredTool(name=name, description=description, args_schema=TeamQuery)
+
+class TeamTask(TypedDict):
+    tool_call: dict # The supervisor's (or router's) tool call being delegated
+
+def _team_query(tool_call: dict) -> str:
+    query = tool_call["args"].get("query")
+    if query is None:
+        raise ValueError("Team tool called without 'query' argument.")
+    return query
+
+def _team_error_message(tool_call: dict, e: Exception) -> ToolMessage:
+    return ToolMessage(content=f"Error executing team {tool_call['name']}: {e}", tool_call_id=tool_call["id"])
+
+def _team_timeout(tool_call: dict) -> float:
+    return cap(settings.TEAM_TIMEOUTS.get(tool_call["name"], settings.TEAM_TIMEOUT_SECONDS))
+
+def create_team_node(team_app, team_name: str) -> RunnableLambda:
     """
-    Use this tool to escalate a request to a human agent.
-    This is for modifications (add, delete, cancellations, updates),
-    or any topic not covered by the other specialist teams.
+    Supervisor node that runs one delegated tool call through `team_app` and
+    reports back with a ToolMessage. Invoked from inside the node, the team
+    graph inherits the run's config, so LangGraph nests it (streaming,
+    checkpoints) under this task's namespace.
     """
-    print(f"  [Supervisor]: Delegating to Human Escalation Team with query: '{query}'")
-    state = human_escalate_app.invoke(
-        {"messages": [HumanMessage(content=query)], "team_name": "Human_Escalation"}
-    )
-    return state["messages"][-1].content
+    def team_input(tool_call: dict) -> dict:
+        return {"messages": [HumanMessage(content=_team_query(tool_call))], "team_name": team_name}
+
+    def run_one(tool_call: dict) -> ToolMessage:
+        logger.info("Delegating to team", extra={"event": "supervisor.delegate", "team": team_name,
+                                                 "query": tool_call["args"].get("query")})
+        with span("team", team_name):
+            state = team_app.invoke(team_input(tool_call))
+        return ToolMessage(content=str(state["messages"][-1].content), tool_call_id=tool_call["id"])
+
+    async def arun_one(tool_call: dict) -> ToolMessage:
+        logger.info("Delegating to team", extra={"event": "supervisor.delegate", "team": team_name,
+                                                 "query": tool_call["args"].get("query")})
+        with span("team", team_name):
+            state = await team_app.ainvoke(team_input(tool_call))
+        return ToolMessage(content=str(state["messages"][-1].content), tool_call_id=tool_call["id"])
+
+    # Parallel delegations are separate Send tasks; run_tool_calls is only used
+    # here for its per-team timeout and error-report handling.
+    def run_team(task: TeamTask):
+        return {"messages": run_tool_calls([task["tool_call"]], run_one, _team_error_message, _team_timeout, 1)}
+
+    async def arun_team(task: TeamTask):
+        return {"messages": await arun_tool_calls([task["tool_call"]], arun_one, _team_error_message, _team_timeout, 1)}
+
+    return RunnableLambda(run_team, afunc=arun_team, name=team_name)
+
+orders_team_tool = create_team_tool(
+    "orders_team_tool",
+    "Use this tool to delegate a task to the Order specialist team.",
+)
+
+refund_payment_team_tool = create_team_tool(
+    "refund_payment_team_tool",
+    "Use this tool to delegate a task to the Refund or Payment specialist team.",
+)
+
+human_escalation_team_tool = create_team_tool(
+    "human_escalation_team_tool",
+    """Use this tool to escalate a request to a human agent.
+    This is for modifications (add, delete, cancellations, updates),
+    or any topic not covered by the other specialist teams.""",
+)
+
+# Team node name (also the `team` metadata and stream namespace) per delegation tool
+TEAM_NODES = {
+    orders_team_tool.name: "Orders",
+    refund_payment_team_tool.name: "Refunds_Payment",
+    human_escalation_team_tool.name: "Human_Escalation",
+}
+
+team_apps = {
+    "Orders": orders_app,
+    "Refunds_Payment": refunds_payment_app,
+    "Human_Escalation": human_escalate_app,
+}
+
+UNKNOWN_TEAM = "unknown_team"
+
+def unknown_team_node(task: TeamTask):
+    """Reports a tool call that names no team, so the supervisor sees an answer for every call."""
+    tool_call = task["tool_call"]
+    return {"messages": [_team_error_message(tool_call, KeyError(tool_call["name"]))]}
+
+def dispatch_teams(tool_calls: list[dict]) -> list[Send]:
+    """One Send per delegation; the team nodes run as parallel tasks of a single step."""
+    return [Send(TEAM_NODES.get(tool_call["name"], UNKNOWN_TEAM), {"tool_call": tool_call})
+            for tool_call in tool_calls]
 
 # ==============================================================================
 # STEP 3: DEFINE THE SUPERVISOR GRAPH
@@ -147,64 +281,205 @@ supervisor_tools = [
     human_escalation_team_tool
 ]
 
-supervisor_prompt = ChatPromptTemplate.from_messages([
-    ("system", supervisor_prompt_ex),
-    MessagesPlaceholder(variable_name="messages"),
-])
+# Routing and synthesis share one layout, so both send the same prefix.
+supervisor_layout = build_layout("supervisor", supervisor_prompt_ex, supervisor_tools)
+
+# A new query is routed on the "route" model; the answer written from the
+# team reports comes from the "synthesis" model (see app/tiering.py).
+supervisor_chain = tiered_chain("route", supervisor_layout, role_llms["route"], llm)
+synthesis_chain = tiered_chain("synthesis", supervisor_layout, role_llms["synthesis"], llm)
 
 class SupervisorState(TypedDict):
     messages: Annotated[list, add_messages]
 
+def supervisor_input(state: SupervisorState) -> dict:
+    """Compacts the transcript before it is sent to the supervisor LLM."""
+    messages, stats = compact_history(
+        state["messages"],
+        settings.COMPACTION_STRATEGY,
+        settings.COMPACTION_TOKEN_BUDGET,
+        settings.COMPACTION_TOOL_REPORT_CHARS,
+    )
+    if stats.tokens_saved:
+        logger.info("History compacted", extra={
+            "event": "supervisor.compaction",
+            "tokens_before": stats.tokens_before,
+            "tokens_after": stats.tokens_after,
+            "dropped_turns": stats.dropped_turns,
+            "truncated_reports": stats.truncated_reports,
+        })
+    return {"messages": messages}
+
+def supervisor_role_chain(messages: list[BaseMessage]):
+    """The synthesis chain once team reports are in, else the routing chain."""
+    return synthesis_chain if messages and isinstance(messages[-1], ToolMessage) else supervisor_chain
+
 def call_supervisor_node(state: SupervisorState):
     """The main LLM call for the supervisor."""
-    print("\n--- Supervisor: Analyzing Request ---")
-    supervisor_llm = llm.bind_tools(supervisor_tools, tool_choice="auto")
-    supervisor_chain = supervisor_prompt | supervisor_llm
-    response = supervisor_chain.invoke(state)
+    logger.info("Analyzing request", extra={"event": "supervisor.step"})
+    with span("supervisor", "turn"), speculate(state["messages"]) as speculation:
+        messages = supervisor_input(state)
+        check("supervisor LLM call")
+        with span("llm", "supervisor") as s:
+            response = supervisor_role_chain(state["messages"]).invoke(messages)
+            s.record_usage(response)
+        speculation.settle(response)
     return {"messages": [response]}
 
-def call_teams_node(state: SupervisorState):
-    """This node executes the 'team' tools."""
-    print("--- Supervisor: Executing Team Tasks ---")
-    last_message = state["messages"][-1]
-    tool_map = {tool.name: tool for tool in supervisor_tools}
-    tool_messages = []
-
-    for tool_call in last_message.tool_calls:
-        try:
-            tool_function = tool_map[tool_call["name"]]
-            query = tool_call["args"].get("query")
-            if query is None:
-                raise ValueError("Team tool called without 'query' argument.")
-            tool_output = tool_function.invoke(query) # This invokes the sub-graph
-            tool_messages.append(
-                ToolMessage(content=str(tool_output), tool_call_id=tool_call["id"])
-            )
-        except Exception as e:
-            tool_messages.append(
-                ToolMessage(content=f"Error executing team {tool_call['name']}: {e}", tool_call_id=tool_call["id"])
+async def acall_supervisor_node(state: SupervisorState):
+    """Async variant of call_supervisor_node."""
+    logger.info("Analyzing request", extra={"event": "supervisor.step"})
+    with span("supervisor", "turn"), speculate(state["messages"]) as speculation:
+        messages = supervisor_input(state)
+        with span("llm", "supervisor") as s:
+            response = await within(
+                supervisor_role_chain(state["messages"]).ainvoke(messages), "supervisor LLM call"
             )
-    return {"messages": tool_messages}
+            s.record_usage(response)
+        speculation.settle(response)
+    return {"messages": [response]}
 
-def should_continue(state: SupervisorState) -> Literal["call_teams", END]:
+def should_continue(state: SupervisorState) -> list[Send] | Literal[END]:
     """Main router for the supervisor."""
     last_message = state["messages"][-1]
     if isinstance(last_message, AIMessage) and last_message.tool_calls:
-        return "call_teams"
+        logger.info("Executing team tasks", extra={"event": "supervisor.step", "teams": len(last_message.tool_calls)})
+        return dispatch_teams(last_message.tool_calls)
     else:
         return END
 
+def teams_done_node(state: SupervisorState):
+    """Joins the parallel team tasks; runs once after all of them reported."""
+    return {"messages": []}
+
+# ==============================================================================
+# STEP 4: FAST PATH IN FRONT OF THE SUPERVISOR
+# (High-confidence queries skip both supervisor LLM calls; see app/router.py)
+# ==============================================================================
+
+ROUTER_NAME = "router" # AIMessage.name of messages produced by the fast path
+
+def route_node(state: SupervisorState):
+    """Answers greetings and dispatches single-intent queries without the LLM."""
+    query = state["messages"][-1].content
+    route = classify(query) if settings.ROUTER_ENABLED else None
+    if route is None or route.confidence < settings.ROUTER_MIN_CONFIDENCE:
+        router_stats.record("llm")
+        return {"messages": []}
+
+    router_stats.record(route.target)
+    logger.info("Fast path", extra={"event": "router.hit", "target": route.target, "confidence": route.confidence})
+    if route.target == "greeting":
+        return {"messages": [AIMessage(content=GREETING_REPLY, name=ROUTER_NAME)]}
+    tool_call = {"name": route.target, "args": {"query": query}, "id": f"router_{uuid.uuid4().hex[:12]}"}
+    return {"messages": [AIMessage(content="", tool_calls=[tool_call], name=ROUTER_NAME)]}
+
+def after_router(state: SupervisorState) -> list[Send] | Literal["supervisor", END]:
+    last_message = state["messages"][-1]
+    if not (isinstance(last_message, AIMessage) and last_message.name == ROUTER_NAME):
+        return "supervisor"
+    return dispatch_teams(last_message.tool_calls) if last_message.tool_calls else END
+
+def after_teams(state: SupervisorState) -> Literal["supervisor", "router_answer"]:
+    """Fast-path delegations answer directly unless a team failed."""
+    messages = state["messages"]
+    requester = next(m for m in reversed(messages) if isinstance(m, AIMessage))
+    reports = messages[messages.index(requester) + 1:]
+    if requester.name == ROUTER_NAME and not any(
+        str(report.content).startswith("Error executing team") for report in reports
+    ):
+        return "router_answer"
+    return "supervisor"
+
+def router_answer_node(state: SupervisorState):
+    """The team's reply is already user-facing, so it becomes the final answer."""
+    messages = state["messages"]
+    reports = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        reports.insert(0, str(message.content))
+    return {"messages": [AIMessage(content="\n\n".join(reports), name=ROUTER_NAME)]}
+
 # --- Build the Supervisor Graph ---
-workflow = StateGraph(SupervisorState)
-workflow.add_node("supervisor", call_supervisor_node)
-workflow.add_node("call_teams", call_teams_node)
+supervisor_graph = StateGraph(SupervisorState)
+supervisor_graph.add_node("router", route_node)
+supervisor_graph.add_node("supervisor", RunnableLambda(call_supervisor_node, afunc=acall_supervisor_node))
+# The metadata tags every nested run (and streamed token) with its team.
+for team_name, team_app in team_apps.items():
+    supervisor_graph.add_node(
+        team_name, create_team_node(team_app, team_name), input_schema=TeamTask, metadata={"team": team_name}
+    )
+supervisor_graph.add_node(UNKNOWN_TEAM, unknown_team_node, input_schema=TeamTask)
+supervisor_graph.add_node("teams_done", teams_done_node)
+supervisor_graph.add_node("router_answer", router_answer_node)
 
-workflow.set_entry_point("supervisor")
-workflow.add_conditional_edges("supervisor", should_continue, {"call_teams": "call_teams", END: END})
-workflow.add_edge("call_teams", "supervisor")
+supervisor_graph.set_entry_point("router")
+supervisor_graph.add_conditional_edges("router", after_router, ["supervisor", *team_apps, UNKNOWN_TEAM, END])
+supervisor_graph.add_conditional_edges("supervisor", should_continue, [*team_apps, UNKNOWN_TEAM, END])
+for team_node in [*team_apps, UNKNOWN_TEAM]:
+    supervisor_graph.add_edge(team_node, "teams_done")
+supervisor_graph.add_conditional_edges(
+    "teams_done", after_teams, {"supervisor": "supervisor", "router_answer": "router_answer"}
+)
+supervisor_graph.add_edge("router_answer", END)
 
 # --- Compile the Final App ---
-memory = InMemorySaver()
-workflow = workflow.compile(checkpointer=memory)
+# Bounded, pluggable checkpointer (see app/checkpoint.py and CHECKPOINTER setting)
+checkpointer = build_checkpointer(settings)
+workflow = supervisor_graph.compile(checkpointer=checkpointer)
+
+logger.debug("Supervisor Graph compiled. Application is ready.")
+
+# ==============================================================================
+# STEP 5: TURNS CUT OFF BY THE REQUEST DEADLINE
+# (The run is cancelled wherever it was; see app/deadline.py. The turn is then
+#  closed in the checkpoint with a partial answer: team reports that already
+#  came in are kept, every other delegation gets an error report, so the
+#  thread is valid for the next query.)
+# ==============================================================================
+
+DEADLINE_REPLY = "Sorry, this is taking longer than it should. Please try again in a moment."
+DEADLINE_PARTIAL_REPLY = "I ran out of time before finishing. Here is what I found so far:"
+
+def deadline_messages(snapshot) -> list[BaseMessage]:
+    """The messages that close the turn cut off in `snapshot`; none if it had finished."""
+    messages = list(snapshot.values.get("messages", []))
+    # Team tasks that finished in the interrupted step are still pending writes.
+    finished = [message for task in snapshot.tasks if isinstance(task.result, dict)
+                for message in task.result.get("messages", [])]
+    start = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), -1)
+    turn = messages[start + 1:] + finished
+    if start < 0 or (turn and isinstance(turn[-1], AIMessage) and not turn[-1].tool_calls):
+        return []
+
+    answered = {m.tool_call_id for m in turn if isinstance(m, ToolMessage)}
+    requests = [m for m in turn if isinstance(m, AIMessage) and m.tool_calls]
+    unanswered = [
+        _team_error_message(tool_call, DeadlineExceeded("deadline exceeded"))
+        for tool_call in (requests[-1].tool_calls if requests else [])
+        if tool_call["id"] not in answered
+    ]
+    reports = [str(m.content) for m in turn
+               if isinstance(m, ToolMessage) and not str(m.content).startswith("Error executing team")]
+    reply = "\n\n".join([DEADLINE_PARTIAL_REPLY, *reports, DEADLINE_REPLY]) if reports else DEADLINE_REPLY
+    return [*finished, *unanswered, AIMessage(content=reply)]
+
+def close_turn(app, config) -> str:
+    """Closes a turn cut off by its deadline in the thread's checkpoint; returns the answer it ends with."""
+    snapshot = app.get_state(config)
+    messages = deadline_messages(snapshot)
+    if not messages:
+        return str(snapshot.values["messages"][-1].content) if snapshot.values.get("messages") else DEADLINE_REPLY
+    # As router_answer: its only edge is to END, so nothing is left to run on this thread.
+    app.update_state(config, {"messages": messages}, as_node="router_answer")
+    return str(messages[-1].content)
 
-print("✅ Supervisor Graph compiled. Application is ready.")
\ No newline at end of file
+async def aclose_turn(app, config) -> str:
+    """Async variant of close_turn."""
+    snapshot = await app.aget_state(config)
+    messages = deadline_messages(snapshot)
+    if not messages:
+        return str(snapshot.values["messages"][-1].content) if snapshot.values.get("messages") else DEADLINE_REPLY
+    await app.aupdate_state(config, {"messages": messages}, as_node="router_answer")
+    return str(messages[-1].content)
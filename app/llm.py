@@ -1,14 +1,59 @@
 # app/llm.py
 from langchain_community.chat_models import ChatDeepInfra
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from .config import settings
+from .llm_cache import build_llm_cache
+from .log import get_logger
+from .telemetry import Counter, Gauge
 
-# Initialize your LLM here, pulling the key from config
-llm = ChatDeepInfra(
-    api_key=settings.DEEPINFRA_API_KEY,
-    model='openai/gpt-oss-120b',
-    temperature=0,
-    max_tokens=2048,
-    model_kwargs={"tool_choice": "auto"}
-)
+# Token bucket in front of every LLM call. All chains are built from the
+# models below and every model gets this one limiter, so the supervisor and
+# every team draw from the same bucket.
+rate_limiter = InMemoryRateLimiter(
+    requests_per_second=settings.LLM_REQUESTS_PER_SECOND,
+    max_bucket_size=settings.LLM_BURST,
+    check_every_n_seconds=0.01,
+) if settings.LLM_REQUESTS_PER_SECOND > 0 else None
 
-print("✅ LLM (DeepInfra) initialized.")
\ No newline at end of file
+# Opt-in response cache; keyed on the normalized messages, model params and bound tools.
+llm_cache = build_llm_cache(settings)
+
+if llm_cache is not None:
+    Counter(
+        "agent_llm_cache_events_total",
+        "LLM cache lookups (memory_hits, store_hits from the second tier, misses, skipped as not cacheable) "
+        "and stores of fresh responses.",
+        ("event",),
+        read=lambda: {(event,): count for event, count in llm_cache.stats().items() if event in llm_cache.counters},
+    )
+    Gauge("agent_llm_cache_memory_entries", "Responses held in the LLM cache's memory tier.", (),
+          read=lambda: {(): llm_cache.stats()["memory_entries"]})
+
+ROLES = ("route", "team", "synthesis")
+
+def build_llm(model: str, max_tokens: int) -> ChatDeepInfra:
+    return ChatDeepInfra(
+        api_key=settings.DEEPINFRA_API_KEY,
+        model=model,
+        temperature=0,
+        max_tokens=max_tokens,
+        model_kwargs={"tool_choice": "auto"},
+        rate_limiter=rate_limiter,
+        cache=llm_cache,
+    )
+
+# The large model, and the fallback of every role (see app/tiering.py)
+llm = build_llm(settings.LLM_MODEL, settings.LLM_MAX_TOKENS)
+
+def _role_llm(role: str) -> ChatDeepInfra:
+    """The role's model; roles configured like the large model share it."""
+    model = settings.LLM_ROLE_MODELS.get(role, settings.LLM_MODEL)
+    max_tokens = settings.LLM_ROLE_MAX_TOKENS.get(role, settings.LLM_MAX_TOKENS)
+    if (model, max_tokens) == (settings.LLM_MODEL, settings.LLM_MAX_TOKENS):
+        return llm
+    return build_llm(model, max_tokens)
+
+role_llms = {role: _role_llm(role) for role in ROLES}
+
+get_logger(__name__).debug("LLMs (DeepInfra) initialized.",
+                           extra={"models": {role: m.model_name for role, m in role_llms.items()}})
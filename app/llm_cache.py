@@ -0,0 +1,179 @@
+# app/llm_cache.py
+import hashlib
+import json
+import threading
+import time
+import uuid
+import warnings
+from collections import OrderedDict
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+from .store import SqliteStore, build_store
+
+# ==============================================================================
+# LLM RESPONSE CACHE
+# (Plugged into the shared chat model via `cache=`, so every chain built from
+#  it is covered. Two tiers: an in-memory LRU in front of an optional store
+#  (a SQLite file, or the CACHE_BACKEND shared by all workers), both with a TTL.)
+# ==============================================================================
+
+warnings.filterwarnings("ignore", message="The function `loads` is in beta")
+
+# Message fields that vary between identical requests and are left out of the key.
+_VOLATILE_FIELDS = {"id", "response_metadata", "usage_metadata", "additional_kwargs", "invalid_tool_calls"}
+
+
+def _normalize(prompt: str) -> list[dict] | None:
+    """
+    Reduces the serialized message list LangChain passes to the cache to what
+    the model actually sees: type, content (whitespace collapsed), name and
+    tool calls. Tool-call IDs are replaced by their position, so the same
+    exchange matches across runs.
+
+    Returns None when the current turn (after the last human message) holds
+    tool results: those are live order/refund data and must not be replayed.
+    """
+    messages = json.loads(prompt)
+    normalized, call_index = [], {}
+    last_human = max((i for i, m in enumerate(messages) if m["kwargs"].get("type") == "human"), default=-1)
+    for i, message in enumerate(messages):
+        fields = message["kwargs"]
+        kind = fields.get("type")
+        if kind == "tool" and i > last_human:
+            return None
+        entry = {k: v for k, v in fields.items() if k not in _VOLATILE_FIELDS}
+        if isinstance(entry.get("content"), str):
+            entry["content"] = " ".join(entry["content"].split())
+        if entry.get("tool_calls"):
+            entry["tool_calls"] = [
+                {"name": tc["name"], "args": tc["args"], "id": call_index.setdefault(tc.get("id"), len(call_index))}
+                for tc in entry["tool_calls"]
+            ]
+        if kind == "tool":
+            entry["tool_call_id"] = call_index.get(entry.get("tool_call_id"), entry.get("tool_call_id"))
+        normalized.append(entry)
+    return normalized
+
+
+def _strip(return_val: RETURN_VAL_TYPE) -> RETURN_VAL_TYPE:
+    """Drops per-run identifiers before storing, so replays get fresh ones."""
+    stripped = []
+    for generation in return_val:
+        message = getattr(generation, "message", None)
+        if message is not None:
+            kwargs = {k: v for k, v in message.additional_kwargs.items() if k != "tool_calls"}
+            generation = generation.model_copy(
+                update={"message": message.model_copy(update={"id": None, "additional_kwargs": kwargs})}
+            )
+        stripped.append(generation)
+    return stripped
+
+
+def _fresh_tool_call_ids(return_val: RETURN_VAL_TYPE) -> RETURN_VAL_TYPE:
+    for generation in return_val:
+        for tool_call in getattr(getattr(generation, "message", None), "tool_calls", None) or []:
+            tool_call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+    return return_val
+
+
+class LLMCache(BaseCache):
+    """
+    Two-tier cache of LLM generations keyed on (normalized messages, model
+    params + bound tool schemas). `llm_string` already carries the params and
+    the tools passed through bind_tools.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "store_hits": 0, "misses": 0, "skipped": 0, "stores": 0}
+
+    def _key(self, prompt: str, llm_string: str) -> str | None:
+        normalized = _normalize(prompt)
+        if normalized is None:
+            return None
+        raw = json.dumps(normalized, sort_keys=True, default=str) + "\0" + llm_string
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            if key is None:
+                self.counters["skipped"] += 1
+                return None
+            item = self._memory.get(key)
+            if item is not None and item[1] >= now:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                value = item[0]
+            else:
+                value = None
+        if value is None and self.store is not None:
+            raw = self.store.get(key)
+            entry = json.loads(raw) if raw is not None else None
+            if entry is not None and entry["expires_at"] >= now:
+                value = entry["value"]
+                with self._lock:
+                    self._remember(key, value, entry["expires_at"])
+                    self.counters["store_hits"] += 1
+        if value is None:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+        return _fresh_tool_call_ids(loads(value, allowed_objects=[ChatGeneration, Generation, AIMessage]))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        if key is None:
+            return
+        value = dumps(_strip(return_val))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self.counters["stores"] += 1
+        if self.store is not None:
+            self.store.set(key, json.dumps({"value": value, "expires_at": expires_at}).encode())
+
+    def clear(self, **kwargs) -> None:
+        """Clears the memory tier; store entries run out on their TTL."""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._memory)
+        hits = counters["memory_hits"] + counters["store_hits"]
+        lookups = hits + counters["misses"]
+        return {**counters, "memory_entries": entries, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+
+
+def build_llm_cache(settings) -> LLMCache | None:
+    """
+    The LLM cache is opt-in (LLM_CACHE_ENABLED). Its second tier is the shared
+    CACHE_BACKEND when there is one, else the local LLM_CACHE_PATH file.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    max_entries, ttl = settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS
+    if settings.CACHE_BACKEND != "memory":
+        store = build_store(settings.CACHE_BACKEND, "llm_cache", settings, max_entries * 10, ttl)
+    elif settings.LLM_CACHE_PATH:
+        store = SqliteStore(settings.LLM_CACHE_PATH, max_entries * 10, ttl, table="llm")
+    else:
+        store = None
+    return LLMCache(max_entries, ttl, store)
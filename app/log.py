@@ -0,0 +1,127 @@
+# app/log.py
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import zlib
+from datetime import datetime, timezone
+
+# ==============================================================================
+# STRUCTURED LOGGING
+# (Records are queued by the caller and written by a background listener, so
+#  the event loop never blocks on stdout. Output is JSON lines carrying the
+#  LangGraph thread_id; chatty events can be sampled per conversation.)
+# ==============================================================================
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def current_thread_id() -> str | None:
+    """thread_id of the LangGraph run executing in this context, if any."""
+    # Looked up lazily: until langchain_core is imported no run can be active,
+    # and importing it here would slow down every cold start.
+    runnable_config = sys.modules.get("langchain_core.runnables.config")
+    if runnable_config is None:
+        return None
+    config = runnable_config.var_child_runnable_config.get() or {}
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Adds `thread_id` (from `extra=` or the current runnable config) and drops
+    sampled-out records. Records carrying an `event` listed in `sample_rates`
+    are kept at that rate; the decision is made per thread_id, so a sampled
+    conversation is logged completely. WARNING and above are always kept.
+    """
+
+    def __init__(self, sample_rates: dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "thread_id", None) is None:
+            record.thread_id = current_thread_id()
+        rate = self.sample_rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if record.thread_id is None:
+            return random.random() < rate
+        return zlib.crc32(record.thread_id.encode()) / 0xFFFFFFFF < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local runs: `time level logger [thread] msg key=value...`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        extras = " ".join(
+            f"{k}={v}" for k, v in vars(record).items()
+            if k not in _RESERVED and k not in ("thread_id", "event") and v is not None
+        )
+        thread = f" [{record.thread_id}]" if getattr(record, "thread_id", None) else ""
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}{thread} {record.getMessage()}"
+        if extras:
+            line += f"  {extras}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", sample_rates: dict[str, float] | None = None) -> None:
+    """
+    Routes the "app" logger through a QueueHandler; a QueueListener thread
+    does the actual writing to stderr. Safe to call again to reconfigure.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(ContextFilter(sample_rates or {}))
+
+    logger = logging.getLogger("app")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def _flush_on_exit() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_flush_on_exit)
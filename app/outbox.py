@@ -0,0 +1,225 @@
+# app/outbox.py
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# TICKET OUTBOX
+# (Escalation tickets are persisted locally and acknowledged immediately; a
+#  background worker delivers them to Airtable and Slack.)
+# ==============================================================================
+
+InsertBatch = Callable[[list[str], list[str]], list[tuple[str, str]]]
+Notify = Callable[[str, str, str, str], None]
+
+
+class TicketOutbox:
+    """
+    Durable SQLite queue of support tickets.
+
+    Delivery runs in two stages per ticket, each retried independently:
+    1. Airtable insert, batched up to `batch_size` tickets per call.
+    2. Slack notification, once the Airtable record (and its link) exists.
+    Failures back off exponentially; after `max_attempts` a ticket is moved to
+    the "dead" status (dead letter) and left for an operator.
+
+    Several worker processes may share the file: each batch is claimed by
+    pushing its next attempt `claim_seconds` ahead, so no two workers deliver
+    the same ticket, and a crashed worker's batch is picked up again later.
+    """
+
+    def __init__(self,
+                 path: str,
+                 insert_batch: InsertBatch,
+                 notify: Notify,
+                 *,
+                 batch_size: int = 10,
+                 max_attempts: int = 8,
+                 retry_base: float = 2.0,
+                 retry_max: float = 300.0,
+                 poll_interval: float = 1.0,
+                 claim_seconds: float = 60.0):
+        self.insert_batch = insert_batch
+        self.notify = notify
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.claim_seconds = claim_seconds
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")  # An acknowledged ticket must survive a crash
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tickets ("
+            "provisional_id TEXT PRIMARY KEY, "
+            "concern TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "  # pending | delivered | dead
+            "ticket_id TEXT, "
+            "record_url TEXT, "
+            "slack_sent INTEGER NOT NULL DEFAULT 0, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, "
+            "last_error TEXT, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tickets_due ON tickets (status, next_attempt_at)")
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    # --- producer side ---
+
+    def enqueue(self, concern: str) -> str:
+        """Persists a ticket and returns its provisional ID right away."""
+        provisional_id = f"T-{uuid.uuid4().hex[:8].upper()}"
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tickets (provisional_id, concern, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (provisional_id, concern, now, now),
+            )
+        self.start()
+        self._wake.set()
+        return provisional_id
+
+    # --- worker side ---
+
+    def _due(self) -> list[tuple]:
+        """Claims up to `batch_size` due tickets."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT provisional_id, concern, ticket_id, record_url, slack_sent, attempts "
+                    "FROM tickets WHERE status = 'pending' AND next_attempt_at <= ? "
+                    "ORDER BY created_at LIMIT ?",
+                    (now, self.batch_size),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE tickets SET next_attempt_at = ? WHERE provisional_id = ?",
+                    [(now + self.claim_seconds, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return rows
+
+    def _update(self, sql: str, *params) -> None:
+        with self._lock:
+            self._conn.execute(sql, params)
+
+    def _fail(self, provisional_id: str, attempts: int, error: Exception) -> None:
+        attempts += 1
+        if attempts >= self.max_attempts:
+            self._update(
+                "UPDATE tickets SET status = 'dead', attempts = ?, last_error = ? WHERE provisional_id = ?",
+                attempts, str(error), provisional_id,
+            )
+            logger.error("Ticket dead-lettered", extra={
+                "event": "outbox.dead", "ticket": provisional_id, "attempts": attempts, "error": str(error)
+            })
+            return
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        self._update(
+            "UPDATE tickets SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE provisional_id = ?",
+            attempts, time.time() + delay, str(error), provisional_id,
+        )
+
+    def drain_once(self) -> int:
+        """Delivers one batch of due tickets. Returns how many were processed."""
+        rows = self._due()
+        if not rows:
+            return 0
+
+        # Stage 1: one batched Airtable insert for every ticket not yet stored.
+        to_insert = [row for row in rows if row[2] is None]
+        links: dict[str, tuple[str, str]] = {}
+        if to_insert:
+            try:
+                results = self.insert_batch([row[0] for row in to_insert], [row[1] for row in to_insert])
+                for row, (ticket_id, record_url) in zip(to_insert, results):
+                    links[row[0]] = (ticket_id, record_url)
+                    self._update(
+                        "UPDATE tickets SET ticket_id = ?, record_url = ? WHERE provisional_id = ?",
+                        ticket_id, record_url, row[0],
+                    )
+            except Exception as e:
+                for row in to_insert:
+                    self._fail(row[0], row[5], e)
+
+        # Stage 2: Slack notification for every ticket that has a record.
+        for provisional_id, concern, ticket_id, record_url, slack_sent, attempts in rows:
+            ticket_id, record_url = links.get(provisional_id, (ticket_id, record_url))
+            if ticket_id is None:
+                continue
+            if not slack_sent:
+                try:
+                    self.notify(ticket_id, concern, record_url, provisional_id)
+                except Exception as e:
+                    self._fail(provisional_id, attempts, e)
+                    continue
+            self._update(
+                "UPDATE tickets SET slack_sent = 1, status = 'delivered', last_error = NULL "
+                "WHERE provisional_id = ?",
+                provisional_id,
+            )
+        return len(rows)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception:
+                logger.exception("Outbox worker error")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        """Starts the delivery worker thread (idempotent)."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="ticket-outbox", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops the worker; pending tickets stay queued for the next start."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    # --- operations ---
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tickets GROUP BY status").fetchall()
+        return {"pending": 0, "delivered": 0, "dead": 0, **dict(rows)}
+
+    def retry_dead(self) -> int:
+        """Moves dead-lettered tickets back to pending. Returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tickets SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                "WHERE status = 'dead'",
+                (time.time(),),
+            )
+        self._wake.set()
+        return cursor.rowcount
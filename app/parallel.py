@@ -0,0 +1,102 @@
+# app/parallel.py
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Awaitable, Callable
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+from .deadline import DeadlineExceeded, expired
+
+# ==============================================================================
+# CONCURRENT TOOL-CALL EXECUTION
+# (Shared by the supervisor's team nodes and every team's call_tools node)
+# ==============================================================================
+
+RunOne = Callable[[dict], ToolMessage]
+ARunOne = Callable[[dict], Awaitable[ToolMessage]]
+OnError = Callable[[dict, Exception], ToolMessage]
+TimeoutFor = Callable[[dict], float | None]
+
+
+def run_tool_calls(tool_calls: list[dict],
+                   run_one: RunOne,
+                   on_error: OnError,
+                   timeout_for: TimeoutFor,
+                   max_workers: int) -> list[ToolMessage]:
+    """
+    Runs `run_one` for every tool call, at most `max_workers` at a time.
+    Results come back in `tool_calls` order; a failure or timeout in one call
+    becomes that call's error ToolMessage and does not affect the others.
+    Running out of the request's deadline is not reported per call: it
+    raises DeadlineExceeded and ends the run.
+    """
+    if not tool_calls:
+        return []
+
+    # As in arun_tool_calls, a call's timeout starts when it gets a slot, and
+    # a call that timed out gives its slot up. Its thread can't be stopped, so
+    # the pool has a thread per call and the slots are counted here instead.
+    # ContextThreadPoolExecutor copies contextvars, so callbacks/tracing config
+    # still reaches the nested runs.
+    pool = ContextThreadPoolExecutor(max_workers=len(tool_calls))
+    slots = max(1, max_workers)
+    queued = list(enumerate(tool_calls))
+    running: dict[Future, tuple[int, float | None, float]] = {}  # future -> (index, timeout, started)
+    messages: list[ToolMessage | None] = [None] * len(tool_calls)
+    try:
+        while queued or running:
+            while queued and len(running) < slots:
+                index, tool_call = queued.pop(0)
+                running[pool.submit(run_one, tool_call)] = (index, timeout_for(tool_call), time.monotonic())
+            deadlines = [started + timeout for _, timeout, started in running.values() if timeout is not None]
+            wait(running, timeout=max(0.0, min(deadlines) - time.monotonic()) if deadlines else None,
+                 return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, (index, timeout, started) in list(running.items()):
+                tool_call = tool_calls[index]
+                if future.done():
+                    del running[future]
+                    try:
+                        messages[index] = future.result()
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        messages[index] = on_error(tool_call, e)
+                elif timeout is not None and now >= started + timeout:
+                    del running[future]
+                    future.cancel()
+                    if expired():
+                        raise DeadlineExceeded(f"deadline exceeded waiting for {tool_call['name']}")
+                    messages[index] = on_error(tool_call, TimeoutError(f"timed out after {timeout}s"))
+    finally:
+        # Don't block the node on stragglers that already timed out.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return messages
+
+
+async def arun_tool_calls(tool_calls: list[dict],
+                          arun_one: ARunOne,
+                          on_error: OnError,
+                          timeout_for: TimeoutFor,
+                          max_concurrency: int) -> list[ToolMessage]:
+    """Async variant of run_tool_calls built on asyncio.gather."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def guarded(tool_call: dict) -> ToolMessage:
+        async with semaphore:
+            timeout = timeout_for(tool_call)
+            try:
+                return await asyncio.wait_for(arun_one(tool_call), timeout)
+            except asyncio.TimeoutError:
+                if expired():
+                    raise DeadlineExceeded(f"deadline exceeded waiting for {tool_call['name']}") from None
+                return on_error(tool_call, TimeoutError(f"timed out after {timeout}s"))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                return on_error(tool_call, e)
+
+    return list(await asyncio.gather(*(guarded(tool_call) for tool_call in tool_calls)))
+
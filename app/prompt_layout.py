@@ -0,0 +1,145 @@
+# app/prompt_layout.py
+import hashlib
+import json
+import re
+import textwrap
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.messages import BaseMessage, SystemMessage, convert_to_openai_messages
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from .config import settings
+from .log import get_logger
+from .telemetry import Counter, Gauge
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# PROMPT LAYOUT
+# (Providers cache prompts by exact prefix, so every LLM request is laid out
+#  the same way: the canonicalized system prompt, then the tool schemas
+#  sorted by name with sorted keys, then the history. The static part is
+#  versioned by its hash, and each request is compared with the previous one
+#  on the same thread to measure how much of it repeats a prefix already sent.)
+# ==============================================================================
+
+LAYOUT_VERSION = 1  # Bump when the canonicalization below changes: every prefix changes with it
+
+
+def canonical_text(text: str) -> str:
+    """Dedented, without trailing whitespace or leading/trailing blank lines, blank-line runs collapsed."""
+    text = textwrap.dedent(text.replace("\r\n", "\n").expandtabs(4))
+    text = "\n".join(line.rstrip() for line in text.split("\n")).strip("\n")
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+@dataclass(frozen=True)
+class PromptLayout:
+    name: str
+    system: str  # Canonical system prompt
+    tools: tuple  # Sorted by name
+    schemas: tuple[dict, ...]  # OpenAI tool schemas, in `tools` order, keys sorted
+    version: str  # "<name>@<LAYOUT_VERSION>.<hash of system prompt and schemas>"
+    prompt: ChatPromptTemplate
+
+    def parts(self, history: list[BaseMessage]) -> list[str]:
+        """The request in prefix order, one serialized part per element: system prompt, tool schemas, each message."""
+        return [
+            dumps({"role": "system", "content": self.system}),
+            dumps(list(self.schemas)),
+            *(dumps(convert_to_openai_messages(message)) for message in history),
+        ]
+
+
+def build_layout(name: str, system_prompt: str, tools: list) -> PromptLayout:
+    """Canonicalizes a system prompt and its tools into a PromptLayout; the same inputs give the same bytes."""
+    system = canonical_text(system_prompt)
+    tools = tuple(sorted(tools, key=lambda tool: tool.name))
+    schemas = tuple(json.loads(dumps(convert_to_openai_tool(tool))) for tool in tools)
+    digest = hashlib.sha256((dumps(system) + dumps(list(schemas))).encode()).hexdigest()[:12]
+    # A SystemMessage, not a ("system", ...) template: the text is sent exactly as canonicalized.
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=system),
+        MessagesPlaceholder(variable_name="messages"),
+    ])
+    layout = PromptLayout(name, system, tools, schemas, f"{name}@{LAYOUT_VERSION}.{digest}", prompt)
+    logger.debug("Prompt layout", extra={"event": "prompt.layout", "version": layout.version})
+    return layout
+
+
+class PrefixStats:
+    """
+    Bytes of each request that repeat a prefix the same model was already
+    sent: the static part when the layout was seen before, plus the leading
+    history messages unchanged since the previous request on the thread.
+    """
+
+    def __init__(self, max_threads: int = 4096):
+        self._lock = threading.Lock()
+        self._max_threads = max_threads
+        self._last: OrderedDict[tuple, list[tuple[bytes, int]]] = OrderedDict()
+        self._seen: set[tuple[str, str]] = set()
+        self._counts = {"requests": 0, "warm_requests": 0, "bytes": 0, "reused_bytes": 0}
+        self._layouts: dict[str, str] = {}
+
+    def observe(self, layout: PromptLayout, model: str, history: list[BaseMessage], thread_id: str | None) -> int:
+        """Records one request; returns the bytes of it that repeat an earlier prefix."""
+        parts = [(hashlib.blake2b(part.encode(), digest_size=16).digest(), len(part.encode()))
+                 for part in layout.parts(history)]
+        key = (thread_id, layout.name, model)
+        with self._lock:
+            previous = self._last.pop(key, None) if thread_id else None
+            if previous is None:
+                previous = parts[:2] if (layout.version, model) in self._seen else []
+            reused = 0
+            for part, earlier in zip(parts, previous):
+                if part != earlier:
+                    break
+                reused += part[1]
+            if thread_id:
+                self._last[key] = parts
+                while len(self._last) > self._max_threads:
+                    self._last.popitem(last=False)
+            self._seen.add((layout.version, model))
+            self._layouts[layout.name] = layout.version
+            self._counts["requests"] += 1
+            self._counts["warm_requests"] += reused > 0
+            self._counts["bytes"] += sum(size for _, size in parts)
+            self._counts["reused_bytes"] += reused
+        return reused
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, layouts = dict(self._counts), dict(self._layouts)
+        return {
+            **counts,
+            "reuse_ratio": round(counts["reused_bytes"] / counts["bytes"], 4) if counts["bytes"] else 0.0,
+            "layouts": layouts,
+        }
+
+
+prefix_stats = PrefixStats(settings.CHECKPOINT_MAX_THREADS)
+
+def _prefix_counts(warm: str, total: str):
+    def read() -> dict[tuple, float]:
+        stats = prefix_stats.snapshot()
+        return {("reused",): stats[warm], ("new",): stats[total] - stats[warm]}
+    return read
+
+Counter("agent_prompt_requests_total",
+        "LLM requests that repeat (reused) or don't repeat (new) a prefix the same model was already sent.",
+        ("prefix",), read=_prefix_counts("warm_requests", "requests"))
+Counter("agent_prompt_bytes_total",
+        "Bytes of LLM requests that repeat (reused) or don't repeat (new) a prefix already sent.",
+        ("prefix",), read=_prefix_counts("reused_bytes", "bytes"))
+Gauge("agent_prompt_layout_info", "1 for the version (static-part hash) of each prompt layout in use.",
+      ("layout", "version"),
+      read=lambda: {(name, version): 1 for name, version in prefix_stats.snapshot()["layouts"].items()})
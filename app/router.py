@@ -0,0 +1,124 @@
+# app/router.py
+import re
+import threading
+from dataclasses import dataclass
+
+from .telemetry import Counter
+
+# ==============================================================================
+# DETERMINISTIC PRE-ROUTER
+# (Cheap keyword rules in front of the supervisor LLM. Only self-contained,
+#  single-intent queries are routed; anything ambiguous goes to the LLM.)
+# ==============================================================================
+
+GREETING_REPLY = (
+    "Hello! I can help you with your order status, refunds and payment details. "
+    "What can I do for you today?"
+)
+
+_GREETING = re.compile(
+    r"^\s*(hi|hello|hey|hiya|good (morning|afternoon|evening)|greetings)"
+    r"(\s+(there|team|support))?"
+    r"([\s,!.]+(can|could) you help( me)?)?[\s!.?]*$",
+    re.IGNORECASE,
+)
+_NUMBER = re.compile(r"\d+")
+
+_INTENTS = {
+    "human_escalation_team_tool": re.compile(
+        r"\b(cancel\w*|chang\w*|updat\w*|delet\w*|modif\w*|remov\w*|add|complain\w*)\b", re.IGNORECASE
+    ),
+    "refund_payment_team_tool": re.compile(
+        r"\b(refund\w*|payment\w*|pay|paid|card|billing|charged?)\b", re.IGNORECASE
+    ),
+    "orders_team_tool": re.compile(
+        r"\b(status|where|track\w*|ship\w*|deliver\w*|arriv\w*)\b", re.IGNORECASE
+    ),
+}
+# Order words that still mean "orders" when a refund is mentioned too.
+_SHIPPING = re.compile(r"\b(track\w*|ship\w*|deliver\w*|arriv\w*)\b", re.IGNORECASE)
+# References to earlier turns need the supervisor to resolve them.
+_CONTEXTUAL = re.compile(r"\b(that|it|this|those|same|previous|again|also)\b", re.IGNORECASE)
+# The only escalations safe to dispatch without the LLM: they open a ticket.
+_EXPLICIT_ESCALATION = re.compile(r"\b(cancel|modify)\s+(my\s+|the\s+)?order\s+#?\d+\b", re.IGNORECASE)
+_PAYMENT_DETAILS = re.compile(r"\bpayment (method|detail)s?\b", re.IGNORECASE)
+_REFUND = re.compile(r"\brefund\w*", re.IGNORECASE)
+
+MAX_ROUTABLE_WORDS = 25
+
+
+@dataclass
+class Route:
+    target: str  # "greeting", a team tool name, or "llm"
+    confidence: float
+
+
+def intents(query: str) -> set[str]:
+    """Team tools whose keywords appear in `query`."""
+    matched = {team for team, pattern in _INTENTS.items() if pattern.search(query)}
+    if "refund_payment_team_tool" in matched and not _SHIPPING.search(query):
+        matched.discard("orders_team_tool") # "status of my refund" is a refund question
+    return matched
+
+
+def tracking_numbers(query: str) -> list[str]:
+    return list(dict.fromkeys(_NUMBER.findall(query)))
+
+
+def asks_refund(query: str) -> bool:
+    return bool(_REFUND.search(query))
+
+
+def asks_payment_details(query: str) -> bool:
+    return bool(_PAYMENT_DETAILS.search(query))
+
+
+def classify(query: str) -> Route:
+    """Scores a user query; targets other than "llm" are safe to dispatch directly."""
+    if _GREETING.match(query):
+        return Route("greeting", 1.0)
+
+    if len(query.split()) > MAX_ROUTABLE_WORDS or _CONTEXTUAL.search(query):
+        return Route("llm", 0.0)
+
+    matched = intents(query)
+    if len(matched) != 1:
+        return Route("llm", 0.0)
+
+    team = matched.pop()
+    has_number = bool(_NUMBER.search(query))
+    if team == "human_escalation_team_tool":
+        # "Can you add more detail?" is not a ticket; only "cancel order 5" is.
+        return Route(team, 0.95) if _EXPLICIT_ESCALATION.search(query) else Route("llm", 0.0)
+    if team == "refund_payment_team_tool" and asks_payment_details(query):
+        return Route(team, 0.95) # Payment details don't need a tracking number
+    return Route(team, 0.95 if has_number else 0.5)
+
+
+class RouterStats:
+    """Counts how many turns each target handled, and the fast-path hit rate."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = {}
+
+    def record(self, target: str) -> None:
+        with self._lock:
+            self._counts[target] = self._counts.get(target, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        hits = total - counts.get("llm", 0)
+        return {"total": total, "hits": hits, "hit_rate": round(hits / total, 4) if total else 0.0, "by_target": counts}
+
+
+router_stats = RouterStats()
+
+Counter(
+    "agent_router_turns_total",
+    "Turns by what picked the teams: a fast-path team or reply, or llm for the supervisor.",
+    ("target",),
+    read=lambda: {(target,): count for target, count in router_stats.snapshot()["by_target"].items()},
+)
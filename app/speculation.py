@@ -0,0 +1,205 @@
+# app/speculation.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+
+from .cache import cache_key
+from .config import settings
+from .log import get_logger
+from .router import asks_refund, intents, tracking_numbers
+from .telemetry import Counter, span
+from .tools import SHARED_LOOKUP_TOOLS, get_order_status_tool, get_refund_status_tool, tool_cache
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# SPECULATIVE TEAM LOOKUPS
+# (While the supervisor LLM is still routing a new query, the lookups the
+#  likely team will make are started from the same keyword rules as the
+#  fast-path router. Results land in the tool cache, so when the supervisor
+#  picks that team its tool call is a hit, or joins the request in flight.
+#  Otherwise the lookup is wasted; both outcomes are counted. Only
+#  SHARED_LOOKUP_TOOLS run here: a support ticket is never created
+#  speculatively, and payment details are never fetched ahead of time.)
+# ==============================================================================
+
+@dataclass
+class Lookup:
+    team: str  # The team tool expected to need it
+    tool: StructuredTool
+    args: dict
+    started: float = 0.0
+    duration: float | None = None  # Set when the lookup finishes (or is cancelled)
+    outcome: str | None = None  # "used" | "wasted", set when the supervisor has decided
+    task: Any = None  # concurrent.futures.Future (sync) or asyncio.Task (async)
+    recorded: bool = False
+
+
+class SpeculationStats:
+    """Used vs wasted speculative lookups, and the upstream time each side accounts for."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"turns": 0, "lookups": 0, "used": 0, "wasted": 0}
+        self._seconds = {"saved": 0.0, "wasted": 0.0}
+
+    def started(self, lookups: int) -> None:
+        with self._lock:
+            self._counts["turns"] += 1
+            self._counts["lookups"] += lookups
+
+    def maybe_record(self, lookup: Lookup) -> None:
+        """Counts a lookup once it has both finished and been judged."""
+        with self._lock:
+            if lookup.recorded or lookup.duration is None or lookup.outcome is None:
+                return
+            lookup.recorded = True
+            self._counts[lookup.outcome] += 1
+            # A used lookup ran alongside the supervisor call instead of after it.
+            self._seconds["saved" if lookup.outcome == "used" else "wasted"] += lookup.duration
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, seconds = dict(self._counts), dict(self._seconds)
+        judged = counts["used"] + counts["wasted"]
+        return {
+            **counts,
+            "hit_rate": round(counts["used"] / judged, 4) if judged else 0.0,
+            "saved_ms": round(seconds["saved"] * 1000, 1),
+            "wasted_ms": round(seconds["wasted"] * 1000, 1),
+        }
+
+
+speculation_stats = SpeculationStats()
+
+Counter("agent_speculation_turns_total", "New queries that started speculative lookups.", (),
+        read=lambda: {(): speculation_stats.snapshot()["turns"]})
+Counter(
+    "agent_speculation_lookups_total",
+    "Speculative lookups started, and how many of them the supervisor's choice used or wasted.",
+    ("event",),
+    read=lambda: {(event,): speculation_stats.snapshot()[key]
+                  for event, key in (("started", "lookups"), ("used", "used"), ("wasted", "wasted"))},
+)
+Counter(
+    "agent_speculation_lookup_seconds_total",
+    "Upstream time of judged speculative lookups: used ones ran off the critical path, wasted ones for nothing.",
+    ("outcome",),
+    read=lambda: {(outcome,): speculation_stats.snapshot()[f"{key}_ms"] / 1000
+                  for outcome, key in (("used", "saved"), ("wasted", "wasted"))},
+)
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculation")
+_pending: set = set()  # Strong references: the event loop only keeps weak ones to tasks
+
+
+def _reusable(tool: StructuredTool) -> bool:
+    """Only cached tools hand their result on to the team's own call."""
+    return settings.TOOL_CACHE_ENABLED and bool(settings.TOOL_CACHE_TTLS.get(tool.name))
+
+
+def plan(query: str) -> list[Lookup]:
+    """Lookups the team(s) matching `query` would make; none when an escalation is likely."""
+    matched = intents(query)
+    if "human_escalation_team_tool" in matched:
+        return []
+    numbers = tracking_numbers(query)
+    lookups = []
+    if "orders_team_tool" in matched:
+        lookups += [Lookup("orders_team_tool", get_order_status_tool, {"tracking_no": no}) for no in numbers]
+    if "refund_payment_team_tool" in matched and asks_refund(query):
+        lookups += [Lookup("refund_payment_team_tool", get_refund_status_tool, {"tracking_no": no}) for no in numbers]
+    lookups = [l for l in lookups if l.tool.name in SHARED_LOOKUP_TOOLS and _reusable(l.tool)]
+    return lookups[:settings.SPECULATION_MAX_LOOKUPS]
+
+
+def _finished(lookup: Lookup) -> None:
+    lookup.duration = time.monotonic() - lookup.started
+    task = lookup.task
+    _pending.discard(task)
+    if not task.cancelled():
+        task.exception()  # Retrieved here; a failed lookup simply isn't cached.
+    speculation_stats.maybe_record(lookup)
+
+
+def _run(lookup: Lookup) -> Any:
+    with span("tool", lookup.tool.name, speculative=True):
+        return lookup.tool.func(**lookup.args)
+
+
+async def _arun(lookup: Lookup) -> Any:
+    with span("tool", lookup.tool.name, speculative=True):
+        return await lookup.tool.coroutine(**lookup.args)
+
+
+class Speculation:
+    """The lookups started for one supervisor call."""
+
+    def __init__(self, lookups: list[Lookup]):
+        self.lookups = lookups
+        self.settled = False
+
+    def settle(self, response: AIMessage | None) -> None:
+        """
+        Judges every lookup against the teams the supervisor chose. A wasted
+        lookup still pending is cancelled, unless another request's tool
+        call is waiting on it in the cache; then it finishes for them.
+        """
+        if self.settled:
+            return
+        self.settled = True
+        chosen = {tool_call["name"] for tool_call in getattr(response, "tool_calls", None) or []}
+        for lookup in self.lookups:
+            lookup.outcome = "used" if lookup.team in chosen else "wasted"
+            if lookup.outcome == "wasted" and not tool_cache.has_waiters(cache_key(lookup.tool.name, lookup.args)):
+                lookup.task.cancel()
+            speculation_stats.maybe_record(lookup)
+        if self.lookups:
+            logger.info("Speculation settled", extra={
+                "event": "speculation.settled",
+                "used": sum(l.outcome == "used" for l in self.lookups),
+                "wasted": sum(l.outcome == "wasted" for l in self.lookups),
+            })
+
+
+@contextmanager
+def speculate(messages: list[BaseMessage]) -> Iterator[Speculation]:
+    """
+    Starts the likely lookups for a new user query around a supervisor call.
+    Call .settle(response) with the supervisor's reply; if the block exits
+    without it, everything still running is treated as wasted. Lookups run
+    as tasks when an event loop is running, else on a small thread pool.
+    """
+    last = messages[-1] if messages else None
+    lookups = plan(last.content) if settings.SPECULATION_ENABLED and isinstance(last, HumanMessage) else []
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    for lookup in lookups:
+        lookup.started = time.monotonic()
+        if loop is not None:
+            lookup.task = loop.create_task(_arun(lookup))
+        else:
+            lookup.task = _pool.submit(_run, lookup)
+        _pending.add(lookup.task)
+        lookup.task.add_done_callback(lambda _, lookup=lookup: _finished(lookup))
+    if lookups:
+        speculation_stats.started(len(lookups))
+        logger.info("Speculating", extra={
+            "event": "speculation.start",
+            "lookups": [f"{l.tool.name}({', '.join(map(str, l.args.values()))})" for l in lookups],
+        })
+
+    speculation = Speculation(lookups)
+    try:
+        yield speculation
+    finally:
+        speculation.settle(None)
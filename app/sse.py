@@ -0,0 +1,97 @@
+# app/sse.py
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+try:
+    import orjson  # Declared dependency: several times faster than the stdlib encoder.
+except ImportError:
+    orjson = None
+
+# ==============================================================================
+# SERVER-SENT EVENTS
+# (Frame encoding and the relay between a graph run and the HTTP response:
+#  heartbeats while the run is quiet, a bounded buffer in front of slow
+#  clients, and cancellation of the run when the client goes away.)
+# ==============================================================================
+
+# Built once: json.dumps() with non-default options builds a new encoder per call.
+_json_encoder = json.JSONEncoder(default=str, ensure_ascii=False, separators=(",", ":"))
+
+HEARTBEAT = b": keep-alive\n\n"  # An SSE comment: clients ignore it, proxies see traffic
+_unwinding: set = set()  # Cancelled runs still cleaning up (the event loop only keeps weak references)
+
+
+def encode(event: str, data: dict) -> bytes:
+    """Formats one Server-Sent-Event (SSE) frame, JSON-encoded with orjson when installed."""
+    if orjson is not None:
+        return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, default=str) + b"\n\n"
+    return f"event: {event}\ndata: {_json_encoder.encode(data)}\n\n".encode()
+
+
+class ClientDisconnected(Exception):
+    """The client closed the stream; the run behind it was cancelled."""
+
+
+async def relay(frames: AsyncIterator[bytes],
+                heartbeat: float,
+                max_buffered: int,
+                disconnected: Callable[[], Awaitable[Any]] | None = None,
+                timeout: float | None = None) -> AsyncIterator[bytes]:
+    """
+    Yields `frames`, plus HEARTBEAT after `heartbeat` idle seconds (0 = never).
+
+    `frames` is drained by one task of its own (so context variables set in
+    it, like the current span, stay consistent) into a buffer of at most
+    `max_buffered` frames. When `disconnected()` returns, `timeout` seconds
+    have passed, or the consumer of this generator is closed or cancelled,
+    that task is cancelled, and with it the graph run it iterates; the first
+    two raise ClientDisconnected and TimeoutError.
+    """
+    buffer: asyncio.Queue[bytes] = asyncio.Queue(maxsize=max(1, max_buffered))
+
+    async def pump() -> None:
+        async for frame in frames:
+            await buffer.put(frame)
+
+    expires = time.monotonic() + timeout if timeout else None
+    producer = asyncio.ensure_future(pump())
+    watcher = asyncio.ensure_future(disconnected()) if disconnected else None
+    getter = None
+    try:
+        while True:
+            while not buffer.empty():
+                yield buffer.get_nowait()
+            if producer.done():
+                producer.result()  # Re-raises the run's error, if any
+                return
+            wait = heartbeat or None
+            if expires is not None:
+                left = expires - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"stream timed out after {timeout}s")
+                wait = left if wait is None else min(wait, left)
+            getter = asyncio.ensure_future(buffer.get())
+            waiting = {getter, producer} | ({watcher} if watcher else set())
+            done, _ = await asyncio.wait(waiting, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if watcher in done:
+                raise ClientDisconnected()
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+                if not done and wait == heartbeat:
+                    yield HEARTBEAT
+            getter = None
+    finally:
+        for task in (getter, watcher, producer):
+            if task is not None and not task.done():
+                task.cancel()
+        if not producer.done():
+            # asyncio.wait, not gather: if this wait is cancelled in turn (the
+            # server cancels the response repeatedly), the producer still gets
+            # exactly one cancellation and can finish unwinding the graph run.
+            _unwinding.add(producer)
+            producer.add_done_callback(_unwinding.discard)
+            await asyncio.wait({producer})
@@ -0,0 +1,95 @@
+# app/startup.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from .config import settings
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# STARTUP PHASE
+# (Importing app.api stays cheap; the graphs, the LLM client, the Airtable
+#  client and the outbox worker are built once per process on a background
+#  thread, started by the API lifespan or by the first request that needs them.)
+# ==============================================================================
+
+_lock = threading.Lock()
+_future: Future | None = None
+_phases: dict[str, float] = {}
+_started_at = 0.0
+
+
+def _phase(name: str, started: float) -> float:
+    now = time.perf_counter()
+    _phases[name] = round(now - started, 3)
+    return now
+
+
+def _initialize(future: Future) -> None:
+    if settings.CHECKPOINTER == "memory" and int(os.environ.get("WEB_CONCURRENCY") or 1) > 1:
+        logger.warning("CHECKPOINTER=memory keeps each worker's threads to itself; use sqlite or redis "
+                       "when running several workers", extra={"event": "startup.config"})
+    try:
+        if not settings.AIRTABLE_REFERENCE_FIELD:
+            raise RuntimeError("AIRTABLE_REFERENCE_FIELD is empty: tickets would not carry the ID the customer gets")
+        started = t = time.perf_counter()
+        from .graph import workflow  # Builds the LLM client and compiles every graph
+        t = _phase("graph", t)
+        from .tools import get_airtable_client, get_ticket_outbox
+        get_airtable_client()
+        t = _phase("airtable", t)
+        get_ticket_outbox().start()
+        _phase("outbox", t)
+        _phase("total", started)
+        logger.info("Startup complete", extra={"event": "startup.ready", "phases": dict(_phases)})
+        future.set_result(workflow)
+    except BaseException as e:
+        logger.exception("Startup failed")
+        future.set_exception(e)
+
+
+def start() -> Future:
+    """Starts initialization once per process; returns its future (the compiled workflow)."""
+    global _future, _started_at
+    with _lock:
+        if _future is None:
+            _future = Future()
+            _started_at = time.monotonic()
+            threading.Thread(target=_initialize, args=(_future,), name="startup", daemon=True).start()
+        return _future
+
+
+async def get_workflow():
+    """The compiled supervisor workflow, waiting for startup if it is still running."""
+    return await asyncio.wrap_future(start())
+
+
+def status() -> dict:
+    """Readiness report: starting | ready | failed, with per-phase timings."""
+    if _future is None:
+        return {"status": "not_started"}
+    if not _future.done():
+        return {"status": "starting", "elapsed_seconds": round(time.monotonic() - _started_at, 3)}
+    if _future.exception() is not None:
+        return {"status": "failed", "error": str(_future.exception())}
+    return {"status": "ready", "startup_seconds": dict(_phases)}
+
+
+def is_ready() -> bool:
+    return _future is not None and _future.done() and _future.exception() is None
+
+
+async def shutdown() -> None:
+    """Stops what startup started; safe to call when startup never ran or failed."""
+    if is_ready():
+        from .tools import get_ticket_outbox
+        get_ticket_outbox().stop()
+    from .telemetry import span_exporter
+    if span_exporter is not None:
+        span_exporter.stop()
+    from .upstream import aclose_http_clients
+    await aclose_http_clients()
@@ -0,0 +1,289 @@
+# app/store.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+# ==============================================================================
+# KEY-VALUE STORES
+# (Backends for everything that must be shared when several workers serve the
+#  same conversations: checkpoints, the tool and LLM caches, and per-thread
+#  locks. Idle-key eviction is a TTL/LRU concern of the store.)
+#
+#  memory  one process only (the default single-worker mode)
+#  sqlite  workers on one host, sharing a WAL-mode file
+#  redis   workers on many hosts; any redis-py compatible client works, so
+#          fakeredis is a local stand-in
+# ==============================================================================
+
+Update = Callable[[bytes | None], bytes | None]
+
+
+class MemoryStore:
+    """In-process store with LRU size bound and idle TTL."""
+
+    blocking = False
+    shared = False
+
+    def __init__(self, max_keys: int, ttl: float | None):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[bytes, float | None]] = OrderedDict()
+        self._locks: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: bytes) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def update(self, key: str, fn: Update) -> bytes | None:
+        """Atomically replaces the value with fn(current); None from fn leaves it as is."""
+        with self._lock:
+            value = fn(self._get(key))
+            if value is not None:
+                self._set(key, value)
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def try_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            holder = self._locks.get(name)
+            if holder is not None and holder[0] != owner and holder[1] > now:
+                return False
+            self._locks[name] = (owner, now + ttl)
+            return True
+
+    def unlock(self, name: str, owner: str) -> None:
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == owner:
+                del self._locks[name]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteStore:
+    """
+    File-backed store for a single host. Rows carry `touched_at` for LRU and
+    idle-TTL eviction, refreshed by writes and (at most every TOUCH_INTERVAL
+    seconds per key) by reads; WAL mode lets several worker processes share
+    the file, and update() runs in an IMMEDIATE transaction so their writes
+    serialize.
+    """
+
+    blocking = True
+    shared = True
+    TOUCH_INTERVAL = 1.0  # LRU order to the second, without a write on every read
+
+    def __init__(self, path: str, max_keys: int, ttl: float | None, table: str = "kv"):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, touched_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_touched ON {table} (touched_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._writes = 0
+
+    def _get(self, key: str, touch: bool = False) -> bytes | None:
+        row = self._conn.execute(
+            f"SELECT value, touched_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, touched_at = row
+        now = time.time()
+        if self.ttl and touched_at + self.ttl < now:
+            return None
+        if touch and now - touched_at > self.TOUCH_INTERVAL:
+            self._conn.execute(f"UPDATE {self.table} SET touched_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def _set(self, key: str, value: bytes) -> None:
+        self._conn.execute(
+            f"INSERT INTO {self.table} (key, value, touched_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, touched_at = excluded.touched_at",
+            (key, value, time.time()),
+        )
+        self._writes += 1
+        # Amortise eviction instead of counting rows on every write.
+        if self._writes % 100 == 0:
+            self._evict()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            return self._get(key, touch=True)
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def update(self, key: str, fn: Update) -> bytes | None:
+        """Atomically replaces the value with fn(current); None from fn leaves it as is."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn(self._get(key))
+                if value is not None:
+                    self._set(key, value)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def try_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE locks.owner = excluded.owner OR locks.expires_at < ?",
+                (name, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def unlock(self, name: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+    def _evict(self) -> None:
+        if self.ttl:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE touched_at < ?", (time.time() - self.ttl,))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY touched_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,),
+        )
+        self._conn.execute("DELETE FROM locks WHERE expires_at < ?", (time.time(),))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class RedisStore:
+    """
+    Shared store for multi-node deployments. Works with any redis-py compatible
+    client (e.g. `fakeredis.FakeRedis()` as a local stand-in). Idle keys
+    expire via TTL; configure `maxmemory-policy allkeys-lru` for the LRU bound.
+    update() and unlock() are optimistic WATCH/MULTI transactions.
+    """
+
+    blocking = True
+    shared = True
+
+    def __init__(self, client, ttl: float | None, prefix: str = "checkpoint:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _expiry(self) -> int | None:
+        return max(1, int(self.ttl)) if self.ttl else None
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=self._expiry())
+
+    def update(self, key: str, fn: Update) -> bytes | None:
+        """Atomically replaces the value with fn(current); retried when another worker wrote first."""
+        from redis.exceptions import WatchError  # Optional dependency, only needed for this backend.
+        full_key = self.prefix + key
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(full_key)
+                    value = fn(pipe.get(full_key))
+                    if value is None:
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    pipe.set(full_key, value, ex=self._expiry())
+                    pipe.execute()
+                    return value
+                except WatchError:
+                    continue
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def try_lock(self, name: str, owner: str, ttl: float) -> bool:
+        key = f"{self.prefix}lock:{name}"
+        if self.client.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        if self.client.get(key) == owner.encode():
+            self.client.pexpire(key, int(ttl * 1000))
+            return True
+        return False
+
+    def unlock(self, name: str, owner: str) -> None:
+        from redis.exceptions import WatchError
+        key = f"{self.prefix}lock:{name}"
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) == owner.encode():
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+            except WatchError:
+                pass  # Expired and taken over by another worker meanwhile.
+
+
+def build_store(backend: str, namespace: str, settings, max_keys: int, ttl: float | None):
+    """
+    Creates a store for `namespace` on the selected backend. Namespaces share
+    one SQLite file (a table each) or one Redis database (a key prefix each).
+    """
+    if backend == "memory":
+        return MemoryStore(max_keys, ttl)
+    if backend == "sqlite":
+        return SqliteStore(settings.CHECKPOINT_SQLITE_PATH, max_keys, ttl, table=namespace)
+    if backend == "redis":
+        import redis  # Optional dependency, only needed for this backend.
+        return RedisStore(redis.Redis.from_url(settings.CHECKPOINT_REDIS_URL), ttl, prefix=f"{namespace}:")
+    raise ValueError(f"Unknown store backend '{backend}' (expected memory, sqlite or redis).")
@@ -0,0 +1,388 @@
+# app/telemetry.py
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+import httpx
+
+from .config import settings
+from .log import current_thread_id, get_logger
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# LATENCY SPANS AND METRICS
+# (Spans for requests, supervisor turns, teams, LLM calls and tool calls.
+#  Durations feed Prometheus histograms on /metrics; finished spans can also
+#  be exported as OTLP/JSON to a file or a collector. Other modules define
+#  their own counters and gauges with the classes below, and /metrics renders
+#  them all.)
+# ==============================================================================
+
+# Every Histogram, Counter and Gauge registers itself here on creation, so
+# modules define their own metrics next to the code that updates them.
+_registry: list = []
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: dict[tuple, tuple[list[int], list[float]]] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total = self._series.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            total[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        for label_values, (counts, total) in sorted(series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            sep = "," if labels else ""
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {counts[-1]}")
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in Prometheus text format.
+
+    With `read`, the values are not inc()'d here but read at render time from
+    the object that already counts them: read() returns {label values: value}.
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...],
+                 read: Callable[[], dict[tuple, float]] | None = None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.read = read
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = defaultdict(float)
+        _registry.append(self)
+
+    def inc(self, amount: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] += amount
+
+    def values(self) -> dict[tuple, float]:
+        if self.read is not None:
+            return self.read()
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        for label_values, value in sorted(self.values().items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """A value that goes up and down (set() or `read`), rendered like Counter."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+# thread_id is kept off the metric labels (unbounded cardinality); it is a span attribute.
+span_duration = Histogram(
+    "agent_span_duration_seconds",
+    "Duration of request, supervisor, team, llm and tool spans.",
+    ("kind", "name", "status"),
+    DURATION_BUCKETS,
+)
+llm_tokens = Counter(
+    "agent_llm_tokens_total",
+    "Tokens used by LLM calls, by caller and token type.",
+    ("name", "type"),
+)
+
+stream_disconnects = Counter(
+    "agent_stream_disconnects_total",
+    "/chat/stream runs cancelled because the client went away.",
+    (),
+)
+
+deadlines_exceeded = Counter(
+    "agent_deadlines_exceeded_total",
+    "/chat turns cut off by their deadline and answered with a partial reply.",
+    (),
+)
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in list(_registry):
+        try:
+            lines += metric.render()
+        except Exception:
+            # One broken read() must not take the whole scrape down.
+            logger.exception("Rendering metric %s failed", metric.name)
+    return "\n".join(lines) + "\n"
+
+# ==============================================================================
+# SPANS
+# ==============================================================================
+
+@dataclass
+class Span:
+    kind: str
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    thread_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    status: str = "ok"
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def fail(self, error: Any) -> None:
+        self.status = "error"
+        self.error = str(error)
+
+    def record_usage(self, message) -> None:
+        """Copies prompt/completion token counts off an LLM response, when present."""
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            self.attributes["prompt_tokens"] = usage.get("input_tokens", 0)
+            self.attributes["completion_tokens"] = usage.get("output_tokens", 0)
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+@contextmanager
+def span(kind: str, name: str, thread_id: str | None = None, **attributes) -> Iterator[Span]:
+    """
+    Times the enclosed block as a child of the current span. Usable from sync
+    and async code; an exception (or cancellation) marks the span as failed.
+    """
+    parent = _current_span.get()
+    current = Span(
+        kind=kind,
+        name=name,
+        trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+        span_id=os.urandom(8).hex(),
+        parent_id=parent.span_id if parent else None,
+        thread_id=thread_id or current_thread_id() or (parent.thread_id if parent else None),
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e.__class__.__name__ if not str(e) else e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _finish(current)
+
+
+def _finish(finished: Span) -> None:
+    span_duration.observe(finished.duration, finished.kind, finished.name, finished.status)
+    for key, token_type in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+        if finished.attributes.get(key):
+            llm_tokens.inc(finished.attributes[key], finished.name, token_type)
+    if span_exporter is not None:
+        span_exporter.export(finished)
+
+# ==============================================================================
+# OTLP/JSON EXPORT
+# ==============================================================================
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(s: Span) -> dict:
+    attributes = {"span.kind": s.kind, **s.attributes}
+    if s.thread_id:
+        attributes["thread_id"] = s.thread_id
+    otlp = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": f"{s.kind} {s.name}",
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()],
+        "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+    }
+    if s.parent_id:
+        otlp["parentSpanId"] = s.parent_id
+    return otlp
+
+
+class SpanExporter:
+    """
+    Ships finished spans off the request path: spans go on a bounded queue and
+    a daemon thread writes them in batches, either as OTLP/JSON lines to a
+    file or as OTLP/HTTP JSON requests to a collector. When the queue is full,
+    spans are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, target: str, *, path: str = "", endpoint: str = "",
+                 service_name: str = "", batch_size: int = 256, flush_interval: float = 1.0):
+        self.target = target
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=10_000)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+        self._client: httpx.Client | None = None
+
+    def export(self, finished: Span) -> None:
+        self.start()
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def _payload(self, batch: list[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.telemetry"}, "spans": [_otlp_span(s) for s in batch]}],
+        }]}
+
+    def _write(self, batch: list[Span]) -> None:
+        payload = self._payload(batch)
+        if self.target == "file":
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload) + "\n")
+        else:
+            if self._client is None:
+                self._client = httpx.Client(timeout=5)
+            self._client.post(self.endpoint, json=payload).raise_for_status()
+        self.exported += len(batch)
+
+    def _drain(self, block: bool) -> list[Span]:
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning("Trace export failed (%d spans dropped): %s", len(batch), e)
+
+    def start(self) -> None:
+        """Starts the export thread (idempotent)."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops the thread and flushes whatever is still queued."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        while batch := self._drain(block=False):
+            try:
+                self._write(batch)
+            except Exception:
+                self.dropped += len(batch)
+                break
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {"target": self.target, "exported": self.exported, "dropped": self.dropped,
+                "queued": self._queue.qsize()}
+
+
+def build_span_exporter(settings) -> SpanExporter | None:
+    """Selects the trace exporter from settings.TRACE_EXPORTER (none|file|otlp)."""
+    target = settings.TRACE_EXPORTER.lower()
+    if target == "none":
+        return None
+    if target not in ("file", "otlp"):
+        raise ValueError(f"Unknown TRACE_EXPORTER '{settings.TRACE_EXPORTER}' (expected none, file or otlp).")
+    return SpanExporter(
+        target,
+        path=settings.TRACE_FILE_PATH,
+        endpoint=settings.TRACE_OTLP_ENDPOINT,
+        service_name=settings.TRACE_SERVICE_NAME,
+    )
+
+
+span_exporter = build_span_exporter(settings)
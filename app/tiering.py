@@ -0,0 +1,194 @@
+# app/tiering.py
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.config import get_stream_writer
+from pydantic import BaseModel, ValidationError
+
+from .config import settings
+from .log import get_logger
+from .prompt_layout import PromptLayout, prefix_stats
+from .telemetry import DURATION_BUCKETS, Counter, Histogram, current_span
+
+logger = get_logger(__name__)
+
+# ==============================================================================
+# MODEL TIERING
+# (Each role runs on its own model (see LLM_ROLE_MODELS in app/config.py):
+#  a small, fast one routes and drives the team agents, the large one writes
+#  the final answer. A small-model reply whose tool calls don't check out
+#  against the bound tools is redone on the large model. Every model call is
+#  accounted per role: latency, tokens and cost.)
+# ==============================================================================
+
+TOKEN_RESET = "token_reset"  # Custom stream event: drop the tokens streamed by the call being redone
+
+def model_name(model: BaseChatModel) -> str:
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def tool_call_problems(response: AIMessage, tools: dict[str, Any]) -> list[str]:
+    """Why the reply's tool calls can't be executed: unparseable, unknown tool, bad arguments, or no reply at all."""
+    problems = [f"unparseable call to {call.get('name')}" for call in response.invalid_tool_calls]
+    for tool_call in response.tool_calls:
+        tool = tools.get(tool_call["name"])
+        if tool is None:
+            problems.append(f"unknown tool {tool_call['name']}")
+            continue
+        schema = tool.args_schema
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            try:
+                schema.model_validate(tool_call["args"])
+            except ValidationError as e:
+                problems.append(f"{tool_call['name']}: {e.error_count()} invalid argument(s)")
+    if not problems and not response.tool_calls and not str(response.content).strip():
+        problems.append("empty reply")
+    return problems
+
+
+class ModelStats:
+    """Calls, fallbacks, latency, tokens and cost per role."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles: dict[str, dict] = {}
+
+    def record(self, role: str, model: str, seconds: float, response: AIMessage | None,
+               invalid: bool = False, fallback: bool = False) -> None:
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt, completion = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        price_in, price_out = settings.LLM_PRICES.get(model, (0.0, 0.0))
+        model_call_duration.observe(seconds, role, model)
+        with self._lock:
+            stats = self._roles.setdefault(role, {
+                "calls": 0, "invalid": 0, "fallbacks": 0, "seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "models": {},
+            })
+            stats["calls"] += 1
+            stats["invalid"] += invalid
+            stats["fallbacks"] += fallback
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += prompt
+            stats["completion_tokens"] += completion
+            stats["cost_usd"] += (prompt * price_in + completion * price_out) / 1e6
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            roles = {role: {**stats, "models": dict(stats["models"])} for role, stats in self._roles.items()}
+        for stats in roles.values():
+            seconds = stats.pop("seconds")
+            stats["mean_latency_ms"] = round(seconds / stats["calls"] * 1000, 1)
+            stats["latency_seconds_total"] = round(seconds, 4)
+            stats["cost_usd"] = round(stats["cost_usd"], 6)
+        return roles
+
+
+model_stats = ModelStats()
+
+model_call_duration = Histogram(
+    "agent_model_call_duration_seconds",
+    "Duration of each model call, by role and the model that served it.",
+    ("role", "model"),
+    DURATION_BUCKETS,
+)
+
+def _read_roles(values):
+    return lambda: {labels: value for role, stats in model_stats.snapshot().items() for labels, value in values(role, stats)}
+
+Counter("agent_model_calls_total", "Model calls by role and the model that served it.", ("role", "model"),
+        read=_read_roles(lambda role, stats: (((role, model), calls) for model, calls in stats["models"].items())))
+Counter("agent_model_invalid_replies_total", "Replies whose tool calls failed validation, by role.", ("role",),
+        read=_read_roles(lambda role, stats: [((role,), stats["invalid"])]))
+Counter("agent_model_fallbacks_total", "Calls redone on the large model, by role.", ("role",),
+        read=_read_roles(lambda role, stats: [((role,), stats["fallbacks"])]))
+Counter("agent_model_tokens_total", "Tokens used by role and token type.", ("role", "type"),
+        read=_read_roles(lambda role, stats: [((role, "prompt"), stats["prompt_tokens"]),
+                                              ((role, "completion"), stats["completion_tokens"])]))
+Counter("agent_model_cost_usd_total", "Estimated model cost in USD by role (LLM_PRICES).", ("role",),
+        read=_read_roles(lambda role, stats: [((role,), stats["cost_usd"])]))
+
+
+def tiered_chain(role: str,
+                 layout: PromptLayout,
+                 model: BaseChatModel,
+                 fallback: BaseChatModel | None) -> RunnableLambda:
+    """
+    `layout.prompt | model` with the layout's tools bound, for one role. When
+    the reply fails tool_call_problems and `fallback` is a different model,
+    the same prompt is sent to `fallback` and its reply is used instead.
+    """
+    tool_map = {tool.name: tool for tool in layout.tools}
+    schemas = list(layout.schemas)
+    primary = model.bind_tools(schemas, tool_choice="auto")
+    backup = None
+    if fallback is not None and fallback is not model:
+        backup = fallback.bind_tools(schemas, tool_choice="auto")
+
+    def observe(prompt_value, chat_model: BaseChatModel, config: RunnableConfig) -> None:
+        if settings.PROMPT_PREFIX_STATS_ENABLED:
+            thread_id = (config.get("configurable") or {}).get("thread_id")
+            prefix_stats.observe(layout, model_name(chat_model), prompt_value.to_messages()[1:], thread_id)
+
+    def needs_fallback(response: AIMessage, started: float) -> bool:
+        problems = tool_call_problems(response, tool_map)
+        model_stats.record(role, model_name(model), time.perf_counter() - started, response, invalid=bool(problems))
+        s = current_span()
+        if s is not None:
+            s.set("role", role)
+            s.set("model", model_name(model))
+            s.set("prompt_version", layout.version)
+        if not problems or backup is None or not settings.LLM_FALLBACK_ENABLED:
+            return False
+        logger.info("Invalid tool call, retrying on the large model", extra={
+            "event": "llm.fallback", "role": role, "model": model_name(model), "problems": problems,
+        })
+        return True
+
+    def reset_tokens(response: AIMessage) -> None:
+        """Tells a token stream that the text streamed so far is about to be replaced."""
+        if not isinstance(response.content, str) or not response.content:
+            return  # Nothing was streamed
+        try:
+            write = get_stream_writer()
+        except RuntimeError:
+            return  # Not inside a graph run, so nothing is streaming
+        write({"type": TOKEN_RESET, "role": role})
+
+    def fell_back(response: AIMessage, started: float) -> AIMessage:
+        model_stats.record(role, model_name(fallback), time.perf_counter() - started, response, fallback=True)
+        s = current_span()
+        if s is not None:
+            s.set("model", model_name(fallback))
+            s.set("fallback", True)
+        return response
+
+    def run(state: dict, config: RunnableConfig) -> AIMessage:
+        prompt_value = layout.prompt.invoke(state, config)
+        observe(prompt_value, model, config)
+        started = time.perf_counter()
+        response = primary.invoke(prompt_value, config)
+        if not needs_fallback(response, started):
+            return response
+        reset_tokens(response)
+        observe(prompt_value, fallback, config)
+        started = time.perf_counter()
+        return fell_back(backup.invoke(prompt_value, config), started)
+
+    async def arun(state: dict, config: RunnableConfig) -> AIMessage:
+        prompt_value = await layout.prompt.ainvoke(state, config)
+        observe(prompt_value, model, config)
+        started = time.perf_counter()
+        response = await primary.ainvoke(prompt_value, config)
+        if not needs_fallback(response, started):
+            return response
+        reset_tokens(response)
+        observe(prompt_value, fallback, config)
+        started = time.perf_counter()
+        return fell_back(await backup.ainvoke(prompt_value, config), started)
+
+    return RunnableLambda(run, afunc=arun, name=f"{role}_model")
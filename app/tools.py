@@ -1,46 +1,90 @@
-import requests
+import asyncio
+import functools
 import random
-from airtable import Airtable
-from langchain_core.tools import tool
+from langchain_core.tools import tool, StructuredTool
+from .cache import ToolCache, cached_tool
 from .config import settings
+from .log import get_logger
+from .outbox import TicketOutbox
+from .store import build_store
+from .telemetry import Counter, Gauge
+from .upstream import Upstream
+
+logger = get_logger(__name__)
 
 # --- Initialize Airtable Client ---
-try:
-    airtable_client = Airtable(
-        settings.AIRTABLE_BASE_ID,
-        "Tickets", 
-        api_key=settings.AIRTABLE_TOKEN
-    )
-    print("✅ Airtable client initialized.")
-except Exception as e:
-    print(f"⚠️ FAILED to initialize Airtable: {e}. (Make sure your Base ID and Token are correct)")
-    airtable_client = None
+# Created on first use (or by the API's startup phase): the airtable package
+# pulls in `requests` and is slow to import.
+@functools.cache
+def get_airtable_client():
+    try:
+        from airtable import Airtable
+        airtable_client = Airtable(
+            settings.AIRTABLE_BASE_ID,
+            "Tickets", 
+            api_key=settings.AIRTABLE_TOKEN
+        )
+        # Lets a local stub stand in for the Airtable API.
+        airtable_client.url_table = f"{settings.AIRTABLE_API_URL.rstrip('/')}/{settings.AIRTABLE_BASE_ID}/Tickets"
+        logger.debug("Airtable client initialized.")
+        return airtable_client
+    except Exception as e:
+        logger.warning("FAILED to initialize Airtable: %s. (Make sure your Base ID and Token are correct)", e)
+        return None
+
+# ==============================================================================
+# UPSTREAMS
+# (Pooled clients with retries and per-upstream circuit breakers; see app/upstream.py)
+# ==============================================================================
+
+fakestore = Upstream("fakestore", settings.FAKESTORE_BASE_URL)
+dummyjson = Upstream("dummyjson", settings.DUMMYJSON_BASE_URL)
+slack = Upstream("slack", settings.SLACK_WEBHOOK_URL)
 
 # ==============================================================================
 # "REAL" TOOLS
+# (Each tool has a sync body for .invoke() and an async body for .ainvoke())
 # ==============================================================================
 
-@tool
-def get_order_status_tool(tracking_no: str) -> dict:
+def _order_status(tracking_no: str, data: dict) -> dict:
+    return {
+        "tracking_no": tracking_no,
+        "status": random.choice(["processing", "shipped", "delivered"]),
+        "order_date": data.get("date"),
+        "products": data.get("products")
+    }
+
+def get_order_status(tracking_no: str) -> dict:
+    """Retrieves the current status of the given tracking number."""
+    logger.info("get_order_status_tool", extra={"event": "tool.call", "tracking_no": tracking_no})
+    try:
+        res = fakestore.get(f"/carts/{tracking_no}")
+        res.raise_for_status()
+        return _order_status(tracking_no, res.json())
+    except Exception as e:
+        return {"error": f"Failed to get order: {e}"}
+
+async def aget_order_status(tracking_no: str) -> dict:
     """Retrieves the current status of the given tracking number."""
-    print(f"      [TOOL]: get_order_status_tool(tracking_no={tracking_no})")
+    logger.info("get_order_status_tool", extra={"event": "tool.call", "tracking_no": tracking_no})
     try:
-        res = requests.get(f"https://fakestoreapi.com/carts/{tracking_no}", timeout=5) 
-        res.raise_for_status() 
-        data = res.json()      
-        return {
-            "tracking_no": tracking_no,
-            "status": random.choice(["processing", "shipped", "delivered"]),
-            "order_date": data.get("date"),
-            "products": data.get("products")
-        }
-    except Exception as e:    
+        res = await fakestore.aget(f"/carts/{tracking_no}")
+        res.raise_for_status()
+        return _order_status(tracking_no, res.json())
+    except Exception as e:
         return {"error": f"Failed to get order: {e}"}
 
+get_order_status_tool = StructuredTool.from_function(
+    func=get_order_status,
+    coroutine=aget_order_status,
+    name="get_order_status_tool",
+)
+
 @tool
 def get_refund_status_tool(tracking_no: str) -> dict:
     """Retrieves the status of a refund for a given tracking number."""
-    print(f"      [TOOL]: get_refund_status_tool(tracking_no={tracking_no})")
+    # No I/O here, so the sync body is safe to run on the event loop as well.
+    logger.info("get_refund_status_tool", extra={"event": "tool.call", "tracking_no": tracking_no})
     try:
         status = random.choice(["refund_requested", "refund_processed", "no_refund_found"])
         if status == "refund_processed":
@@ -54,28 +98,86 @@ def get_refund_status_tool(tracking_no: str) -> dict:
     except Exception as e:
         return {"error": f"Failed to get refund: {e}"}
 
-@tool
-def get_payment_details_tool() -> dict:
+def _payment_details(customer_id: int, data: dict) -> dict:
+    return {
+        "customer_id": customer_id,
+        "customer_name": f"{data.get('firstName')} {data.get('lastName')}",
+        "payment_methods": [
+            {"type": "Visa", "last_four": str(random.randint(1000, 9999))},
+        ]
+    }
+
+def get_payment_details() -> dict:
     """Retrieves the payment methods  or details."""
     customer_id = round(random.uniform(1, 5))
-    print(f"      [TOOL]: get_payment_details_tool(customer_id={customer_id})")
-    url = f"https://dummyjson.com/users/{customer_id}"
+    logger.info("get_payment_details_tool", extra={"event": "tool.call", "customer_id": customer_id})
     try:
-        res = requests.get(url, timeout=5)
+        res = dummyjson.get(f"/users/{customer_id}")
         res.raise_for_status()
-        data = res.json()
-        return {
-            "customer_id": customer_id,
-            "customer_name": f"{data.get('firstName')} {data.get('lastName')}",
-            "payment_methods": [
-                {"type": "Visa", "last_four": str(random.randint(1000, 9999))},
-            ]
-        }
+        return _payment_details(customer_id, res.json())
     except Exception as e:
         return {"error": f"Failed to get payment details: {e}"}
 
-def post_to_slack(ticket_id: str, concern: str, record_url: str):
-    payload = {
+async def aget_payment_details() -> dict:
+    """Retrieves the payment methods  or details."""
+    customer_id = round(random.uniform(1, 5))
+    logger.info("get_payment_details_tool", extra={"event": "tool.call", "customer_id": customer_id})
+    try:
+        res = await dummyjson.aget(f"/users/{customer_id}")
+        res.raise_for_status()
+        return _payment_details(customer_id, res.json())
+    except Exception as e:
+        return {"error": f"Failed to get payment details: {e}"}
+
+get_payment_details_tool = StructuredTool.from_function(
+    func=get_payment_details,
+    coroutine=aget_payment_details,
+    name="get_payment_details_tool",
+)
+
+# ==============================================================================
+# READ-ONLY TOOL CACHE
+# (create_support_ticket_tool writes, so it is deliberately never wrapped)
+# ==============================================================================
+
+# Lookups whose result depends only on their arguments, so one customer's
+# answer may be served to another: the only tools that are cached, and the
+# only ones app/speculation.py may run ahead of the supervisor.
+# get_payment_details_tool takes no arguments and answers for the current
+# customer, so it is neither, whatever TOOL_CACHE_TTLS says.
+SHARED_LOOKUP_TOOLS = frozenset({get_order_status_tool.name, get_refund_status_tool.name})
+
+def _tool_cache_store():
+    """Shared tier for multi-worker deployments (CACHE_BACKEND), else none."""
+    if settings.CACHE_BACKEND == "memory":
+        return None
+    ttl = max(settings.TOOL_CACHE_TTLS.values(), default=0) or None
+    return build_store(settings.CACHE_BACKEND, "tool_cache", settings, settings.TOOL_CACHE_MAX_ENTRIES * 10, ttl)
+
+tool_cache = ToolCache(settings.TOOL_CACHE_MAX_ENTRIES, _tool_cache_store())
+
+Counter(
+    "agent_tool_cache_lookups_total",
+    "Tool cache lookups per tool: hits, misses, coalesced (joined an identical call in flight) "
+    "and store_hits (misses answered by the shared tier).",
+    ("tool", "result"),
+    read=lambda: {
+        (tool, result): count for tool, counters in tool_cache.stats().items() for result, count in counters.items()
+    },
+)
+
+def _cached(tool: StructuredTool) -> StructuredTool:
+    ttl = settings.TOOL_CACHE_TTLS.get(tool.name)
+    if not settings.TOOL_CACHE_ENABLED or not ttl or tool.name not in SHARED_LOOKUP_TOOLS:
+        return tool
+    return cached_tool(tool_cache, tool, ttl)
+
+get_order_status_tool = _cached(get_order_status_tool)
+get_refund_status_tool = _cached(get_refund_status_tool)
+
+
+def _slack_payload(ticket_id: str, concern: str, record_url: str, reference: str = "") -> dict:
+    return {
         "text": f"🚨 New Ticket: {ticket_id}",
         "blocks": [
             {"type": "header", "text": {"type": "plain_text", "text": "🚨 New AI-Escalated Ticket"}},
@@ -83,7 +185,8 @@ def post_to_slack(ticket_id: str, concern: str, record_url: str):
                 "type": "section",
                 "fields": [
                     {"type": "mrkdwn", "text": f"*ID:*\n`{ticket_id}`"},
-                    {"type": "mrkdwn", "text": f"*Status:*\nNew"}
+                    {"type": "mrkdwn", "text": f"*Status:*\nNew"},
+                    {"type": "mrkdwn", "text": f"*Customer Ref:*\n`{reference or ticket_id}`"}
                 ]
             },
             {
@@ -103,81 +206,98 @@ def post_to_slack(ticket_id: str, concern: str, record_url: str):
             }
         ]
     }
-    requests.post(settings.SLACK_WEBHOOK_URL, json=payload, timeout=5)
-
-# @tool
-# def create_support_ticket_tool(customer_concern: str) -> dict:
-#     """
-#     Use this tool for any request that requires human intervention.
-#     This includes:
-#     - Any modification request (cancellation, addition, updating, deletion).
-#     - Any topic not covered by other tools (e.g., account settings, complaints).
-#     """
-
-#     print(f"\n      [Tool]: create_support_ticket_tool called with concern: '{customer_concern}'")
-#     ticket_id = f"T-{random.randint(1000, 9999)}"
-    
-#     try:
-#         # --- 1. Create Ticket in Airtable ---
-#         if airtable_client:
-#             print("      [Tool]: Creating record in Airtable...")
-#             new_record = {
-#                 "TicketID": ticket_id,
-#                 "Customer Concern": customer_concern,
-#                 "Status": "New"
-#             }
-#             try:
-#                 created_record = airtable_client.insert(new_record)
-#                 print(f"      [Tool]: Airtable record created: {created_record['id']}")
-#             except Exception as inner_e:
-#                 print(f"      [Tool Error]: Airtable insert failed: {inner_e}")
-#         else:
-#             print("      [Tool Warning]: Airtable client not initialized. Skipping record creation.")
-
-#         # --- 2. Send Alert to Slack ---
-#         post_to_slack(ticket_id=ticket_id, concern=customer_concern)
-        
-#         # --- 3. Return Confirmation to the AI ---
-#         return {
-#             "TicketId": ticket_id,
-#             "Concern": customer_concern,
-#             "Status": "created",
-#         }
-#     except Exception as e:
-#         print(f"      [Tool Error]: Failed to create ticket: {e}")
-#         post_to_slack(ticket_id="--FAILED--", concern=f"TICKETING SYSTEM ERROR: {e}\nQuery: {customer_concern}")
-#         return {"error": f"Failed to create ticket: {e}"}
 
+def post_to_slack(ticket_id: str, concern: str, record_url: str, reference: str = ""):
+    payload = _slack_payload(ticket_id, concern, record_url, reference)
+    slack.post(json=payload).raise_for_status()
 
-@tool
-def create_support_ticket_tool(customer_concern: str) -> dict:
-    '''Use this tool for any request that requires human intervention.'''
-    # Your Table ID from the browser URL
-    TABLE_ID = "tbl1Ofj4TRzUzYEkP" 
+# ==============================================================================
+# SUPPORT TICKETS
+# (Tickets go to a durable local outbox and are acknowledged with a provisional
+#  ID; a background worker batches them into Airtable and then posts to Slack.)
+# ==============================================================================
+
+# Your Table ID from the browser URL
+TABLE_ID = "tbl1Ofj4TRzUzYEkP"
+
+def _ticket_link(created_record: dict) -> tuple[str, str]:
+    """Returns (friendly_id, record_url) for a freshly inserted Airtable record."""
+    internal_id = created_record.get('id') # The 'rec...' ID
+    friendly_id = created_record.get('fields', {}).get(settings.AIRTABLE_REFERENCE_FIELD, internal_id)
+    # Construct the Deep Link URL
+    record_url = f"https://airtable.com/{settings.AIRTABLE_BASE_ID}/{TABLE_ID}/{internal_id}"
+    return friendly_id, record_url
 
+def _insert_tickets(provisional_ids: list[str], concerns: list[str]) -> list[tuple[str, str]]:
+    """Outbox stage 1: one batched Airtable insert."""
+    airtable_client = get_airtable_client()
+    if not airtable_client:
+        raise RuntimeError("Airtable client not initialized.")
+    # The provisional ID is what the customer was told; support staff find the record by it.
+    records = [
+        {settings.AIRTABLE_REFERENCE_FIELD: provisional_id, "Customer Concern": concern, "Status": "New"}
+        for provisional_id, concern in zip(provisional_ids, concerns)
+    ]
+    return [_ticket_link(record) for record in airtable_client.batch_insert(records)]
+
+# Created on first use (or by the API's startup phase), so importing this
+# module doesn't create the outbox file in the working directory.
+@functools.cache
+def get_ticket_outbox() -> TicketOutbox:
+    return TicketOutbox(
+        settings.OUTBOX_PATH,
+        insert_batch=_insert_tickets,
+        notify=post_to_slack,
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+        retry_base=settings.OUTBOX_RETRY_BASE_SECONDS,
+        retry_max=settings.OUTBOX_RETRY_MAX_SECONDS,
+        poll_interval=settings.OUTBOX_POLL_SECONDS,
+    )
+
+def _outbox_tickets() -> dict[tuple, float]:
+    # Only once the outbox exists: a scrape must not create its file either.
+    if not get_ticket_outbox.cache_info().currsize:
+        return {}
+    return {(status,): count for status, count in get_ticket_outbox().stats().items()}
+
+Gauge(
+    "agent_outbox_tickets",
+    "Tickets in the outbox by status: pending (not yet delivered), delivered or dead (dead-lettered).",
+    ("status",),
+    read=_outbox_tickets,
+)
+
+def _ticket_receipt(provisional_id: str) -> dict:
+    return {
+        "TicketId": provisional_id,
+        "Status": "created",
+    }
+
+def create_support_ticket(customer_concern: str) -> dict:
+    '''Use this tool for any request that requires human intervention.'''
+    if not get_airtable_client():
+        return {"error": "Airtable client not initialized."}
     try:
-        if airtable_client:
-            new_record_data = {"Customer Concern": customer_concern, "Status": "New"}
-            created_record = airtable_client.insert(new_record_data)
-
-            # Capture IDs from response
-            internal_id = created_record.get('id') # The 'rec...' ID
-            friendly_id = created_record.get('fields', {}).get('TicketID', internal_id)
-            
-            # Construct the Deep Link URL
-            record_url = f"https://airtable.com/{settings.AIRTABLE_BASE_ID}/{TABLE_ID}/{internal_id}"
-
-            # Pass the link to Slack
-            post_to_slack(ticket_id=friendly_id, concern=customer_concern, record_url=record_url)
-            
-            return {
-                "TicketId": friendly_id,
-                "Status": "created",
-                "Link": record_url # AI can now show this to the user too
-            }
-        else:
-            return {"error": "Airtable client not initialized."}
+        return _ticket_receipt(get_ticket_outbox().enqueue(customer_concern))
+    except Exception as e:
+        logger.error("create_support_ticket_tool failed: %s", e)
+        return {"error": f"Failed to create ticket: {e}"}
 
+async def acreate_support_ticket(customer_concern: str) -> dict:
+    '''Use this tool for any request that requires human intervention.'''
+    if not get_airtable_client():
+        return {"error": "Airtable client not initialized."}
+    try:
+        # A single local SQLite insert, but it fsyncs; keep it off the event loop.
+        provisional_id = await asyncio.to_thread(get_ticket_outbox().enqueue, customer_concern)
+        return _ticket_receipt(provisional_id)
     except Exception as e:
-        print(f"      [Tool Error]: {e}")
-        return {"error": f"Failed to create ticket: {e}"}
\ No newline at end of file
+        logger.error("create_support_ticket_tool failed: %s", e)
+        return {"error": f"Failed to create ticket: {e}"}
+
+create_support_ticket_tool = StructuredTool.from_function(
+    func=create_support_ticket,
+    coroutine=acreate_support_ticket,
+    name="create_support_ticket_tool",
+)
@@ -0,0 +1,275 @@
+# app/upstream.py
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+
+from .config import settings
+from .deadline import DeadlineExceeded, cap, check, expired
+from .telemetry import Counter, Gauge
+
+# ==============================================================================
+# SHARED HTTP CLIENTS
+# (One pooled, keep-alive client per mode, shared by every upstream)
+# ==============================================================================
+
+_LIMITS = httpx.Limits(
+    max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+)
+
+http_client = httpx.Client(timeout=settings.UPSTREAM_TIMEOUT_SECONDS, limits=_LIMITS)
+_async_http_client: httpx.AsyncClient | None = None
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Returns the shared AsyncClient, creating it on first use."""
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(timeout=settings.UPSTREAM_TIMEOUT_SECONDS, limits=_LIMITS)
+    return _async_http_client
+
+async def aclose_http_clients():
+    """Closes the shared HTTP clients. Called on app shutdown."""
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    http_client.close()
+
+# ==============================================================================
+# CIRCUIT BREAKER
+# ==============================================================================
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls pass; `failure_threshold` consecutive failures open it.
+    open      -> calls fail fast until `reset_timeout` has elapsed.
+    half_open -> one probe call is let through; success closes, failure re-opens.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+                self._probing = False
+            # A probe that never reported back (e.g. cancelled) expires after reset_timeout.
+            if self._probing and time.monotonic() - self._probe_started < self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+# ==============================================================================
+# UPSTREAMS
+# ==============================================================================
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+UPSTREAMS: dict[str, "Upstream"] = {}
+
+
+class Upstream:
+    """
+    An external HTTP dependency with its own circuit breaker and counters.
+
+    Failed calls are retried up to `max_retries` times with full-jitter
+    exponential backoff. Only idempotent methods are retried after a response
+    or timeout; any method is retried when the connection was never made.
+    Under a request deadline every attempt's timeout (and backoff) is capped
+    at the time left; running out raises DeadlineExceeded, which does not
+    count against the breaker.
+    """
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = settings.UPSTREAM_MAX_RETRIES
+        self.breaker = CircuitBreaker(
+            settings.UPSTREAM_BREAKER_FAILURES, settings.UPSTREAM_BREAKER_RESET_SECONDS
+        )
+        # Bumped from the tool thread pools as well as the event loop.
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "failures": 0, "retries": 0, "short_circuited": 0}
+        self.latency_seconds = 0.0
+        UPSTREAMS[name] = self
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}" if path else self.base_url
+
+    def _count(self, counter: str | None = None, latency: float = 0.0) -> None:
+        with self._lock:
+            if counter is not None:
+                self.counters[counter] += 1
+            self.latency_seconds += latency
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"Upstream '{self.name}' is unavailable (circuit open).")
+
+    def _should_retry(self, method: str, attempt: int, response=None, error=None) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, httpx.ConnectError):
+            return True
+        if method not in IDEMPOTENT_METHODS:
+            return False
+        return error is not None or response.status_code in RETRYABLE_STATUS
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(settings.UPSTREAM_BACKOFF_MAX_SECONDS, settings.UPSTREAM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        return random.uniform(0, cap)
+
+    def _deadline_hit(self, started: float, error: httpx.HTTPError) -> None:
+        """Re-raises a timeout caused by the request deadline rather than by the upstream."""
+        if isinstance(error, httpx.TimeoutException) and expired():
+            self._count(latency=time.monotonic() - started)
+            raise DeadlineExceeded(f"deadline exceeded during {self.name} request") from error
+
+    def _record(self, started: float, ok: bool) -> None:
+        self._count(None if ok else "failures", latency=time.monotonic() - started)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def request(self, method: str, path: str = "", **kwargs) -> httpx.Response:
+        check(f"{self.name} request")
+        self._check_breaker()
+        method = method.upper()
+        timeout = kwargs.pop("timeout", settings.UPSTREAM_TIMEOUT_SECONDS)
+        attempt = 0
+        while True:
+            self._count("requests")
+            started = time.monotonic()
+            try:
+                response = http_client.request(method, self._url(path), timeout=cap(timeout), **kwargs)
+            except httpx.HTTPError as e:
+                self._deadline_hit(started, e)
+                self._record(started, ok=False)
+                if not self._should_retry(method, attempt, error=e):
+                    raise
+            else:
+                ok = response.status_code < 500 and response.status_code != 429
+                self._record(started, ok)
+                if ok or not self._should_retry(method, attempt, response=response):
+                    return response
+            self._count("retries")
+            time.sleep(cap(self._backoff(attempt)))
+            attempt += 1
+            check(f"{self.name} request")
+            self._check_breaker()
+
+    async def arequest(self, method: str, path: str = "", **kwargs) -> httpx.Response:
+        check(f"{self.name} request")
+        self._check_breaker()
+        method = method.upper()
+        timeout = kwargs.pop("timeout", settings.UPSTREAM_TIMEOUT_SECONDS)
+        attempt = 0
+        while True:
+            self._count("requests")
+            started = time.monotonic()
+            try:
+                response = await get_async_http_client().request(
+                    method, self._url(path), timeout=cap(timeout), **kwargs
+                )
+            except httpx.HTTPError as e:
+                self._deadline_hit(started, e)
+                self._record(started, ok=False)
+                if not self._should_retry(method, attempt, error=e):
+                    raise
+            else:
+                ok = response.status_code < 500 and response.status_code != 429
+                self._record(started, ok)
+                if ok or not self._should_retry(method, attempt, response=response):
+                    return response
+            self._count("retries")
+            await asyncio.sleep(cap(self._backoff(attempt)))
+            attempt += 1
+            check(f"{self.name} request")
+            self._check_breaker()
+
+    def get(self, path: str = "", **kwargs) -> httpx.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str = "", **kwargs) -> httpx.Response:
+        return self.request("POST", path, **kwargs)
+
+    async def aget(self, path: str = "", **kwargs) -> httpx.Response:
+        return await self.arequest("GET", path, **kwargs)
+
+    async def apost(self, path: str = "", **kwargs) -> httpx.Response:
+        return await self.arequest("POST", path, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters, latency_seconds = dict(self.counters), self.latency_seconds
+        return {
+            **counters,
+            "circuit": self.breaker.state,
+            "latency_seconds_total": round(latency_seconds, 4),
+        }
+
+
+def upstream_stats() -> dict[str, dict]:
+    """Counters and breaker state for every registered upstream."""
+    return {name: upstream.stats() for name, upstream in UPSTREAMS.items()}
+
+# --- /metrics (read from the upstreams' own counters at scrape time) ---
+
+def _read(key: str):
+    return lambda: {(name,): stats[key] for name, stats in upstream_stats().items()}
+
+for _name, _key, _help in (
+    ("agent_upstream_requests_total", "requests", "HTTP attempts made to each upstream, retries included."),
+    ("agent_upstream_failures_total", "failures", "Attempts that failed (connection error, timeout, 5xx or 429)."),
+    ("agent_upstream_retries_total", "retries", "Attempts retried after a failure."),
+    ("agent_upstream_short_circuited_total", "short_circuited", "Calls refused because the circuit was open."),
+    ("agent_upstream_latency_seconds_total", "latency_seconds_total", "Time spent waiting on each upstream."),
+):
+    Counter(_name, _help, ("upstream",), read=_read(_key))
+
+Gauge(
+    "agent_upstream_circuit_state",
+    "1 for each upstream's current circuit breaker state (closed, open or half_open), else 0.",
+    ("upstream", "state"),
+    read=lambda: {
+        (name, state): float(upstream.breaker.state == state)
+        for name, upstream in UPSTREAMS.items() for state in ("closed", "open", "half_open")
+    },
+)
@@ -0,0 +1,59 @@
+# benchmarks/bench_chain_overhead.py
+"""
+Per-step overhead of building the prompt | LLM chain on every node call
+(the old behaviour) versus reusing the chain compiled with the graph.
+
+Run from the repo root:
+    python -m benchmarks.bench_chain_overhead [iterations]
+"""
+import os
+import sys
+import time
+
+from langchain_core.messages import HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from benchmarks.fake_llm import install_fake_llm
+
+os.environ.update({"LLM_REQUESTS_PER_SECOND": "0", "LOG_LEVEL": "WARNING"})
+fake_llm = install_fake_llm()
+
+from app import graph  # noqa: E402  (must follow install_fake_llm)
+from app.prompts import supervisor_prompt_ex  # noqa: E402
+
+
+def per_call_chain(state: dict):
+    """What call_supervisor_node used to do on every step."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", supervisor_prompt_ex),
+        MessagesPlaceholder(variable_name="messages"),
+    ])
+    chain = prompt | fake_llm.bind_tools(graph.supervisor_tools, tool_choice="auto")
+    tool_map = {tool.name: tool for tool in graph.supervisor_tools}
+    assert tool_map
+    return chain.invoke(state)
+
+
+def precompiled_chain(state: dict):
+    return graph.supervisor_chain.invoke(state)
+
+
+def timeit(fn, state: dict, iterations: int) -> float:
+    fn(state)  # warm-up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(state)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    state = {"messages": [HumanMessage(content="Hello there")]}
+
+    before = timeit(per_call_chain, state, iterations)
+    after = timeit(precompiled_chain, state, iterations)
+
+    print(f"iterations:          {iterations}")
+    print(f"per-call chain:      {before:8.1f} µs/step")
+    print(f"precompiled chain:   {after:8.1f} µs/step")
+    print(f"saved:               {before - after:8.1f} µs/step ({(1 - after / before) * 100:.0f}%)")
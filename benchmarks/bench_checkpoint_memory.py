@@ -0,0 +1,77 @@
+# benchmarks/bench_checkpoint_memory.py
+"""
+Memory growth of the checkpointer over many synthetic threads: the old
+unbounded InMemorySaver against the bounded KVSaver backends. Then the
+per-turn time of one long thread, which grows with the history every
+checkpoint carries.
+
+Run from the repo root:
+    python -m benchmarks.bench_checkpoint_memory [threads] [max_threads]
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.fake_llm import install_fake_llm
+
+os.environ.update({"LLM_REQUESTS_PER_SECOND": "0", "LOG_LEVEL": "WARNING"})
+install_fake_llm()
+
+from app import graph  # noqa: E402  (must follow install_fake_llm)
+from app.checkpoint import KVSaver, store_keys  # noqa: E402
+from app.store import MemoryStore, SqliteStore  # noqa: E402
+
+
+def run(name: str, saver, threads: int) -> None:
+    workflow = graph.supervisor_graph.compile(checkpointer=saver)
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    for i in range(threads):
+        config = {"configurable": {"thread_id": f"bench-{i}"}}
+        # Two turns per thread so pruning has history to drop.
+        workflow.invoke({"messages": [HumanMessage(content="Hello")]}, config=config)
+        workflow.invoke({"messages": [HumanMessage(content="Hi again")]}, config=config)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    growth = (current - baseline) / 1024 / 1024
+    print(f"{name:<22} {growth:9.1f} MiB retained  {peak / 1024 / 1024:9.1f} MiB peak  "
+          f"{elapsed / threads * 1000:6.2f} ms/thread")
+
+
+def long_thread(name: str, saver, turns: int = 200, block: int = 50) -> None:
+    workflow = graph.supervisor_graph.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench-long"}}
+    timings = []
+    for _ in range(turns // block):
+        started = time.perf_counter()
+        for _ in range(block):
+            workflow.invoke({"messages": [HumanMessage(content="Hello")]}, config=config)
+        timings.append((time.perf_counter() - started) / block * 1000)
+    print(f"{name:<22} " + "  ".join(f"{t:6.2f}" for t in timings) + f"  ms/turn per {block} turns")
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    print(f"{threads} threads x 2 turns, bounded stores keep {max_threads} threads\n")
+
+    run("InMemorySaver", InMemorySaver(), threads)
+    run("KVSaver[memory]", KVSaver(MemoryStore(store_keys(max_threads, 2), ttl=None), keep=2), threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoints.sqlite")
+        run("KVSaver[sqlite]", KVSaver(SqliteStore(path, store_keys(max_threads, 2), ttl=None), keep=2), threads)
+        print(f"\nsqlite file: {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+
+    print()
+    long_thread("InMemorySaver", InMemorySaver())
+    long_thread("KVSaver[memory]", KVSaver(MemoryStore(store_keys(max_threads, 5), ttl=None)))
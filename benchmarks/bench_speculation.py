@@ -0,0 +1,85 @@
+# benchmarks/bench_speculation.py
+"""
+Speculative lookups vs strictly serial turns on the supervisor path (the
+fast-path router is off, so every query goes through the supervisor LLM).
+
+The mix has queries where the speculation is used (order status, refunds)
+and one where the supervisor calls no team after all, so
+the lookup started for it is wasted. Reports per-turn latency and upstream
+requests with speculation off and on, then the used/wasted counters.
+
+Run from the repo root:
+    python -m benchmarks.bench_speculation [rounds]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.stubs import StubServer
+
+LLM_LATENCY = 0.2
+UPSTREAM_LATENCY = 0.15
+
+QUERIES = [
+    "What's the status of order {n}?",
+    "Please track order {n} and check the refund for order {m}",
+    "Where is parcel {n}? It should have arrived by now",  # no team called: speculation wasted
+    "Has the refund for order {n} gone through?",
+]
+
+stubs = StubServer(latency=UPSTREAM_LATENCY).start()
+os.environ.update(stubs.env())
+os.environ.update({"ROUTER_ENABLED": "false", "LLM_REQUESTS_PER_SECOND": "0", "LOG_LEVEL": "WARNING"})
+fake_llm = install_fake_llm(latency=LLM_LATENCY)
+
+from app.config import settings  # noqa: E402  (must follow install_fake_llm)
+from app.graph import workflow  # noqa: E402
+from app.speculation import speculation_stats  # noqa: E402
+from app.tools import tool_cache  # noqa: E402
+
+
+async def measure(enabled: bool, rounds: int, offset: int) -> dict:
+    settings.SPECULATION_ENABLED = enabled
+    tool_cache.clear()
+    hits_before = sum(stubs.hits.values())
+    latencies = []
+    for r in range(rounds):
+        for i, template in enumerate(QUERIES):
+            n = offset + 10 * r + 2 * i + 1
+            query = template.format(n=n, m=n + 1)
+            config = {"configurable": {"thread_id": f"spec-{enabled}-{r}-{i}"}}
+            started = time.perf_counter()
+            await workflow.ainvoke({"messages": [HumanMessage(content=query)]}, config)
+            latencies.append(time.perf_counter() - started)
+            tool_cache.clear()  # Fresh numbers per turn; nothing carries over between turns
+    await asyncio.sleep(UPSTREAM_LATENCY * 2)  # Let cancelled/wasted lookups finish their accounting
+    turns = rounds * len(QUERIES)
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "http": (sum(stubs.hits.values()) - hits_before) / turns,
+    }
+
+
+def main(rounds: int) -> None:
+    print(f"{rounds} rounds x {len(QUERIES)} queries, LLM {LLM_LATENCY * 1000:.0f} ms/turn, "
+          f"upstream {UPSTREAM_LATENCY * 1000:.0f} ms/request\n")
+    print(f"{'speculation':<12} {'p50 ms':>8} {'mean ms':>8} {'HTTP/turn':>10}")
+    for enabled, offset in [(False, 0), (True, 1000)]:
+        r = asyncio.run(measure(enabled, rounds, offset))
+        print(f"{'on' if enabled else 'off':<12} {r['p50_ms']:>8.1f} {r['mean_ms']:>8.1f} {r['http']:>10.2f}")
+    stats = speculation_stats.snapshot()
+    print(f"\nspeculative lookups: {stats['lookups']} in {stats['turns']} turns, "
+          f"{stats['used']} used / {stats['wasted']} wasted (hit rate {stats['hit_rate']:.0%})")
+    print(f"upstream time taken off the critical path: {stats['saved_ms']:.0f} ms; "
+          f"spent on wasted lookups: {stats['wasted_ms']:.0f} ms")
+    stubs.stop()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,181 @@
+# benchmarks/check_deadline.py
+"""
+Request deadline check, against the real app under uvicorn with the fake
+chat model (LLM_LATENCY per call; a full two-team turn takes ~4 calls deep):
+
+1. /chat/invoke cut off during the supervisor's answer: the reply comes back
+   on time, flagged `deadline_exceeded`, with the team reports gathered so
+   far. No LLM call finishes afterwards, every delegation in the checkpoint
+   has a report, and the next turn on the thread runs normally.
+2. /chat/stream cut off while the teams work: `deadline_exceeded` is
+   followed by a "try again" final_answer.
+3. A hung upstream: the tool's HTTP request is abandoned at the deadline and
+   does not count against the upstream's circuit breaker.
+4. The sync graph (workflow.invoke) under app.deadline: the budget reaches
+   the team threads and the run stops with DeadlineExceeded; close_turn
+   leaves the thread ready for the next query.
+
+Exits non-zero on any failure. Run from the repo root:
+    python -m benchmarks.check_deadline
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.load_test import metric_value, start_api
+from benchmarks.stubs import StubServer
+
+LLM_LATENCY = 0.4
+SLACK = 0.25  # Allowed lateness of a cut-off reply
+
+stubs = StubServer(latency=0.01).start()
+os.environ.update(stubs.env())
+os.environ.update({
+    "ROUTER_ENABLED": "false",
+    "SPECULATION_ENABLED": "false",
+    "TOOL_CACHE_ENABLED": "false",
+    "LLM_REQUESTS_PER_SECOND": "0",
+    "LOG_LEVEL": "ERROR",
+})
+fake_llm = install_fake_llm(latency=LLM_LATENCY)
+
+from app.deadline import DeadlineExceeded, deadline  # noqa: E402  (must follow install_fake_llm)
+from app.graph import DEADLINE_PARTIAL_REPLY, DEADLINE_REPLY, close_turn, workflow  # noqa: E402
+
+TWO_TEAMS = "What's the status of order 7 and my payment details?"
+
+
+def closed(messages: list) -> bool:
+    """Every delegation has its report and the turn ends with an answer."""
+    asked = {tc["id"] for m in messages if isinstance(m, AIMessage) for tc in m.tool_calls}
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    return asked <= answered and isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls
+
+
+async def check_invoke(client: httpx.AsyncClient) -> list[str]:
+    budget = LLM_LATENCY * 3.5  # Teams are done after 3 calls; the supervisor's answer is cut off
+    started = time.perf_counter()
+    body = (await client.post("/chat/invoke", json={
+        "query": TWO_TEAMS, "thread_id": "deadline-invoke", "deadline_seconds": budget,
+    })).json()
+    elapsed = time.perf_counter() - started
+    calls = fake_llm.calls
+    await asyncio.sleep(LLM_LATENCY * 2)
+    late_calls = fake_llm.calls - calls
+    state = await workflow.aget_state({"configurable": {"thread_id": "deadline-invoke"}})
+    follow_up = (await client.post("/chat/invoke", json={
+        "query": "And the status of order 9?", "thread_id": "deadline-invoke",
+    })).json()
+    print(f"invoke: cut off after {elapsed:.2f}s (budget {budget:.2f}s), {late_calls} LLM calls afterwards, "
+          f"follow-up {'answered' if 'deadline_exceeded' not in follow_up else 'cut off'}")
+
+    failures = []
+    if not body.get("deadline_exceeded") or elapsed > budget + SLACK:
+        failures.append(f"invoke: expected a cut-off reply within {budget:.2f}s, got {body} after {elapsed:.2f}s")
+    if not body["response"].startswith(DEADLINE_PARTIAL_REPLY) or body["response"].count("tracking_no") != 1 \
+            or "customer_name" not in body["response"]:
+        failures.append(f"invoke: partial answer lacks the team reports: {body['response']!r}")
+    if late_calls:
+        failures.append(f"invoke: {late_calls} LLM call(s) finished after the deadline")
+    if not closed(state.values["messages"]) or state.next:
+        failures.append("invoke: the cut-off turn was not closed in the checkpoint")
+    if "deadline_exceeded" in follow_up or not follow_up["response"].startswith("Here is what I found"):
+        failures.append(f"invoke: follow-up turn failed: {follow_up}")
+    return failures
+
+
+async def check_stream(client: httpx.AsyncClient) -> list[str]:
+    budget = LLM_LATENCY * 1.5  # The supervisor has routed; the teams are still thinking
+    events, data = [], []
+    async with client.stream("POST", "/chat/stream", json={"query": TWO_TEAMS, "deadline_seconds": budget}) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                events.append(line.removeprefix("event: "))
+            elif line.startswith("data: "):
+                data.append(line)
+    print(f"stream: {' > '.join(e for e in events if e != 'token')}")
+    failures = []
+    if events[-2:] != ["deadline_exceeded", "final_answer"]:
+        failures.append(f"stream: expected deadline_exceeded then final_answer, got {events}")
+    elif DEADLINE_REPLY not in data[-1]:
+        failures.append(f"stream: final answer is not the try-again reply: {data[-1]}")
+    return failures
+
+
+async def upstream_failures(client: httpx.AsyncClient) -> float:
+    metrics = (await client.get("/metrics")).text
+    return metric_value(metrics, "agent_upstream_failures_total", upstream="fakestore")
+
+
+async def check_hung_upstream(client: httpx.AsyncClient) -> list[str]:
+    stubs.latency = 10  # Longer than UPSTREAM_TIMEOUT_SECONDS; only the deadline ends it in time
+    budget = LLM_LATENCY * 3
+    failures_before = await upstream_failures(client)
+    started = time.perf_counter()
+    body = (await client.post("/chat/invoke", json={
+        "query": "What's the status of order 11?", "deadline_seconds": budget,
+    })).json()
+    elapsed = time.perf_counter() - started
+    stubs.latency = 0.01
+    failures_after = await upstream_failures(client)
+    print(f"hung upstream: cut off after {elapsed:.2f}s (budget {budget:.2f}s), "
+          f"{failures_after - failures_before:.0f} upstream failure(s) counted")
+    failures = []
+    if not body.get("deadline_exceeded") or elapsed > budget + SLACK:
+        failures.append(f"hung upstream: expected a cut-off reply within {budget:.2f}s, got {body} after {elapsed:.2f}s")
+    if failures_after != failures_before:
+        failures.append("hung upstream: the abandoned request was counted as an upstream failure")
+    return failures
+
+
+def check_sync() -> list[str]:
+    budget = LLM_LATENCY * 1.5
+    config = {"configurable": {"thread_id": "deadline-sync"}}
+    started = time.perf_counter()
+    try:
+        with deadline(budget):
+            workflow.invoke({"messages": [HumanMessage(content=TWO_TEAMS)]}, config)
+        return ["sync: the run finished despite its deadline"]
+    except DeadlineExceeded as e:
+        elapsed = time.perf_counter() - started
+        reason = str(e)
+    answer = close_turn(workflow, config)
+    state = workflow.get_state(config)
+    print(f"sync: {reason} after {elapsed:.2f}s (budget {budget:.2f}s)")
+    failures = []
+    if elapsed > budget + SLACK:
+        failures.append(f"sync: stopped after {elapsed:.2f}s, budget {budget:.2f}s")
+    if answer != DEADLINE_REPLY or not closed(state.values["messages"]) or state.next:
+        failures.append(f"sync: the cut-off turn was not closed: {answer!r}, next={state.next}")
+    return failures
+
+
+async def check_api(base_url: str) -> list[str]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        return await check_invoke(client) + await check_stream(client) + await check_hung_upstream(client)
+
+
+def main() -> int:
+    server, base_url = start_api()
+    try:
+        failures = asyncio.run(check_api(base_url))
+        failures += check_sync()
+        deadlines = next(line for line in httpx.get(f"{base_url}/metrics").text.splitlines()
+                         if line.startswith("agent_deadlines_exceeded_total"))
+        print(deadlines)
+    finally:
+        server.should_exit = True
+        stubs.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
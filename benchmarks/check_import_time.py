@@ -0,0 +1,75 @@
+# benchmarks/check_import_time.py
+"""
+Cold-start check: imports app.api in a fresh interpreter and fails when the
+import takes longer than the budget or drags in modules that belong to the
+startup phase (LangGraph, langchain_community, the Airtable client,
+app.graph), also when the stats and metrics endpoints are hit before startup. Then runs
+the startup phase itself and reports its timings.
+
+Run from the repo root:
+    python -m benchmarks.check_import_time [budget_seconds]
+"""
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_SECONDS = 1.5
+RUNS = 3  # Best of N: the budget is about our imports, not a noisy neighbour
+
+# Must not be imported by `import app.api`; they are loaded by app.startup.
+DEFERRED_MODULES = [
+    "langgraph", "langchain_community", "airtable",
+    "app.graph", "app.tools", "app.llm", "app.tiering", "app.prompt_layout", "app.speculation",
+]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.api
+import_seconds = time.perf_counter() - started
+for endpoint in (app.api.debug_stats, app.api.metrics):
+    endpoint()  # Before startup: must not pull the deferred modules onto the request path
+loaded = [m for m in %r if m in sys.modules]
+from app import startup
+startup.start().result()
+print(json.dumps({"import_seconds": import_seconds, "loaded": loaded, "startup": startup.status()}))
+""" % (DEFERRED_MODULES,)
+
+
+def probe() -> dict:
+    env = dict(os.environ)
+    for key in ("DEEPINFRA_API_KEY", "AIRTABLE_BASE_ID", "AIRTABLE_TOKEN"):
+        env.setdefault(key, "offline")
+    env.setdefault("SLACK_WEBHOOK_URL", "http://127.0.0.1:9/slack")
+    env.update({"CHECKPOINTER": "memory", "LOG_LEVEL": "WARNING"})
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv: list[str]) -> int:
+    budget = float(argv[0]) if argv else DEFAULT_BUDGET_SECONDS
+    results = [probe() for _ in range(RUNS)]
+    best = min(results, key=lambda r: r["import_seconds"])
+
+    print(f"import app.api: {best['import_seconds']:.3f}s (budget {budget:.3f}s, best of {RUNS})")
+    print(f"startup phase:  {best['startup']}")
+    failed = False
+    if best["import_seconds"] > budget:
+        print("FAIL: import time over budget")
+        failed = True
+    if best["loaded"]:
+        print(f"FAIL: imported eagerly: {', '.join(best['loaded'])}")
+        failed = True
+    if best["startup"].get("status") != "ready":
+        print("FAIL: startup phase did not complete")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
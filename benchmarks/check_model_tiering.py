@@ -0,0 +1,185 @@
+# benchmarks/check_model_tiering.py
+"""
+Model tiering with fake models, offline: routing and the team agents run on
+a small model (SMALL_LATENCY per call) that gets every FLAKY_EVERY-th tool
+call wrong, the supervisor's answer on the large one (LARGE_LATENCY).
+
+The baseline gives every role the large model's latency, price and a
+correct responder, as with the single shared model before tiering. Reports
+per-turn latency and cost for both, then the per-role accounting, and
+checks that:
+
+- every invalid small-model reply was redone on the large model,
+- no team ever received a broken call, and every turn got an answer,
+- the tiered setup is faster and cheaper than the baseline,
+- on /chat/stream, a small-model reply that streamed text before failing is
+  followed by a token_reset, so the text after it is exactly the answer.
+
+Exits non-zero on any failure. Run from the repo root:
+    python -m benchmarks.check_model_tiering [rounds]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.fake_llm import install_fake_llm, scripted_response
+from benchmarks.load_test import start_api
+from benchmarks.stubs import StubServer
+
+LARGE, SMALL = "openai/gpt-oss-120b", "openai/gpt-oss-20b"
+LARGE_LATENCY = 0.3
+SMALL_LATENCY = 0.08
+FLAKY_EVERY = 4
+
+QUERIES = [
+    "What's the status of order {n}?",
+    "Has the refund for order {n} gone through?",
+    "Can I see my payment details?",
+    "Please track order {n} and check the refund for order {m}",
+]
+
+stubs = StubServer(latency=0.005).start()
+os.environ.update(stubs.env())
+os.environ.update({
+    "ROUTER_ENABLED": "false",
+    "SPECULATION_ENABLED": "false",
+    "LLM_REQUESTS_PER_SECOND": "0",
+    "LOG_LEVEL": "WARNING",
+})
+small = {"model_name": SMALL, "latency": SMALL_LATENCY}
+fake_llm = install_fake_llm(model_name=LARGE, latency=LARGE_LATENCY, roles={"route": small, "team": small})
+
+import app.llm  # noqa: E402  (must follow install_fake_llm)
+from app.graph import workflow  # noqa: E402
+from app.tiering import model_stats  # noqa: E402
+
+
+def flaky(messages, tool_names):
+    """scripted_response, except that every FLAKY_EVERY-th tool call is broken."""
+    response = scripted_response(messages, tool_names)
+    if not response.tool_calls:
+        return response
+    flaky.calls += 1
+    if flaky.calls % FLAKY_EVERY:
+        return response
+    flaky.injected += 1
+    tool_call = dict(response.tool_calls[0])
+    if "orders_team_tool" in tool_names:
+        tool_call["args"] = {"question": tool_call["args"]["query"]}  # Wrong argument name
+    else:
+        tool_call["name"] = tool_call["name"].replace("_tool", "_lookup")  # No such tool
+    return AIMessage(content="", tool_calls=[tool_call, *response.tool_calls[1:]])
+
+
+def configure(tiered: bool) -> None:
+    flaky.calls = flaky.injected = 0
+    for role in ("route", "team"):
+        model = app.llm.role_llms[role]
+        model.model_name = SMALL if tiered else LARGE
+        model.latency = SMALL_LATENCY if tiered else LARGE_LATENCY
+        model.responder = flaky if tiered else scripted_response
+
+
+async def measure(tiered: bool, rounds: int) -> tuple[dict, list[str]]:
+    configure(tiered)
+    cost_before = sum(r["cost_usd"] for r in model_stats.snapshot().values())
+    latencies, failures = [], []
+    for r in range(rounds):
+        for i, template in enumerate(QUERIES):
+            n = 10 * r + 2 * i + 1
+            config = {"configurable": {"thread_id": f"tiering-{tiered}-{r}-{i}"}}
+            started = time.perf_counter()
+            state = await workflow.ainvoke({"messages": [HumanMessage(content=template.format(n=n, m=n + 1))]}, config)
+            latencies.append(time.perf_counter() - started)
+            final = state["messages"][-1]
+            reports = [m for m in state["messages"] if isinstance(m, ToolMessage)]
+            if final.tool_calls or not final.content or any("Error" in str(m.content) for m in reports):
+                failures.append(f"{'tiered' if tiered else 'baseline'} turn {r}-{i} failed: {final.content!r}")
+    turns = rounds * len(QUERIES)
+    cost = sum(r["cost_usd"] for r in model_stats.snapshot().values()) - cost_before
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "usd_per_1k": cost / turns * 1000,
+        "injected": flaky.injected,
+    }, failures
+
+
+def chatty_and_broken(messages, tool_names):
+    """Starts writing an answer, then calls a tool that doesn't exist."""
+    return AIMessage(content="Sure, let me look into that for you.", tool_calls=[
+        {"name": "lookup_everything_tool", "args": {}, "id": f"call_lookup_{len(messages)}"},
+    ])
+
+
+async def check_stream_fallback() -> list[str]:
+    """Streams a turn whose routing reply is redone on the large model after its text went out."""
+    configure(True)
+    app.llm.role_llms["route"].responder = chatty_and_broken
+    server, base_url = start_api()
+    events = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            async with client.stream("POST", "/chat/stream", json={"query": "Good day, what can you do?"}) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line.removeprefix("event: ")
+                    elif line.startswith("data: "):
+                        events.append((event, json.loads(line.removeprefix("data: "))))
+    finally:
+        server.should_exit = True
+    live = ""  # What a client shows: supervisor tokens since the last reset
+    for event, data in events:
+        if event == "token" and data["source"] == "supervisor":
+            live += data["content"]
+        elif event == "token_reset" and data["source"] == "supervisor":
+            live = ""
+    final = next((data["content"] for event, data in events if event == "final_answer"), None)
+    resets = sum(event == "token_reset" for event, _ in events)
+    print(f"\nstream fallback: {resets} token_reset, streamed text {'matches' if live == final else 'differs from'} "
+          f"the final answer")
+    if resets != 1 or live != final:
+        return [f"stream fallback: expected one reset and the streamed text to equal {final!r}, got {live!r}"]
+    return []
+
+
+def main(rounds: int) -> int:
+    print(f"{rounds} rounds x {len(QUERIES)} queries; large model {LARGE_LATENCY * 1000:.0f} ms/call, "
+          f"small {SMALL_LATENCY * 1000:.0f} ms/call, every {FLAKY_EVERY}th small tool call broken\n")
+    print(f"{'setup':<10} {'p50 ms':>8} {'mean ms':>8} {'USD/1k turns':>13}")
+    baseline, failures = asyncio.run(measure(False, rounds))
+    model_stats.__init__()  # Per-role accounting of the tiered run only
+    tiered, tiered_failures = asyncio.run(measure(True, rounds))
+    failures += tiered_failures
+    for name, r in (("baseline", baseline), ("tiered", tiered)):
+        print(f"{name:<10} {r['p50_ms']:>8.1f} {r['mean_ms']:>8.1f} {r['usd_per_1k']:>13.4f}")
+
+    roles = model_stats.snapshot()
+    print(f"\n{'role':<10} {'calls':>6} {'invalid':>8} {'fallbacks':>10} {'mean ms':>8} {'USD':>10}  models")
+    for role, r in roles.items():
+        print(f"{role:<10} {r['calls']:>6} {r['invalid']:>8} {r['fallbacks']:>10} {r['mean_latency_ms']:>8.1f} "
+              f"{r['cost_usd']:>10.6f}  {r['models']}")
+    failures += asyncio.run(check_stream_fallback())
+    stubs.stop()
+
+    fallbacks = sum(r["fallbacks"] for r in roles.values())
+    if not tiered["injected"] or fallbacks != tiered["injected"]:
+        failures.append(f"{tiered['injected']} broken tool calls injected, {fallbacks} redone on the large model")
+    if set(roles) != {"route", "team", "synthesis"}:
+        failures.append(f"calls not accounted for every role: {sorted(roles)}")
+    if tiered["p50_ms"] >= baseline["p50_ms"] or tiered["usd_per_1k"] >= baseline["usd_per_1k"]:
+        failures.append("tiering was not faster and cheaper than the single large model")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,220 @@
+# benchmarks/check_multi_worker.py
+"""
+Multi-worker check: boots several app.api worker processes on a shared
+backend (a SQLite file, or a fakeredis TCP server standing in for Redis),
+with the fake chat model and local upstream stubs, and proves that
+conversations survive being served by different workers:
+
+1. Round-robin: every turn of a thread goes to a different worker; the
+   thread's stored history must hold every turn, in order.
+2. Contention: several turns of one thread are sent to different workers at
+   once; the shared thread lock serializes them and none is lost.
+3. Affinity (--affinity): turns go through app.affinity and stick to one
+   worker per thread; that worker is then killed and the next turn is served
+   by another one, history intact.
+
+Exits non-zero on any failure. Run from the repo root:
+    python -m benchmarks.check_multi_worker [--workers 3] [--backend sqlite|redis] [--affinity]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.load_test import CONVERSATION, metric_value
+from benchmarks.stubs import StubServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(port: int) -> None:
+    """Worker process entry point: the real app with the fake chat model."""
+    from benchmarks.fake_llm import install_fake_llm
+    install_fake_llm(latency=0.01)
+    import uvicorn
+    uvicorn.run("app.api:app", host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_redis_stand_in() -> str:
+    from fakeredis import TcpFakeServer
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, name="fakeredis", daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"worker {url} did not become ready")
+
+
+def stored_queries(thread_id: str) -> list[str]:
+    """Human turns of a thread, read straight from the shared checkpointer."""
+    from langchain_core.messages import HumanMessage
+    from app.checkpoint import build_checkpointer
+    from app.config import settings
+    saved = build_checkpointer(settings).get_tuple({"configurable": {"thread_id": thread_id}})
+    if saved is None:
+        return []
+    return [m.content for m in saved.checkpoint["channel_values"]["messages"] if isinstance(m, HumanMessage)]
+
+
+async def turn(client: httpx.AsyncClient, url: str, query: str, thread_id: str) -> str:
+    response = await client.post(f"{url}/chat/invoke", json={"query": query, "thread_id": thread_id})
+    response.raise_for_status()
+    return response.headers["x-worker-id"]
+
+
+async def round_robin(urls: list[str], threads: int) -> list[str]:
+    failures = []
+    async with httpx.AsyncClient(timeout=60) as client:
+        async def conversation(t: int) -> None:
+            thread_id = f"rr-{t}"
+            served_by = [
+                await turn(client, urls[(i + t) % len(urls)], query, thread_id)
+                for i, query in enumerate(CONVERSATION)
+            ]
+            if len(set(served_by)) < min(len(urls), len(CONVERSATION)):
+                failures.append(f"{thread_id}: served only by {sorted(set(served_by))}")
+            if stored_queries(thread_id) != CONVERSATION:
+                failures.append(f"{thread_id}: history lost, stored {stored_queries(thread_id)}")
+        await asyncio.gather(*(conversation(t) for t in range(threads)))
+    print(f"round-robin: {threads} threads x {len(CONVERSATION)} turns across {len(urls)} workers")
+    return failures
+
+
+async def contention(urls: list[str], turns: int) -> list[str]:
+    thread_id = "contended"
+    queries = [f"What's the status of order {n}?" for n in range(1, turns + 1)]
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*(
+            turn(client, urls[i % len(urls)], query, thread_id) for i, query in enumerate(queries)
+        ))
+        waits = 0
+        for url in urls:
+            metrics = (await client.get(f"{url}/metrics")).text
+            waits += int(metric_value(metrics, "agent_admission_events_total", event="thread_lock_waits"))
+    stored = stored_queries(thread_id)
+    print(f"contention: {turns} simultaneous turns of one thread, {waits} waited for the thread lock")
+    if sorted(stored) != sorted(queries):
+        return [f"{thread_id}: expected all {turns} turns, stored {stored}"]
+    return []
+
+
+async def affinity(router_url: str, workers: dict[str, subprocess.Popen], threads: int) -> list[str]:
+    failures = []
+    async with httpx.AsyncClient(timeout=60) as client:
+        owners = {}
+        for t in range(threads):
+            thread_id = f"affinity-{t}"
+            served_by = {await turn(client, router_url, query, thread_id) for query in CONVERSATION[:3]}
+            if len(served_by) != 1:
+                failures.append(f"{thread_id}: affinity broken, served by {sorted(served_by)}")
+            owners[thread_id] = served_by.pop()
+
+        thread_id, owner = next(iter(owners.items()))
+        workers[owner].terminate()
+        workers[owner].wait()
+        survivor = await turn(client, router_url, CONVERSATION[3], thread_id)
+    if survivor == owner:
+        failures.append(f"{thread_id}: still routed to the stopped worker {owner}")
+    if stored_queries(thread_id) != CONVERSATION[:4]:
+        failures.append(f"{thread_id}: history lost after failover, stored {stored_queries(thread_id)}")
+    print(f"affinity: {threads} threads pinned; {thread_id} moved from {owner} to {survivor} after a stop")
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--backend", choices=["sqlite", "redis"], default="sqlite")
+    parser.add_argument("--threads", type=int, default=4, help="conversations per scenario")
+    parser.add_argument("--affinity", action="store_true", help="also check the app.affinity router")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        serve(args.serve)
+        return 0
+
+    stubs = StubServer(latency=0.005).start()
+    workdir = tempfile.mkdtemp(prefix="multiworker-")
+    os.environ.update(stubs.env())
+    for key in ("DEEPINFRA_API_KEY", "AIRTABLE_BASE_ID", "AIRTABLE_TOKEN"):
+        os.environ.setdefault(key, "offline")
+    os.environ.update({
+        "CHECKPOINTER": args.backend,
+        "CACHE_BACKEND": args.backend,
+        "CHECKPOINT_SQLITE_PATH": os.path.join(workdir, "shared.sqlite"),
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite"),
+        "LLM_REQUESTS_PER_SECOND": "0",
+        "LOG_LEVEL": "WARNING",
+    })
+    if args.backend == "redis":
+        os.environ["CHECKPOINT_REDIS_URL"] = start_redis_stand_in()
+
+    workers: dict[str, subprocess.Popen] = {}
+    urls = []
+    for i in range(args.workers):
+        port = free_port()
+        env = {**os.environ, "WORKER_ID": f"worker-{i}"}
+        workers[f"worker-{i}"] = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.check_multi_worker", "--serve", str(port)], env=env
+        )
+        urls.append(f"http://127.0.0.1:{port}")
+
+    failures = []
+    try:
+        for url in urls:
+            wait_ready(url)
+        failures += asyncio.run(round_robin(urls, args.threads))
+        failures += asyncio.run(contention(urls, 2 * args.workers))
+        with httpx.Client() as client:
+            store_hits = sum(
+                int(metric_value(client.get(f"{url}/metrics").text, "agent_tool_cache_lookups_total", result="store_hits"))
+                for url in urls
+            )
+        print(f"tool cache: {store_hits} lookups answered from the shared tier")
+
+        if args.affinity:
+            import uvicorn
+            from app.affinity import create_app
+            router_port = free_port()
+            router = uvicorn.Server(uvicorn.Config(create_app(urls), port=router_port, log_level="warning"))
+            threading.Thread(target=router.run, name="affinity", daemon=True).start()
+            while not router.started:
+                time.sleep(0.01)
+            failures += asyncio.run(affinity(f"http://127.0.0.1:{router_port}", workers, args.threads))
+            router.should_exit = True
+    finally:
+        for proc in workers.values():
+            proc.terminate()
+        for proc in workers.values():
+            proc.wait()
+        stubs.stop()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# benchmarks/check_outbox.py
+"""
+Ticket outbox delivery against stub Airtable and Slack endpoints that fail
+on demand, through create_support_ticket_tool and the real outbox worker:
+
+1. Airtable fails twice: the ticket is retried with backoff and delivered;
+   its Airtable record carries the provisional ID the customer was given,
+   and the Slack alert shows the same ID.
+2. Slack keeps failing: the ticket is dead-lettered after
+   OUTBOX_MAX_ATTEMPTS with the error kept, without a second Airtable
+   record, and counted on /metrics. retry_dead() then delivers it.
+
+Exits non-zero on any failure. Run from the repo root:
+    python -m benchmarks.check_outbox
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.load_test import metric_value
+from benchmarks.stubs import StubServer
+
+MAX_ATTEMPTS = 3
+TIMEOUT = 10.0
+
+stubs = StubServer(latency=0.005).start()
+outbox_path = os.path.join(tempfile.mkdtemp(prefix="outbox-check-"), "outbox.sqlite")
+os.environ.update(stubs.env())
+os.environ.update({
+    "OUTBOX_PATH": outbox_path,
+    "OUTBOX_MAX_ATTEMPTS": str(MAX_ATTEMPTS),
+    "OUTBOX_RETRY_BASE_SECONDS": "0.05",
+    "OUTBOX_RETRY_MAX_SECONDS": "0.2",
+    "OUTBOX_POLL_SECONDS": "0.02",
+    "LOG_LEVEL": "CRITICAL",  # Dead-lettering logs an error on purpose
+})
+install_fake_llm()
+
+from app.config import settings  # noqa: E402  (must follow install_fake_llm)
+from app.telemetry import render_metrics  # noqa: E402
+from app.tools import create_support_ticket_tool, get_ticket_outbox  # noqa: E402
+
+
+def ticket(provisional_id: str) -> dict:
+    with sqlite3.connect(outbox_path) as conn:
+        row = conn.execute(
+            "SELECT status, attempts, slack_sent, last_error FROM tickets WHERE provisional_id = ?",
+            (provisional_id,),
+        ).fetchone()
+    return dict(zip(("status", "attempts", "slack_sent", "last_error"), row))
+
+
+def wait_for(provisional_id: str, status: str) -> dict:
+    deadline = time.monotonic() + TIMEOUT
+    while (t := ticket(provisional_id))["status"] != status and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return t
+
+
+def airtable_records(provisional_id: str) -> int:
+    return sum(
+        record["fields"].get(settings.AIRTABLE_REFERENCE_FIELD) == provisional_id
+        for body in stubs.bodies.get("airtable", []) for record in body["records"]
+    )
+
+
+def slack_alerts(provisional_id: str) -> int:
+    return sum(provisional_id in body["text"] for body in stubs.bodies.get("slack", []))
+
+
+def check_airtable_retry() -> list[str]:
+    stubs.failures["airtable"] = 2
+    provisional_id = create_support_ticket_tool.invoke({"customer_concern": "Cancel order 5"})["TicketId"]
+    t = wait_for(provisional_id, "delivered")
+    print(f"airtable down twice: {provisional_id} {t['status']} after {t['attempts']} failed attempts, "
+          f"{airtable_records(provisional_id)} Airtable record(s), {slack_alerts(provisional_id)} Slack alert(s)")
+    failures = []
+    if t["status"] != "delivered" or t["attempts"] != 2:
+        failures.append(f"airtable retry: expected delivered after 2 failed attempts, got {t}")
+    if airtable_records(provisional_id) != 1:
+        failures.append(f"airtable retry: no Airtable record carries {provisional_id} "
+                        f"in {settings.AIRTABLE_REFERENCE_FIELD}")
+    if slack_alerts(provisional_id) != 1:
+        failures.append(f"airtable retry: the Slack alert does not show {provisional_id}")
+    return failures
+
+
+def check_dead_letter() -> list[str]:
+    stubs.failures["slack"] = MAX_ATTEMPTS
+    provisional_id = create_support_ticket_tool.invoke({"customer_concern": "Change my address"})["TicketId"]
+    dead = wait_for(provisional_id, "dead")
+    stats = get_ticket_outbox().stats()
+    dead_on_metrics = metric_value(render_metrics(), "agent_outbox_tickets", status="dead")
+    revived = get_ticket_outbox().retry_dead()
+    delivered = wait_for(provisional_id, "delivered")
+    print(f"slack down: {provisional_id} {dead['status']} after {dead['attempts']} attempts "
+          f"({dead['last_error'].splitlines()[0]}); retry_dead revived {revived}, then {delivered['status']}")
+    failures = []
+    if dead["status"] != "dead" or dead["attempts"] != MAX_ATTEMPTS or not dead["last_error"]:
+        failures.append(f"dead letter: expected dead after {MAX_ATTEMPTS} attempts with the error, got {dead}")
+    if stats["dead"] != 1:
+        failures.append(f"dead letter: outbox stats show {stats}")
+    if dead_on_metrics != 1:
+        failures.append(f"dead letter: /metrics shows {dead_on_metrics:.0f} dead tickets")
+    if revived != 1 or delivered["status"] != "delivered" or not delivered["slack_sent"]:
+        failures.append(f"dead letter: retry_dead did not deliver the ticket: {delivered}")
+    if airtable_records(provisional_id) != 1:
+        failures.append(f"dead letter: {airtable_records(provisional_id)} Airtable records for one ticket")
+    return failures
+
+
+def main() -> int:
+    try:
+        failures = check_airtable_retry() + check_dead_letter()
+    finally:
+        get_ticket_outbox().stop()
+        stubs.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
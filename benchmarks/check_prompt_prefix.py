@@ -0,0 +1,124 @@
+# benchmarks/check_prompt_prefix.py
+"""
+Prompt-prefix stability check, offline with the fake chat model recording
+every request it is sent. Runs a few multi-turn conversations and checks
+that:
+
+- building a layout twice, with its tools in another order, gives the same
+  version and the same bytes,
+- every request of a layout starts with the same system prompt and tool
+  schemas, byte for byte,
+- on one thread, each supervisor request is a byte-identical prefix of the
+  next one (within a turn and across turns),
+- app.prompt_layout.prefix_stats counted the reuse.
+
+Requests are serialized the way app.prompt_layout does it. Exits non-zero
+on any failure. Run from the repo root:
+    python -m benchmarks.check_prompt_prefix [conversations]
+"""
+import os
+import sys
+from collections import defaultdict
+
+from langchain_core.messages import HumanMessage, convert_to_openai_messages
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.stubs import StubServer
+
+TURNS = [
+    "What's the status of order {n}?",
+    "Has the refund for order {n} gone through?",
+    "Can I see my payment details?",
+    "Please track order {n} and check the refund for order {m}",
+    "I want to cancel order {n}",
+]
+
+stubs = StubServer(latency=0.001).start()
+os.environ.update(stubs.env())
+os.environ.update({
+    "ROUTER_ENABLED": "false",
+    "SPECULATION_ENABLED": "false",
+    "LLM_REQUESTS_PER_SECOND": "0",
+    "LOG_LEVEL": "WARNING",
+})
+fake_llm = install_fake_llm(record_requests=True)
+
+from app import graph  # noqa: E402  (must follow install_fake_llm)
+from app.prompt_layout import build_layout, dumps, prefix_stats  # noqa: E402
+from app.prompts import orders_app_prompt  # noqa: E402
+from app.tools import get_order_status_tool, get_payment_details_tool  # noqa: E402
+
+
+def serialized(messages: list, tools: list[dict]) -> list[str]:
+    """A recorded request in layout order: system prompt, tool schemas, then the history."""
+    system, *history = [dumps(convert_to_openai_messages(m)) for m in messages]
+    return [system, dumps(tools), *history]
+
+
+def check_build() -> list[str]:
+    a = build_layout("Orders", orders_app_prompt, [get_order_status_tool, get_payment_details_tool])
+    b = build_layout("Orders", orders_app_prompt, [get_payment_details_tool, get_order_status_tool])
+    print(f"layouts: {graph.supervisor_layout.version}, {a.version}")
+    failures = []
+    if a.version != b.version or a.parts([]) != b.parts([]):
+        failures.append("the same prompt and tools in another order gave a different layout")
+    if a.system.startswith((" ", "\n")) or a.system == orders_app_prompt:
+        failures.append(f"system prompt not canonicalized: {a.system[:60]!r}")
+    return failures
+
+
+def check_requests(conversations: int) -> list[str]:
+    threads = []
+    for c in range(conversations):
+        config = {"configurable": {"thread_id": f"prefix-{c}"}}
+        start = len(fake_llm.requests)
+        for i, template in enumerate(TURNS):
+            n = 10 * c + 2 * i + 1
+            graph.workflow.invoke({"messages": [HumanMessage(content=template.format(n=n, m=n + 1))]}, config)
+        threads.append(fake_llm.requests[start:])
+
+    failures = []
+    static = defaultdict(set)  # System prompt -> every tool-schema serialization sent with it
+    for requests in threads:
+        for messages, tools in requests:
+            system, schemas, *_ = serialized(messages, tools)
+            static[system].add(schemas)
+    if len(static) != 4 or any(len(schemas) != 1 for schemas in static.values()):
+        failures.append(f"expected 4 layouts with one tool-schema prefix each, got "
+                        f"{[len(schemas) for schemas in static.values()]}")
+
+    supervisor = graph.supervisor_layout.parts([])[0]
+    checked = 0
+    for c, requests in enumerate(threads):
+        sent = [parts for parts in (serialized(m, t) for m, t in requests) if parts[0] == supervisor]
+        for earlier, later in zip(sent, sent[1:]):
+            checked += 1
+            if later[:len(earlier)] != earlier:
+                diverged = next(i for i, (x, y) in enumerate(zip(earlier, later)) if x != y)
+                failures.append(f"thread prefix-{c}: supervisor request diverged from the previous one at part {diverged}")
+                break
+    print(f"{sum(map(len, threads))} requests over {conversations} threads; "
+          f"{checked} consecutive supervisor requests compared")
+    if not checked:
+        failures.append("no supervisor requests were compared")
+    return failures
+
+
+def main(conversations: int) -> int:
+    failures = check_build()
+    failures += check_requests(conversations)
+    stubs.stop()
+    stats = prefix_stats.snapshot()
+    print(f"prefix reuse: {stats['reused_bytes']}/{stats['bytes']} bytes ({stats['reuse_ratio']:.1%}), "
+          f"{stats['warm_requests']}/{stats['requests']} requests warm")
+    if stats["requests"] != fake_llm.calls or not stats["reused_bytes"]:
+        failures.append(f"prefix_stats saw {stats['requests']} of {fake_llm.calls} requests, "
+                        f"{stats['reused_bytes']} bytes reused")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
@@ -0,0 +1,111 @@
+# benchmarks/check_speculation.py
+"""
+A wasted speculative lookup must not break another request's tool call
+that joined it in the tool cache (single-flight), offline against the stub
+upstreams:
+
+1. A speculative lookup that another request is waiting on is not
+   cancelled when the supervisor picks another team; it finishes, the
+   waiting call gets its result, and it is still counted as wasted (also
+   on /metrics).
+2. When a single-flight leader is cancelled anyway, its followers redo the
+   lookup instead of receiving a CancelledError.
+
+Exits non-zero on any failure. Run from the repo root:
+    python -m benchmarks.check_speculation
+"""
+import asyncio
+import os
+import sys
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.load_test import metric_value
+from benchmarks.stubs import StubServer
+
+UPSTREAM_LATENCY = 0.2
+
+stubs = StubServer(latency=UPSTREAM_LATENCY).start()
+os.environ.update(stubs.env())
+os.environ.update({"SPECULATION_ENABLED": "true", "LLM_REQUESTS_PER_SECOND": "0", "LOG_LEVEL": "WARNING"})
+install_fake_llm()
+
+from app.cache import ToolCache  # noqa: E402  (must follow install_fake_llm)
+from app.speculation import speculate, speculation_stats  # noqa: E402
+from app.telemetry import render_metrics  # noqa: E402
+from app.tools import get_order_status_tool, tool_cache  # noqa: E402
+
+
+async def check_wasted_with_follower() -> list[str]:
+    tool_cache.clear()
+    escalated = AIMessage(content="", tool_calls=[
+        {"name": "human_escalation_team_tool", "args": {"query": "q"}, "id": "call_1"},
+    ])
+    with speculate([HumanMessage(content="What's the status of order 41?")]) as speculation:
+        lookup = speculation.lookups[0]
+        await asyncio.sleep(UPSTREAM_LATENCY / 4)  # The speculative lookup is in flight
+        # Another customer's team asks for the same order and joins it.
+        follower = asyncio.create_task(get_order_status_tool.ainvoke({"tracking_no": "41"}))
+        await asyncio.sleep(UPSTREAM_LATENCY / 4)  # ...and is waiting on it
+        speculation.settle(escalated)
+    try:
+        result = await follower
+    except asyncio.CancelledError:
+        result = None
+    await asyncio.sleep(0)
+    stats = speculation_stats.snapshot()
+    wasted_on_metrics = metric_value(render_metrics(), "agent_speculation_lookups_total", event="wasted")
+    print(f"wasted lookup with a follower: cancelled={lookup.task.cancelled()}, "
+          f"follower got {'a result' if result is not None else 'CancelledError'}, "
+          f"{stats['wasted']} wasted counted")
+    failures = []
+    if lookup.task.cancelled() or result is None:
+        failures.append("a wasted speculative lookup was cancelled under another request's tool call")
+    if stats["wasted"] != 1:
+        failures.append(f"expected the lookup counted as wasted, got {stats}")
+    if wasted_on_metrics != 1:
+        failures.append(f"/metrics shows {wasted_on_metrics:.0f} wasted lookups")
+    return failures
+
+
+async def check_cancelled_leader() -> list[str]:
+    cache = ToolCache(16)
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {"status": "shipped"}
+
+    key = ("get_order_status_tool", '{"tracking_no": "7"}')
+    leader = asyncio.create_task(cache.aget_or_compute(key, compute, 60))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(cache.aget_or_compute(key, compute, 60))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    try:
+        result = await follower
+    except asyncio.CancelledError:
+        result = None
+    print(f"cancelled leader: follower got {result}, lookup ran {runs} times")
+    if result != {"status": "shipped"} or follower.cancelled():
+        return ["a follower inherited its single-flight leader's cancellation"]
+    if not leader.cancelled() or runs != 2:
+        return [f"expected the leader cancelled and the lookup redone once, got {runs} runs"]
+    return []
+
+
+def main() -> int:
+    failures = asyncio.run(check_wasted_with_follower())
+    failures += asyncio.run(check_cancelled_leader())
+    stubs.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
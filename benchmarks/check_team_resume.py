@@ -0,0 +1,117 @@
+# benchmarks/check_team_resume.py
+"""
+Mid-team resume check: a turn is delegated to the Orders team, which looks up
+the order and then dies before writing its reply (a BaseException on the sync
+path; on the async path the run is cancelled, as on a lost client or worker).
+The turn is resumed from the checkpoint with `workflow.invoke(None, config)`
+and must continue inside the team:
+
+- the supervisor's routing call is not repeated,
+- the team's lookup (LLM turn and upstream request) is not repeated,
+- only the team's reply and the supervisor's answer are generated.
+
+Runs on the sync and the async path. Exits non-zero on any failure.
+Run from the repo root:
+    python -m benchmarks.check_team_resume
+"""
+import asyncio
+import os
+import sys
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.fake_llm import install_fake_llm, scripted_response
+from benchmarks.stubs import StubServer
+
+stubs = StubServer(latency=0.005).start()
+os.environ.update(stubs.env())
+os.environ.update({
+    "CHECKPOINTER": "memory",
+    "ROUTER_ENABLED": "false",
+    "TOOL_CACHE_ENABLED": "false",
+    "LLM_REQUESTS_PER_SECOND": "0",
+    "LOG_LEVEL": "WARNING",
+})
+fake_llm = install_fake_llm()
+
+from app.graph import workflow  # noqa: E402  (must follow install_fake_llm)
+
+QUERY = "What's the status of order 7?"
+
+
+class WorkerCrash(BaseException):
+    """Not an Exception, so no error handler turns it into a team report."""
+
+
+def crash_once(messages, tool_names):
+    """The Orders agent dies right after its lookup came back, the first time only."""
+    if "get_order_status_tool" in tool_names and isinstance(messages[-1], ToolMessage) and not crash_once.done:
+        crash_once.done = True
+        crash_once.crash()
+    return scripted_response(messages, tool_names)
+
+
+def raise_crash() -> None:
+    raise WorkerCrash("worker lost mid-team")
+
+
+def counters() -> tuple[int, int]:
+    return fake_llm.calls, sum(stubs.hits.values())
+
+
+def run(mode: str) -> list[str]:
+    crash_once.done = False
+    fake_llm.responder = crash_once
+    config = {"configurable": {"thread_id": f"resume-{mode}"}}
+    inputs = {"messages": [HumanMessage(content=QUERY)]}
+
+    def invoke(inputs, config):
+        if mode == "sync":
+            crash_once.crash = raise_crash
+            return workflow.invoke(inputs, config)
+
+        async def cancellable():
+            # The async model API turns BaseExceptions into results, so cancel the run instead.
+            task = asyncio.ensure_future(workflow.ainvoke(inputs, config))
+            crash_once.crash = task.cancel
+            return await task
+        return asyncio.run(cancellable())
+
+    llm_before, http_before = counters()
+    try:
+        invoke(inputs, config)
+        return [f"{mode}: the injected crash did not interrupt the run"]
+    except (WorkerCrash, asyncio.CancelledError):
+        pass
+    llm_crash, http_crash = counters()
+
+    state = invoke(None, config)
+    llm_after, http_after = counters()
+
+    failures = []
+    final = state["messages"][-1]
+    if not (isinstance(final, AIMessage) and not final.tool_calls and "tracking_no" in final.content):
+        failures.append(f"{mode}: no final answer after resume, got {final!r}")
+    plans = [m for m in state["messages"] if isinstance(m, AIMessage) and m.tool_calls]
+    if len(plans) != 1:
+        failures.append(f"{mode}: supervisor routed {len(plans)} times")
+    if llm_after - llm_crash != 2:
+        failures.append(f"{mode}: resume made {llm_after - llm_crash} LLM calls, expected 2 (team reply, answer)")
+    if http_after != http_crash:
+        failures.append(f"{mode}: resume repeated {http_after - http_crash} upstream request(s)")
+    print(f"{mode:<5}  before crash: {llm_crash - llm_before} LLM calls, {http_crash - http_before} HTTP  |  "
+          f"resume: {llm_after - llm_crash} LLM calls, {http_after - http_crash} HTTP")
+    return failures
+
+
+def main() -> int:
+    failures = run("sync") + run("async")
+    stubs.stop()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# benchmarks/load_test.py
+"""
+Offline load test of the HTTP API: boots app.api:app under uvicorn with the
+fake chat model and local upstream stubs, then drives /chat/stream and
+/chat/invoke at a fixed concurrency.
+
+Reports throughput, p50/p95/p99 end-to-end latency, time to first SSE event
+and resident memory per conversation thread. With --max-p95-ms it exits
+non-zero when the p95 latency of any endpoint exceeds the limit, so it can
+gate performance changes.
+
+Run from the repo root:
+    python -m benchmarks.load_test --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.stubs import StubServer
+
+# Turns of a conversation; every thread walks through them in order. The mix
+# covers the router fast path, the supervisor path and ticket creation.
+CONVERSATION = [
+    "Hi there!",
+    "What's the status of order 7?",
+    "And the refund for that order?",
+    "What's the status of my refund for order 4?",
+    "I need to cancel order 12, it arrived damaged.",
+    "Which payment methods do I have on file?",
+]
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def metric_value(text: str, name: str, **labels: str) -> float:
+    """Sums the samples of `name` in a /metrics body whose labels include `labels`."""
+    wanted = [f'{key}="{value}"' for key, value in labels.items()]
+    total = 0.0
+    for line in text.splitlines():
+        series, _, value = line.rpartition(" ")
+        if series.split("{", 1)[0] == name and all(label in series for label in wanted):
+            total += float(value)
+    return total
+
+
+def start_api(port_hint: int = 0):
+    """Runs app.api:app under uvicorn in a background thread. Returns (server, base_url)."""
+    import uvicorn
+    from app.api import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port_hint))
+    config = uvicorn.Config(app, log_level="warning", lifespan="on", timeout_keep_alive=30)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def stream_one(client: httpx.AsyncClient, query: str, thread_id: str) -> dict:
+    started = time.perf_counter()
+    first_event = None
+    events = 0
+    async with client.stream(
+        "POST", "/chat/stream", json={"query": query, "thread_id": thread_id}, headers={"X-Client-Id": thread_id}
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                events += 1
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+    return {"latency": time.perf_counter() - started, "ttfe": first_event, "events": events}
+
+
+async def invoke_one(client: httpx.AsyncClient, query: str, thread_id: str) -> dict:
+    started = time.perf_counter()
+    response = await client.post(
+        "/chat/invoke", json={"query": query, "thread_id": thread_id}, headers={"X-Client-Id": thread_id}
+    )
+    response.raise_for_status()
+    return {"latency": time.perf_counter() - started}
+
+
+async def drive(base_url: str, endpoint: str, requests: int, concurrency: int, threads: int, prefix: str) -> dict:
+    """
+    Sends `requests` turns spread over `threads` conversations. Turns of one
+    conversation run one after another; up to `concurrency` run at once.
+    """
+    send = stream_one if endpoint == "stream" else invoke_one
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results: list[dict] = []
+    errors: list[str] = []
+    turns_per_thread = [requests // threads + (1 if i < requests % threads else 0) for i in range(threads)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def conversation(client: httpx.AsyncClient, index: int) -> None:
+        thread_id = f"{prefix}-{endpoint}-{index}"
+        for turn in range(turns_per_thread[index]):
+            query = CONVERSATION[turn % len(CONVERSATION)]
+            async with semaphore:
+                try:
+                    results.append(await send(client, query, thread_id))
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(conversation(client, i) for i in range(threads)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [r["latency"] * 1000 for r in results]
+    report = {
+        "endpoint": f"/chat/{endpoint}",
+        "requests": len(results),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {k: round(v, 2) for k, v in percentiles(latencies).items()},
+    }
+    if endpoint == "stream":
+        ttfe = [r["ttfe"] * 1000 for r in results if r["ttfe"] is not None]
+        report["first_event_ms"] = {k: round(v, 2) for k, v in percentiles(ttfe).items()}
+    if errors:
+        report["first_error"] = errors[0]
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["stream", "invoke", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=120, help="turns per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=20, help="distinct conversation threads per endpoint")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds before the first LLM chunk")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds between streamed words")
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="seconds per stub HTTP call")
+    parser.add_argument("--llm-rps", type=float, default=0, help="shared LLM rate limit (0 = off)")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="fail if any p95 latency exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logs")
+    args = parser.parse_args(argv)
+
+    stubs = StubServer(latency=args.upstream_latency).start()
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ.update(stubs.env())
+    os.environ.update({"CHECKPOINTER": "memory", "OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite")})
+    os.environ["LLM_REQUESTS_PER_SECOND"] = str(args.llm_rps)
+    os.environ.setdefault("LOG_LEVEL", "INFO" if args.verbose else "WARNING")
+    fake = install_fake_llm(latency=args.llm_latency, token_latency=args.token_latency, rate_limited=True)
+
+    server, base_url = start_api()
+    # Warm-up: first-call costs (imports, pools) should not land in the percentiles.
+    asyncio.run(drive(base_url, "invoke", 2, 1, 1, "warmup"))
+
+    endpoints = ["stream", "invoke"] if args.endpoint == "both" else [args.endpoint]
+    reports = []
+    for endpoint in endpoints:
+        rss_before = rss_bytes()
+        calls_before = fake.calls
+        report = asyncio.run(
+            drive(base_url, endpoint, args.requests, args.concurrency, args.threads, "load")
+        )
+        report["llm_calls"] = fake.calls - calls_before
+        report["rss_per_thread_kib"] = round(max(0, rss_bytes() - rss_before) / args.threads / 1024, 1)
+        reports.append(report)
+
+    server.should_exit = True
+    stubs.stop()
+
+    summary = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "verbose")},
+        "upstream_hits": dict(stubs.hits),
+        "results": reports,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"requests/endpoint={args.requests} concurrency={args.concurrency} threads={args.threads} "
+              f"llm_latency={args.llm_latency}s upstream_latency={args.upstream_latency}s\n")
+        for r in reports:
+            lat = r["latency_ms"]
+            line = (f"{r['endpoint']:<13} {r['throughput_rps']:8.2f} req/s  "
+                    f"p50 {lat['p50']:8.1f}  p95 {lat['p95']:8.1f}  p99 {lat['p99']:8.1f} ms")
+            if "first_event_ms" in r:
+                line += f"  first event p50 {r['first_event_ms']['p50']:.1f} ms"
+            line += f"  {r['rss_per_thread_kib']:.1f} KiB/thread  {r['llm_calls']} LLM calls  {r['errors']} errors"
+            print(line)
+            if r.get("first_error"):
+                print(f"  first error: {r['first_error']}")
+        print(f"\nupstream hits: {dict(stubs.hits)}")
+
+    failed = any(r["errors"] for r in reports)
+    if args.max_p95_ms is not None:
+        failed |= any(r["latency_ms"]["p95"] > args.max_p95_ms for r in reports)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# benchmarks/stubs.py
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==============================================================================
+# LOCAL UPSTREAM STUBS
+# (One threaded HTTP server that answers like fakestore, dummyjson, Airtable
+#  and the Slack webhook, with a configurable per-request latency)
+# ==============================================================================
+
+_CART = re.compile(r"^/fakestore/carts/(\d+)$")
+_USER = re.compile(r"^/dummyjson/users/(\d+)$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body) -> None:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def do_GET(self):
+        self.server.hit("GET " + self.path.split("/")[1])
+        time.sleep(self.server.latency)
+        if match := _CART.match(self.path):
+            cart_id = int(match.group(1))
+            return self._reply(200, {
+                "id": cart_id,
+                "date": "2020-03-02T00:00:00.000Z",
+                "products": [{"productId": cart_id, "quantity": 1}],
+            })
+        if match := _USER.match(self.path):
+            return self._reply(200, {"id": int(match.group(1)), "firstName": "Stub", "lastName": "Customer"})
+        self._reply(404, {"message": "not found"})
+
+    def do_POST(self):
+        route = self.path.split("/")[1]
+        self.server.hit("POST " + route)
+        body = self._read_json()
+        time.sleep(self.server.latency)
+        if self.server.take_failure(route):
+            return self._reply(503, {"message": "injected failure"})
+        self.server.record(route, body)
+        if self.path.startswith("/slack"):
+            return self._reply(200, b"ok")
+        if self.path.startswith("/airtable/"):
+            records = [
+                {"id": f"rec{next(self.server.record_ids):08d}", "fields": record.get("fields", {})}
+                for record in body.get("records", [])
+            ]
+            return self._reply(200, {"records": records})
+        self._reply(404, {"message": "not found"})
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves every stubbed upstream under its own path prefix on one port."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.hits: Counter[str] = Counter()
+        self.failures: Counter[str] = Counter()  # Route -> how many of its next POSTs answer 503
+        self.bodies: dict[str, list] = {}  # Route -> every POST body it accepted
+        self._hits_lock = threading.Lock()
+        self.record_ids = iter(range(1, 1 << 62))
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def hit(self, route: str) -> None:
+        with self._hits_lock:
+            self.hits[route] += 1
+
+    def take_failure(self, route: str) -> bool:
+        with self._hits_lock:
+            if self.failures[route] <= 0:
+                return False
+            self.failures[route] -= 1
+            return True
+
+    def record(self, route: str, body) -> None:
+        with self._hits_lock:
+            self.bodies.setdefault(route, []).append(body)
+
+    def env(self) -> dict[str, str]:
+        """Settings overrides that point every upstream at this server."""
+        return {
+            "FAKESTORE_BASE_URL": f"{self.url}/fakestore",
+            "DUMMYJSON_BASE_URL": f"{self.url}/dummyjson",
+            "AIRTABLE_API_URL": f"{self.url}/airtable",
+            "SLACK_WEBHOOK_URL": f"{self.url}/slack",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="upstream-stubs", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -2,8 +2,8 @@
 import uuid
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
-# Import the 'app' from the app.graph module
-from app.graph import app
+# Import the compiled supervisor graph from the app.graph module
+from app.graph import workflow
 
 def run_query(query: str, thread_id: str):
     """
@@ -16,7 +16,7 @@ def run_query(query: str, thread_id: str):
     config = {"configurable": {"thread_id": str(thread_id)}}
     initial_state = {"messages": [HumanMessage(content=query)]}
     
-    for step in app.stream(initial_state, config=config, stream_mode="values"):
+    for step in workflow.stream(initial_state, config=config, stream_mode="values"):
         if "messages" not in step or not step["messages"]:
             continue
             